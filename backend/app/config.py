@@ -8,15 +8,131 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./notekeeper.db"
+    # Optional read replica for GET handlers, e.g. a Postgres standby or a read-only
+    # SQLite URI ("sqlite:///file:notekeeper.db?mode=ro&uri=true"); empty = use the primary
+    database_read_url: str = ""
+    read_your_writes_seconds: float = 5.0  # Reads stay on the primary this long after a user's write
+    read_your_writes_slots: int = 65536  # Shared-memory entries tracking recent writers (8 bytes each)
+    # Storage: "single" (one database) or "sharded" (each user's books, chapters,
+    # notes and tags in their own SQLite file under shard_dir; users stay in database_url)
+    storage_mode: str = "single"
+    shard_dir: str = "./shards"
+    shard_max_open: int = 128  # Shard engines kept open (least recently used are closed)
+    purge_batch_size: int = 1000  # Rows deleted per transaction by background purges
+    position_max_length: int = 24  # Rebalance a book's/chapter's ordering keys once one gets longer
+    bulk_move_max_items: int = 1000  # Ids accepted by one bulk move request
+    # Query log: every statement is timed and grouped by normalized SQL; statements slower
+    # than slow_query_ms are printed and get their query plan captured (GET /api/admin/queries)
+    query_log_enabled: bool = True
+    slow_query_ms: float = 100.0
+    query_log_max_fingerprints: int = 500  # Least recently run statements are dropped past this
+    query_log_samples: int = 1000  # Recent timings kept per statement for percentiles
+    
+    # Note compression (bodies at or above the threshold are compressed at rest; 0 disables)
+    note_compression_threshold: int = 4096
+    note_compression_codec: str = "zstd"  # "zstd" (if installed) or "zlib"
+    
+    # Note revision history: deltas between versions, with a full snapshot every
+    # note_revision_snapshot_interval revisions so rebuilding a version is bounded
+    note_revisions_enabled: bool = True
+    note_revision_snapshot_interval: int = 20
+    note_revision_keep_all_hours: int = 24  # Older revisions are thinned to one per hour...
+    note_revision_keep_hourly_days: int = 30  # ...and past this age to one per day
+    
+    # Attachments: files stored once per SHA-256 under attachment_dir, referenced from notes
+    attachment_dir: str = "./attachments"
+    attachment_max_bytes: int = 25 * 1024 * 1024  # Largest single upload
+    attachment_quota_bytes: int = 1024 * 1024 * 1024  # Per user, counting every attachment; 0 disables
+    attachment_chunk_size: int = 1024 * 1024  # Upload bytes buffered per disk write
     
     # JWT
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 1440  # 24 hours
     
+    # Password hashing (bcrypt). Stored hashes at a lower cost are rehashed on login
+    password_hash_rounds: int = 12  # bcrypt cost; python -m scripts.bench_password_hash recommends one per host
+    password_hash_target_ms: float = 250.0  # Hash latency the benchmark's recommendation aims for
+    password_hash_min_rounds: int = 10  # The benchmark never recommends less than this
+    password_hash_allow_downgrade: bool = False  # Also rehash hashes above password_hash_rounds on login
+    # Sent by operators to use admin-only features (request profiling, /api/admin); empty disables them
+    admin_token: str = ""
+    
+    # Request profiler: a request sent with "X-Profile: <admin_token>" is profiled by
+    # stack sampling and saved to profile_dir as collapsed stacks (flamegraph.pl, speedscope)
+    profile_dir: str = "./profiles"
+    profile_interval_ms: float = 5.0  # Time between stack samples
+    profile_sample_rate: int = 0  # Also profile 1 in N requests at random; 0 disables
+    profile_keep_files: int = 500  # Oldest profiles are deleted past this
+    
+    # Email (password reset links). Backend: "console" (stdout, development only),
+    # "file" (one .eml per message in email_file_dir), "smtp", or a custom
+    # "package.module:Class". Empty means console in development; elsewhere
+    # nothing is sent and emails stay queued until a backend is configured
+    email_backend: str = ""
+    email_from: str = "NoteKeeper <no-reply@notekeeper.local>"
+    email_file_dir: str = "./sent_emails"
+    smtp_host: str = "localhost"
+    smtp_port: int = 587
+    smtp_username: str = ""
+    smtp_password: str = ""
+    smtp_use_tls: bool = True
+    smtp_timeout: float = 10.0
+    password_reset_url: str = "http://localhost:5173/?token={token}"
+    
+    # Email outbox dispatcher
+    email_outbox_batch_size: int = 50
+    email_outbox_concurrency: int = 4  # Deliveries in flight per worker
+    email_outbox_poll_seconds: float = 5.0
+    email_outbox_max_attempts: int = 6
+    email_outbox_retry_base_seconds: float = 30.0  # Doubles after each failed attempt
+    email_outbox_lease_seconds: float = 120.0  # Claimed rows become due again after this
+    
     # CORS
     allowed_origins: str = "http://localhost:5173,http://localhost:5174,http://localhost:3000"
     
+    # Write-behind buffer for autosave note updates (PUT /api/notes/{id}?autosave=true)
+    note_write_behind_enabled: bool = False  # The buffer is per process, so the launcher requires WEB_CONCURRENCY=1
+    note_write_behind_quiet_ms: int = 2000  # Flush a note after this long without updates
+    note_write_behind_max_bytes: int = 8 * 1024 * 1024  # Flush everything when the buffer grows past this
+    
+    # Response compression (gzip/brotli) for bodies at or above this size in bytes
+    response_compression_min_size: int = 1024
+    
+    # Response cache for GET endpoints: "sqlite" (shared by workers on one host via
+    # response_cache_path), "memory" (per process, single worker only) or "none"
+    response_cache_backend: str = "sqlite"
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_path: str = "./response_cache.db"
+    
+    # Admission control: API requests are grouped (read, write, auth, search, bulk) and each
+    # group may run "limit" requests at once per worker; more wait in a bounded queue up to
+    # their timeout, or get 503 + Retry-After. Freed slots go to reads first, bulk last.
+    # Per-group values are "group=value" lists; all can be changed at runtime (PUT /api/admin/admission)
+    admission_enabled: bool = True
+    admission_max_concurrency: int = 40  # All groups together (the default threadpool size)
+    admission_limits: str = "read=40,write=16,auth=4,search=4,bulk=2"
+    admission_queue_sizes: str = "read=200,write=100,auth=32,search=16,bulk=8"
+    admission_queue_timeout_ms: str = "read=2000,write=5000,auth=5000,search=3000,bulk=10000"
+    
+    # Server-sent change events (GET /api/events)
+    events_max_streams: int = 1000  # Concurrent streams per worker; more are refused with 503
+    events_queue_size: int = 256  # Events queued per stream before its client is told to resync
+    events_replay_size: int = 100  # Recent events kept per user for Last-Event-ID resume
+    events_history_users: int = 1000  # Users whose recent events are kept (least recent dropped first)
+    events_heartbeat_seconds: float = 15.0
+    events_retry_ms: int = 3000  # Reconnect delay suggested to clients
+    
+    # Server launcher (python -m app.server)
+    host: str = "0.0.0.0"
+    port: int = 8080  # Overridden by the PORT environment variable when set
+    web_concurrency: int = 0  # Worker processes; 0 = one per CPU available (honours cgroup quotas)
+    max_requests: int = 0  # Recycle a worker after this many requests; 0 disables
+    max_requests_jitter: int = 0  # Random extra requests per worker so recycling is staggered
+    graceful_timeout: int = 30  # Seconds to drain in-flight requests on SIGTERM
+    worker_timeout: int = 60  # Kill and replace a worker whose event loop stops heartbeating this long
+    forwarded_allow_ips: str = "*"
+    
     # Environment
     environment: str = "development"
     
@@ -25,6 +141,11 @@ class Settings(BaseSettings):
         """Check if using SQLite database."""
         return self.database_url.startswith("sqlite")
     
+    @property
+    def is_sharded(self) -> bool:
+        """Check if user data is stored in per-user SQLite shards."""
+        return self.storage_mode == "sharded"
+    
     @property
     def cors_origins(self) -> List[str]:
         """Parse CORS origins from comma-separated string."""
@@ -1,26 +1,249 @@
-from sqlalchemy import create_engine
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.sharedctypes import RawArray
+
+from sqlalchemy import Column, String, Table, create_engine, event, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import get_settings
+from .services.query_log import explain, parameter_shape, query_log
 
 settings = get_settings()
 
-# Configure engine based on database type
-if settings.is_sqlite:
+
+def _create_engine(url: str, read_only: bool = False):
+    """Create an engine for the primary database or a read replica."""
+    if not url.startswith("sqlite"):
+        # PostgreSQL configuration
+        new_engine = create_engine(url)
+        _time_statements(new_engine)
+        return new_engine
+    
     # SQLite configuration
-    engine = create_engine(
-        settings.database_url,
+    new_engine = create_engine(
+        url,
         connect_args={"check_same_thread": False}  # Required for SQLite
     )
+    _time_statements(new_engine)
+
+    @event.listens_for(new_engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        """Enforce foreign keys so ON DELETE CASCADE works on SQLite.
+
+        WAL lets readers in other worker processes proceed while one writes, and
+        the busy timeout makes concurrent writers wait instead of failing.
+        Read-only connections are also marked query_only.
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+    return new_engine
+
+
+def _time_statements(new_engine) -> None:
+    """Time every statement into the query log; slow ones also get their plan captured."""
+    if not settings.query_log_enabled:
+        return
+
+    @event.listens_for(new_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(new_engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        fingerprint, needs_plan = query_log.record(statement, seconds)
+        if seconds < query_log.slow_seconds:
+            return
+        plan = None
+        if needs_plan and not executemany:
+            plan = explain(conn.connection.dbapi_connection, conn.dialect.name, statement, parameters)
+        query_log.record_slow(fingerprint, seconds, parameter_shape(parameters, executemany), plan)
+
+    @event.listens_for(new_engine, "handle_error")
+    def _drop_timer(exception_context):
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+engine = _create_engine(settings.database_url)
+
+# Reads go to a replica when one is configured, otherwise to the primary.
+# Sharded storage has no replicas; reads use the user's shard.
+if settings.database_read_url and not settings.is_sharded:
+    read_engine = _create_engine(settings.database_read_url, read_only=True)
 else:
-    # PostgreSQL configuration
-    engine = create_engine(settings.database_url)
+    read_engine = engine
+
+# Create session factories. Objects are not expired on commit: write paths get
+# generated values back via RETURNING, so re-reading them would be redundant.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine)
+
+
+class RecentWrites:
+    """Remembers which users wrote recently, so their reads can stick to the primary.
+
+    Write times live in shared memory created before the launcher forks, so
+    a write handled by one worker sends the user's next reads in every
+    worker to the primary. Users hash into ``slots`` entries; a collision
+    only sends a few more reads to the primary. Sessions opt in by setting
+    ``session.info["user_id"]``.
+    """
+
+    def __init__(self, window_seconds: float, slots: int):
+        self.window_seconds = window_seconds
+        # time.monotonic() is system-wide on Linux, so every worker reads the same clock
+        self._last_write = RawArray("d", max(slots, 1))
+        self.primary_reads = 0
+        self.replica_reads = 0
+
+    def mark(self, user_id: int) -> None:
+        self._last_write[user_id % len(self._last_write)] = time.monotonic()
+
+    def is_recent(self, user_id: int) -> bool:
+        last = self._last_write[user_id % len(self._last_write)]
+        return last > 0 and time.monotonic() - last < self.window_seconds
+
+    def stats(self) -> dict:
+        return {
+            "replica_configured": read_engine is not engine,
+            "sticky_window_seconds": self.window_seconds,
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+        }
+
+
+recent_writes = RecentWrites(settings.read_your_writes_seconds, settings.read_your_writes_slots)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_recent_write(session):
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        recent_writes.mark(session.info["user_id"])
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class for all models
 Base = declarative_base()
 
+# Fingerprint of the schema last created by init_db; lets startup skip create_all
+schema_version = Table(
+    "schema_version",
+    Base.metadata,
+    Column("version", String(64), primary_key=True),
+)
+
+
+# With sharded storage only these stay in the global DB; shards hold the rest
+GLOBAL_TABLES = {"users", "password_reset_tokens", "email_outbox", "schema_version"}
+# Shards also get a users table with a placeholder row for their owner, so
+# foreign keys to users.id still hold; the real account is in the global DB
+SHARD_EXCLUDED_TABLES = {"password_reset_tokens", "email_outbox"}
+
+
+class ShardPool:
+    """Bounded LRU pool of per-user SQLite engines for sharded storage."""
+
+    def __init__(self, directory: str, max_open: int):
+        self.directory = directory
+        self.max_open = max_open
+        self._engines: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.evicted = 0
+
+    def path(self, user_id: int) -> str:
+        return os.path.join(self.directory, f"user_{user_id}.db")
+
+    def engine_for(self, user_id: int):
+        """Engine for a user's shard, creating the file and schema on first use."""
+        with self._lock:
+            shard_engine = self._engines.get(user_id)
+            if shard_engine is not None:
+                self._engines.move_to_end(user_id)
+                return shard_engine
+
+        # Open outside the lock so one slow shard doesn't block the others
+        os.makedirs(self.directory, exist_ok=True)
+        shard_engine = _create_engine(f"sqlite:///{self.path(user_id)}")
+        _create_schema(shard_engine, shard_tables())
+        with shard_engine.begin() as conn:
+            users = Base.metadata.tables["users"]
+            conn.execute(
+                users.insert().prefix_with("OR IGNORE").values(id=user_id, email=f"user-{user_id}", password_hash="")
+            )
+
+        with self._lock:
+            existing = self._engines.get(user_id)
+            if existing is not None:
+                # Another thread opened it first
+                shard_engine.dispose()
+                self._engines.move_to_end(user_id)
+                return existing
+            self._engines[user_id] = shard_engine
+            self.opened += 1
+            while len(self._engines) > self.max_open:
+                # Checked-out connections stay usable and close when returned
+                _, evicted_engine = self._engines.popitem(last=False)
+                evicted_engine.dispose()
+                self.evicted += 1
+        return shard_engine
+
+    def user_ids(self) -> list[int]:
+        """IDs of every user that has a shard file."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            int(name[len("user_"):-len(".db")])
+            for name in os.listdir(self.directory)
+            if name.startswith("user_") and name.endswith(".db")
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            open_shards = len(self._engines)
+        return {
+            "enabled": settings.is_sharded,
+            "open": open_shards,
+            "max_open": self.max_open,
+            "opened": self.opened,
+            "evicted": self.evicted,
+        }
+
+
+shard_pool = ShardPool(settings.shard_dir, settings.shard_max_open)
+
+
+def session_for_user(user_id: int | None):
+    """New session on the database holding a user's books, chapters, notes and tags."""
+    if not settings.is_sharded:
+        return SessionLocal()
+    return SessionLocal(bind=shard_pool.engine_for(user_id))
+
+
+def data_owners() -> list[int | None]:
+    """Users with their own shard, or [None] for the single shared database.
+
+    Maintenance jobs pass each entry to session_for_user to visit all data.
+    """
+    return shard_pool.user_ids() if settings.is_sharded else [None]
+
 
 def get_db():
     """Dependency to get database session."""
@@ -31,7 +254,83 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """Initialize database tables."""
-    from .models import user, book, chapter, note, tag, password_reset  # noqa: F401
-    Base.metadata.create_all(bind=engine)
+def read_session_for(user_id: int | None, db):
+    """Session for a read on behalf of a user.
+
+    Uses the replica, except right after the user's own write (read-your-writes)
+    or when no replica is configured; then the given primary session is reused.
+    """
+    if read_engine is engine or (user_id is not None and recent_writes.is_recent(user_id)):
+        recent_writes.primary_reads += 1
+        return db
+    recent_writes.replica_reads += 1
+    return ReadSessionLocal()
+
+
+def global_tables() -> list[Table]:
+    """Tables created in the global (primary) database."""
+    if not settings.is_sharded:
+        return Base.metadata.sorted_tables
+    return [table for table in Base.metadata.sorted_tables if table.name in GLOBAL_TABLES]
+
+
+def shard_tables() -> list[Table]:
+    """Tables created in each per-user shard."""
+    return [table for table in Base.metadata.sorted_tables if table.name not in SHARD_EXCLUDED_TABLES]
+
+
+def schema_fingerprint(tables: list[Table] | None = None) -> str:
+    """Hash of every table, column, foreign key and index definition."""
+    # Revision 2: fingerprints recorded before migrations existed may sit on
+    # tables missing columns, so every database is checked once more.
+    # Revision 3: position columns got a collation, which the type repr omits
+    parts = ["revision:3"]
+    for table in tables if tables is not None else Base.metadata.sorted_tables:
+        parts.append(table.name)
+        for column in table.columns:
+            foreign_keys = sorted(f"{fk.target_fullname}:{fk.ondelete}" for fk in column.foreign_keys)
+            parts.append(f"{column.name}:{column.type!r}:{column.nullable}:{column.primary_key}:{foreign_keys}")
+        parts.extend(sorted(
+            f"{index.name}:{[column.name for column in index.columns]}:{index.unique}"
+            for index in table.indexes
+        ))
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def init_db() -> bool:
+    """Initialize database tables.
+
+    Skips create_all (one existence check per table) when the stored schema
+    fingerprint matches the models. Returns True if the schema was (re)created.
+    """
+    from .models import user, book, chapter, note, tag, password_reset, outbox, stats, attachment, revision  # noqa: F401
+    return _create_schema(engine, global_tables())
+
+
+def _create_schema(bind, tables: list[Table]) -> bool:
+    """Create or migrate the given tables unless the stored fingerprint already matches.
+
+    The fingerprint is only recorded once the database has every table,
+    column and index of the models.
+    """
+    from .migrations import migrate, schema_differences
+
+    fingerprint = schema_fingerprint(tables)
+    try:
+        with bind.connect() as conn:
+            if conn.execute(select(schema_version.c.version)).scalar() == fingerprint:
+                return False
+    except (OperationalError, ProgrammingError):
+        pass  # No schema_version table yet
+
+    Base.metadata.create_all(bind=bind, tables=tables)
+    with bind.begin() as conn:
+        changes = migrate(conn, tables)
+        if changes:
+            print(f"🛠️ Migrated {bind.url.database or bind.url}: {', '.join(changes)}")
+        missing = schema_differences(conn, tables)
+        if missing:
+            raise RuntimeError(f"Database schema doesn't match the models, missing: {', '.join(missing)}")
+        conn.execute(schema_version.delete())
+        conn.execute(schema_version.insert().values(version=fingerprint))
+    return True
@@ -1,10 +1,27 @@
+import os
+import sys
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from .config import get_settings
-from .database import init_db
-from .routers import auth_router, books_router, chapters_router, notes_router, tags_router
+from .database import init_db, recent_writes, shard_pool
+from .middleware.admission import AdmissionMiddleware, admission_controller
+from .middleware.compression import CompressionMiddleware, encoding_stats
+from .middleware.profiling import ProfilingMiddleware, profiling_stats
+from .middleware.query_context import QueryContextMiddleware
+from .services.cache import response_cache
+from .services.events import event_broker
+from .services.outbox import outbox_dispatcher
+from .services.purge import purge_pending_books
+from .services.write_behind import note_write_buffer
+from .utils.compression import compression_stats
+from .utils.passwords import password_hasher
+from .routers import (
+    auth_router, books_router, chapters_router, notes_router, tags_router, stats_router,
+    attachments_router, revisions_router, events_router, admin_router,
+)
 
 settings = get_settings()
 
@@ -12,11 +29,24 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler for startup and shutdown events."""
-    # Startup: Initialize database
-    init_db()
-    print("✅ Database initialized")
+    # Startup: Initialize database (skipped when the stored schema version matches)
+    if init_db():
+        print("✅ Database initialized")
+    else:
+        print("✅ Database schema up to date")
+    # Finish any book purges interrupted by a previous shutdown, without holding
+    # up startup; under the launcher only the first worker does it
+    if getattr(app.state, "resume_purges", True):
+        threading.Thread(target=purge_pending_books, name="purge-resume", daemon=True).start()
+    if settings.note_write_behind_enabled:
+        note_write_buffer.start()
+    outbox_dispatcher.start()
+    event_broker.start()
     yield
-    # Shutdown: Cleanup if needed
+    # Shutdown: Write any buffered autosaves before exiting
+    event_broker.close()
+    note_write_buffer.stop()
+    outbox_dispatcher.stop()
     print("👋 Shutting down...")
 
 
@@ -28,6 +58,13 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Compress large responses (gzip/brotli, including streaming bodies)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.response_compression_min_size)
+
+# Per-route-group concurrency limits; refused requests still get CORS headers
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -37,12 +74,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Attributes each SQL statement to the route that ran it, for the query log
+app.add_middleware(QueryContextMiddleware)
+
+# Sampling profiler for requests sent with the admin token in X-Profile (or 1 in N); outermost, so it sees everything
+app.add_middleware(
+    ProfilingMiddleware,
+    directory=settings.profile_dir,
+    interval_ms=settings.profile_interval_ms,
+    sample_rate=settings.profile_sample_rate,
+    keep_files=settings.profile_keep_files,
+)
+
 # Register routers
 app.include_router(auth_router)
 app.include_router(books_router)
 app.include_router(chapters_router)
 app.include_router(notes_router)
 app.include_router(tags_router)
+app.include_router(stats_router)
+app.include_router(attachments_router)
+app.include_router(revisions_router)
+app.include_router(events_router)
+app.include_router(admin_router)
 
 
 @app.get("/")
@@ -59,4 +113,27 @@ def root():
 @app.get("/health")
 def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"}
+    # Only set when running under the pre-forking launcher, which imports app.server
+    server = sys.modules.get("app.server")
+    workers = server.worker_health() if server is not None else None
+    if workers is None:
+        return {"status": "healthy"}
+    return {"status": "healthy", "worker_pid": os.getpid(), "workers": workers}
+
+
+@app.get("/metrics")
+def metrics():
+    """Runtime metrics for internal subsystems."""
+    return {
+        "note_compression": compression_stats.snapshot(),
+        "response_encoding": encoding_stats.snapshot(),
+        "response_cache": response_cache.stats(),
+        "note_write_behind": note_write_buffer.stats(),
+        "read_routing": recent_writes.stats(),
+        "shards": shard_pool.stats(),
+        "email_outbox": outbox_dispatcher.stats(),
+        "events": event_broker.stats(),
+        "request_profiles": profiling_stats.snapshot(),
+        "admission": admission_controller.stats(),
+        "password_hashing": password_hasher.stats(),
+    }
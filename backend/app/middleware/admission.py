@@ -0,0 +1,259 @@
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from multiprocessing.sharedctypes import RawArray
+
+from starlette import status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..config import Settings, get_settings
+
+settings = get_settings()
+
+# Route groups in priority order: when a slot frees up, earlier groups' waiters go first.
+# Each rule is (group, methods or None for any, path pattern); the first match wins.
+GROUPS = ("read", "write", "auth", "search", "bulk")
+ROUTE_RULES = [
+    # Long-lived streams and operator endpoints are never queued
+    (None, None, re.compile(r"^/api/(events|admin)(/|$)")),
+    ("search", {"GET"}, re.compile(r"^/api/notes/search$")),
+    # Password hashing (bcrypt) makes these the most CPU-heavy requests per call
+    ("auth", {"POST"}, re.compile(r"^/api/auth/(login|login/form|register|reset-password)$")),
+    ("bulk", {"POST"}, re.compile(r"^/api/(books|chapters)/\d+/clone$|^/api/(notes|chapters)/move$")),
+    # Attachment uploads and downloads hold their slot while the file streams
+    ("bulk", {"POST"}, re.compile(r"^/api/notes/\d+/attachments$")),
+    ("bulk", {"GET", "HEAD"}, re.compile(r"^/api/attachments/")),
+    ("read", {"GET", "HEAD"}, re.compile(r"^/api/")),
+    ("write", None, re.compile(r"^/api/")),
+]
+
+
+def classify(method: str, path: str) -> str | None:
+    """Route group of a request, or None if admission control doesn't apply to it."""
+    for group, methods, pattern in ROUTE_RULES:
+        if (methods is None or method in methods) and pattern.search(path):
+            return group
+    return None
+
+
+def _parse_group_values(spec: str, name: str) -> dict[str, float]:
+    """Parse "read=32,search=4" into {"read": 32.0, "search": 4.0}."""
+    values: dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        group, _, value = item.partition("=")
+        group = group.strip()
+        if group not in GROUPS:
+            raise ValueError(f"Unknown admission group {group!r} in {name}; expected one of {', '.join(GROUPS)}")
+        values[group] = float(value)
+    return values
+
+
+def _group_setting(field: str) -> dict[str, float]:
+    """Per-group values of a setting; groups it leaves out keep their default."""
+    defaults = _parse_group_values(Settings.model_fields[field].default, field.upper())
+    return {**defaults, **_parse_group_values(getattr(settings, field), field.upper())}
+
+
+class _Group:
+    """Waiters and counters for one route group. Limits live in the controller's shared array."""
+
+    def __init__(self, name: str, priority: int):
+        self.name = name
+        self.priority = priority
+        self.active = 0
+        self.waiting: deque[tuple[asyncio.Future, float]] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.peak_waiting = 0
+        self.waited = 0  # Admitted after queueing
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.service_seconds = 0.0  # Moving average of time from admission to response end
+
+
+class AdmissionController:
+    """Per-worker concurrency limits with bounded, deadline-limited wait queues.
+
+    Each route group may run ``limit`` requests at once, and all groups
+    together ``max_concurrency``. A request that can't start waits in its
+    group's queue up to ``timeout_ms``; when the queue already holds
+    ``queue_size`` requests it is refused at once. A freed slot goes to the
+    highest-priority group with waiters. A limit of 0 refuses the group
+    entirely.
+
+    Limits are kept in shared memory created before the launcher forks, so
+    a change made through one worker applies to all of them. Queues and
+    counters are per worker and only touched on its event loop.
+    """
+
+    def __init__(self, max_concurrency: int, limits: dict, queue_sizes: dict, timeouts_ms: dict):
+        self.groups = {name: _Group(name, priority) for priority, name in enumerate(GROUPS)}
+        # [max_concurrency, then limit, queue_size, timeout_ms for each group]
+        self._limits = RawArray("d", 1 + 3 * len(GROUPS))
+        self._limits[0] = max_concurrency
+        for index, name in enumerate(GROUPS):
+            self._limits[1 + 3 * index] = limits.get(name, max_concurrency)
+            self._limits[2 + 3 * index] = queue_sizes.get(name, 0)
+            self._limits[3 + 3 * index] = timeouts_ms.get(name, 0)
+        self.active = 0
+
+    @property
+    def max_concurrency(self) -> int:
+        return int(self._limits[0])
+
+    def limits(self, name: str) -> dict:
+        offset = 1 + 3 * GROUPS.index(name)
+        return {
+            "limit": int(self._limits[offset]),
+            "queue_size": int(self._limits[offset + 1]),
+            "timeout_ms": int(self._limits[offset + 2]),
+        }
+
+    def update(self, max_concurrency: int | None = None, groups: dict[str, dict] | None = None) -> None:
+        """Change limits for every worker. Call on the event loop, so waiters can be admitted at once."""
+        if max_concurrency is not None:
+            self._limits[0] = max_concurrency
+        for name, values in (groups or {}).items():
+            offset = 1 + 3 * GROUPS.index(name)
+            for position, key in enumerate(("limit", "queue_size", "timeout_ms")):
+                if values.get(key) is not None:
+                    self._limits[offset + position] = values[key]
+        self._dispatch()
+
+    def _can_start(self, group: _Group) -> bool:
+        return group.active < self._limits[1 + 3 * group.priority] and self.active < self._limits[0]
+
+    def _start(self, group: _Group) -> None:
+        group.active += 1
+        group.admitted += 1
+        self.active += 1
+
+    async def acquire(self, group: _Group) -> bool:
+        """Wait for a slot in the group. False means the request should be refused."""
+        # Other workers may have raised limits since this one last released a slot
+        self._dispatch()
+        # Waiters of the same group go first; other groups only wait on their own limit
+        if not group.waiting and self._can_start(group):
+            self._start(group)
+            return True
+
+        limits = self.limits(group.name)
+        if limits["limit"] <= 0 or len(group.waiting) >= limits["queue_size"]:
+            group.rejected += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, time.perf_counter())
+        group.waiting.append(entry)
+        group.queued += 1
+        group.peak_waiting = max(group.peak_waiting, len(group.waiting))
+        try:
+            await asyncio.wait_for(future, limits["timeout_ms"] / 1000)
+            return True
+        except asyncio.TimeoutError:
+            group.timed_out += 1
+            return False
+        except BaseException:
+            # Client went away; give back the slot if it had just been granted
+            if future.done() and not future.cancelled():
+                self.release(group, 0.0)
+            raise
+        finally:
+            try:
+                group.waiting.remove(entry)
+            except ValueError:
+                pass  # Already taken off the queue by _dispatch
+
+    def release(self, group: _Group, seconds: float) -> None:
+        group.active -= 1
+        self.active -= 1
+        if seconds:
+            group.service_seconds = seconds if not group.service_seconds else (
+                0.9 * group.service_seconds + 0.1 * seconds
+            )
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters, highest-priority group first."""
+        now = time.perf_counter()
+        for group in self.groups.values():
+            while group.waiting and self._can_start(group):
+                future, queued_at = group.waiting.popleft()
+                if future.done():
+                    continue  # Timed out or cancelled
+                self._start(group)
+                waited = now - queued_at
+                group.waited += 1
+                group.wait_seconds += waited
+                group.max_wait_seconds = max(group.max_wait_seconds, waited)
+                future.set_result(None)
+
+    def retry_after(self, group: _Group) -> int:
+        """Seconds a refused client should wait: roughly how long the queue ahead takes to drain."""
+        limit = max(self.limits(group.name)["limit"], 1)
+        estimate = group.service_seconds * (len(group.waiting) + 1) / limit
+        return min(max(math.ceil(estimate), 1), 60)
+
+    def stats(self) -> dict:
+        groups = {}
+        for name, group in self.groups.items():
+            groups[name] = {
+                **self.limits(name),
+                "active": group.active,
+                "waiting": len(group.waiting),
+                "peak_waiting": group.peak_waiting,
+                "admitted": group.admitted,
+                "queued": group.queued,
+                "rejected": group.rejected,
+                "timed_out": group.timed_out,
+                "mean_wait_ms": round(group.wait_seconds / group.waited * 1000, 2) if group.waited else 0.0,
+                "max_wait_ms": round(group.max_wait_seconds * 1000, 2),
+                "service_ms": round(group.service_seconds * 1000, 2),
+            }
+        return {"max_concurrency": self.max_concurrency, "active": self.active, "groups": groups}
+
+
+admission_controller = AdmissionController(
+    max_concurrency=settings.admission_max_concurrency,
+    limits=_group_setting("admission_limits"),
+    queue_sizes=_group_setting("admission_queue_sizes"),
+    timeouts_ms=_group_setting("admission_queue_timeout_ms"),
+)
+
+
+class AdmissionMiddleware:
+    """Admit API requests through the admission controller, refusing them with 503 under overload.
+
+    A request holds its slot until its response has been sent.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        name = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        group = self.controller.groups[name]
+        if not await self.controller.acquire(group):
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.controller.retry_after(group))}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(group, time.perf_counter() - started)
@@ -0,0 +1,185 @@
+import threading
+import time
+import zlib
+from importlib.util import find_spec
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..utils.encoding import header_qualities
+
+# Optional dependency (gzip only without it), imported on first use to keep startup fast
+HAS_BROTLI = find_spec("brotli") is not None
+
+# Streams that must reach the client unbuffered, or are already compressed
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+class EncodingStats:
+    """Thread-safe per-encoding counters for bytes on the wire and CPU time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _entry(self, encoding: str) -> dict:
+        return self._stats.setdefault(
+            encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+        )
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, seconds: float) -> None:
+        with self._lock:
+            entry = self._entry(encoding)
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["cpu_seconds"] += seconds
+
+    def count_response(self, encoding: str) -> None:
+        with self._lock:
+            self._entry(encoding)["responses"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                encoding: {
+                    **entry,
+                    "cpu_seconds": round(entry["cpu_seconds"], 6),
+                    "ratio": round(entry["bytes_in"] / entry["bytes_out"], 3) if entry["bytes_out"] else None,
+                }
+                for encoding, entry in self._stats.items()
+            }
+
+
+encoding_stats = EncodingStats()
+
+
+class _Compressor:
+    """Incremental gzip or brotli compressor that supports per-chunk flushing."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            import brotli
+
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        start = time.perf_counter()
+        if self.encoding == "br":
+            out = self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        else:
+            out = self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        encoding_stats.record(self.encoding, len(data), len(out), time.perf_counter() - start)
+        return out
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Pick the supported content coding the client rates highest in Accept-Encoding.
+
+    Ties go to brotli. None means send the body as is, including when the
+    client rates identity above every supported coding.
+    """
+    offered = header_qualities(accept_encoding)
+    supported = ["br", "gzip"] if HAS_BROTLI else ["gzip"]
+    best = max(supported, key=lambda name: offered.get(name, offered.get("*", 0)))
+    quality = offered.get(best, offered.get("*", 0))
+    if quality <= 0 or quality < offered.get("identity", 0):
+        return None
+    return best
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip above a size threshold.
+
+    Streaming bodies (e.g. StreamingResponse) are compressed chunk by chunk and
+    flushed after each chunk, so clients still receive data incrementally.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-request send wrapper that decides whether and how to compress."""
+
+    def __init__(self, send: Send, encoding: str, middleware: CompressionMiddleware):
+        self._send = send
+        self.encoding = encoding
+        self.middleware = middleware
+        self.start_message: Message | None = None
+        self.compressor: _Compressor | None = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "").lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 206, 304)
+                or content_type.startswith(EXCLUDED_CONTENT_TYPES)
+            )
+            if self.passthrough:
+                await self._send(message)
+            else:
+                # Hold the headers until we've seen the first body chunk
+                self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            if self.start_message is not None:
+                # e.g. http.response.pathsend: file responses go out uncompressed
+                start, self.start_message = self.start_message, None
+                self.passthrough = True
+                await self._send(start)
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            encoding_stats.count_response(self.encoding)
+            body = self.compressor.compress(body, final=not more_body)
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        body = self.compressor.compress(body, final=not more_body)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,269 @@
+import contextvars
+import os
+import random
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..utils.security import get_current_user, is_admin_token
+
+try:
+    from anyio._backends._asyncio import WorkerThread
+    # Threadpool work runs as context.run(func) inside this method, in a copy of the request's context
+    _WORKER_RUN_CODE = WorkerThread.run.__code__
+except (ImportError, AttributeError):  # Samples from worker threads can't be attributed
+    _WORKER_RUN_CODE = None
+
+# The request being profiled, visible to its work on the event loop and in the threadpool
+_current_profile: contextvars.ContextVar["RequestProfile | None"] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+CATEGORIES = ("auth", "sql", "orm", "serialization", "other")
+_AUTH_CODE = get_current_user.__code__
+_PATH_PREFIXES = sorted(
+    {sysconfig.get_paths()["purelib"], sysconfig.get_paths()["stdlib"], os.getcwd()}, key=len, reverse=True
+)
+
+
+def _category(stack: tuple) -> str:
+    """What a sampled stack (outermost frame first) was spending time on."""
+    if _AUTH_CODE in stack:
+        return "auth"
+    for code in reversed(stack):
+        path = code.co_filename
+        if "/sqlalchemy/engine/" in path or "/sqlalchemy/pool/" in path or "/sqlalchemy/dialects/" in path:
+            return "sql"
+        if "/sqlalchemy/" in path:
+            return "orm"  # Hydrating rows into objects, and compiling statements
+        if "/pydantic" in path or "/fastapi/_compat" in path or path.endswith(("fastapi/encoders.py", "json/encoder.py")):
+            return "serialization"
+    return "other"
+
+
+def _frame_name(code) -> str:
+    path = code.co_filename
+    for prefix in _PATH_PREFIXES:
+        if path.startswith(prefix):
+            path = path[len(prefix):].lstrip("/")
+            break
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    """Stack samples taken while one request was being handled, weighted in microseconds."""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.loop_thread = threading.get_ident()
+        self.stacks: dict[tuple, int] = {}
+        self.started = time.perf_counter()
+
+    def add(self, stack: tuple, microseconds: int) -> None:
+        self.stacks[stack] = self.stacks.get(stack, 0) + microseconds
+
+    def category_microseconds(self) -> dict[str, int]:
+        counts = dict.fromkeys(CATEGORIES, 0)
+        for stack, count in list(self.stacks.items()):
+            counts[_category(stack)] += count
+        return counts
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: estimated milliseconds per category and the total so far."""
+        timings = [
+            f"{category};dur={microseconds / 1000:.1f}"
+            for category, microseconds in self.category_microseconds().items() if microseconds
+        ]
+        timings.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(timings)
+
+    def collapsed(self) -> str:
+        """Collapsed stacks ("outer;...;inner microseconds"), as read by flamegraph.pl and speedscope."""
+        return "".join(
+            ";".join(_frame_name(code) for code in stack) + f" {count}\n"
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1])
+        )
+
+    def save(self, directory: str, keep: int) -> str:
+        """Write the collapsed stacks to a new file and prune the oldest files past ``keep``."""
+        os.makedirs(directory, exist_ok=True)
+        slug = self.path.strip("/").replace("/", "_") or "root"
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.method}-{slug}-{self.id}.collapsed")
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+
+        files = sorted(
+            (entry for entry in os.scandir(directory) if entry.name.endswith(".collapsed")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in files[:max(len(files) - keep, 0)]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        return path
+
+
+class Sampler:
+    """Background thread that samples the stacks of every request being profiled.
+
+    A thread's stack belongs to a request if it is the event loop running
+    that request's middleware frame, or a threadpool worker running in the
+    request's context. The thread only runs while there is something to
+    profile.
+
+    Samples are weighted by the time since the previous one. The sampler
+    needs the GIL, so it gets in late while Python code runs and on time
+    while C code (e.g. the database driver) has released it; counting
+    samples alone would overstate time spent in C.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: set[RequestProfile] = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        # A gap longer than this means no sampled thread was busy, not one long stretch of work
+        max_weight = max(self.interval, sys.getswitchinterval()) * 2
+        last_tick = time.perf_counter()
+        while True:
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles)
+
+            now = time.perf_counter()
+            weight = int(min(now - last_tick, max_weight) * 1_000_000)
+            last_tick = now
+            frames = sys._current_frames()
+            for thread_id, frame in frames.items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame)
+                    frame = frame.f_back
+                profile = self._owner(thread_id, stack, profiles)
+                if profile is not None:
+                    profile.add(tuple(frame.f_code for frame in reversed(stack)), weight)
+            # Don't keep frames (and their locals) alive between samples
+            frames = stack = frame = None
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _owner(thread_id: int, stack: list, profiles: list[RequestProfile]) -> RequestProfile | None:
+        for frame in stack:
+            if frame.f_code is _MIDDLEWARE_CODE:
+                profile = frame.f_locals.get("profile")
+                if profile in profiles and profile.loop_thread == thread_id:
+                    return profile
+            elif frame.f_code is _WORKER_RUN_CODE:
+                context = frame.f_locals.get("context")
+                profile = context.get(_current_profile) if context is not None else None
+                return profile if profile in profiles else None
+        return None
+
+
+class ProfilingStats:
+    """Totals across profiled requests, by category."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.profiles = 0
+        self.microseconds = dict.fromkeys(CATEGORIES, 0)
+
+    def record(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self.profiles += 1
+            for category, microseconds in profile.category_microseconds().items():
+                self.microseconds[category] += microseconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = sum(self.microseconds.values())
+            return {
+                "profiles": self.profiles,
+                "ms": {category: round(microseconds / 1000, 1) for category, microseconds in self.microseconds.items()},
+                "share": {
+                    category: round(microseconds / total, 3) for category, microseconds in self.microseconds.items()
+                } if total else {},
+            }
+
+
+profiling_stats = ProfilingStats()
+
+
+class ProfilingMiddleware:
+    """Profile individual requests with a sampling profiler.
+
+    A request is profiled when its X-Profile header carries the admin token,
+    or at random for 1 in ``sample_rate`` requests. Each profile is saved to
+    ``directory`` as a collapsed-stack file. Requested profiles also get
+    X-Profile-Id and a Server-Timing header estimating the time spent in
+    auth, SQL, ORM, serialization and everything else.
+    """
+
+    def __init__(self, app: ASGIApp, directory: str, interval_ms: float = 5.0, sample_rate: int = 0,
+                 keep_files: int = 500):
+        self.app = app
+        self.directory = directory
+        self.sampler = Sampler(interval_ms / 1000)
+        self.sample_rate = sample_rate
+        self.keep_files = keep_files
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = is_admin_token(Headers(scope=scope).get("x-profile"))
+        if not requested and not (self.sample_rate > 0 and random.randrange(self.sample_rate) == 0):
+            await self.app(scope, receive, send)
+            return
+
+        # The sampler finds this request's frames on the event loop by this local
+        profile = RequestProfile(scope["method"], scope["path"])
+        context_token = _current_profile.set(profile)
+
+        async def send_with_timing(message: Message) -> None:
+            if requested and message["type"] == "http.response.start":
+                # Covers the work up to the response headers
+                headers = MutableHeaders(scope=message)
+                headers["Server-Timing"] = profile.server_timing()
+                headers["X-Profile-Id"] = profile.id
+            await send(message)
+
+        self.sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            self.sampler.remove(profile)
+            _current_profile.reset(context_token)
+            profiling_stats.record(profile)
+            await run_in_threadpool(profile.save, self.directory, self.keep_files)
+
+
+_MIDDLEWARE_CODE = ProfilingMiddleware.__call__.__code__
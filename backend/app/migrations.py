@@ -0,0 +1,272 @@
+"""Bring tables created by earlier versions up to the current models.
+
+create_all only creates missing tables; it never changes existing ones. For
+those, migrate() adds the missing columns, fills them in from existing data
+and creates the missing indexes. Columns are added as nullable (SQLite can't
+add a NOT NULL column without a default) and, where the database allows it,
+made NOT NULL once backfilled.
+"""
+from itertools import groupby
+
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import Table
+
+from .utils.compression import COMPRESSION_MARKER, decode_text
+from .utils.positions import spread_keys
+
+BATCH_SIZE = 500
+
+# Columns earlier versions added that the models no longer have; dropped so their data doesn't linger
+DROPPED_COLUMNS = [
+    ("notes", "search_text"),  # Replaced by the much smaller search_signature
+]
+
+# Columns whose collation the models set, changed on existing tables where
+# the database supports it (see app.utils.positions.POSITION_TYPE)
+COLLATED_COLUMNS = [
+    ("chapters", "position"),
+    ("notes", "position"),
+]
+
+
+def _add_column(conn: Connection, table: Table, column) -> None:
+    preparer = conn.dialect.identifier_preparer
+    ddl = (f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+           f"{preparer.format_column(column)} {column.type.compile(dialect=conn.dialect)}")
+    for fk in column.foreign_keys:
+        target = fk.column
+        ddl += f" REFERENCES {preparer.format_table(target.table)} ({preparer.format_column(target)})"
+        if fk.ondelete:
+            ddl += f" ON DELETE {fk.ondelete}"
+    conn.execute(text(ddl))
+
+
+def _drop_column(conn: Connection, table: Table, name: str) -> None:
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} DROP COLUMN {preparer.quote(name)}"))
+
+
+def _set_collation(conn: Connection, table: Table, column) -> bool:
+    """Give an existing column the collation of its model type. Returns True if it changed."""
+    collation = getattr(column.type.dialect_impl(conn.dialect), "collation", None)
+    if conn.dialect.name != "postgresql" or collation is None:
+        return False
+    current = conn.execute(
+        text("SELECT collation_name FROM information_schema.columns WHERE table_name = :table AND column_name = :column"),
+        {"table": table.name, "column": column.name},
+    ).scalar()
+    if current == collation:
+        return False
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(text(
+        f"ALTER TABLE {preparer.format_table(table)} ALTER COLUMN {preparer.format_column(column)} "
+        f"TYPE {column.type.compile(dialect=conn.dialect)}"
+    ))
+    return True
+
+
+def _set_not_null(conn: Connection, table: Table, column) -> None:
+    if conn.dialect.name == "sqlite":
+        return  # Not supported by ALTER TABLE; the models still never write NULL
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(text(
+        f"ALTER TABLE {preparer.format_table(table)} ALTER COLUMN {preparer.format_column(column)} SET NOT NULL"
+    ))
+
+
+def _backfill_owner(conn: Connection, table: Table, parent: Table, parent_column) -> None:
+    """Copy user_id from each row's parent (chapters from books, notes from chapters)."""
+    conn.execute(
+        update(table)
+        .where(table.c.user_id.is_(None))
+        .values(
+            user_id=select(parent.c.user_id).where(parent.c.id == parent_column).scalar_subquery(),
+            updated_at=table.c.updated_at,
+        )
+    )
+
+
+def _backfill_deleted(conn: Connection, table: Table, parent: Table, parent_column) -> None:
+    """Copy deleted_at from each row's parent, for books whose background purge is pending."""
+    conn.execute(
+        update(table)
+        .where(table.c.deleted_at.is_(None))
+        .values(
+            deleted_at=select(parent.c.deleted_at).where(parent.c.id == parent_column).scalar_subquery(),
+            updated_at=table.c.updated_at,
+        )
+    )
+
+
+def _backfill_version(conn: Connection, table: Table) -> None:
+    conn.execute(update(table).where(table.c.version.is_(None)).values(version=1, updated_at=table.c.updated_at))
+
+
+def _backfill_note_summary(conn: Connection, notes: Table) -> None:
+    """Compute preview and content_length from each note's (possibly compressed) content."""
+    from .models.note import make_preview
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(notes.c.id, notes.c.content).where(notes.c.id > last_id).order_by(notes.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        contents = [(row.id, decode_text(row.content)) for row in rows]
+        conn.execute(
+            update(notes)
+            .where(notes.c.id == bindparam("row_id"))
+            .values(preview=bindparam("row_preview"), content_length=bindparam("row_length"),
+                    updated_at=notes.c.updated_at),
+            [{"row_id": note_id, "row_preview": make_preview(content), "row_length": len(content)}
+             for note_id, content in contents],
+        )
+        last_id = rows[-1].id
+
+
+def _backfill_note_sizes(conn: Connection, notes: Table) -> None:
+    """Compute word_count and storage_bytes from each note's (possibly compressed) content."""
+    from .models.note import count_words
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(notes.c.id, notes.c.content).where(notes.c.id > last_id).order_by(notes.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        contents = [(row.id, decode_text(row.content)) for row in rows]
+        conn.execute(
+            update(notes)
+            .where(notes.c.id == bindparam("row_id"))
+            .values(word_count=bindparam("row_words"), storage_bytes=bindparam("row_bytes"),
+                    updated_at=notes.c.updated_at),
+            [{"row_id": note_id, "row_words": count_words(content), "row_bytes": len(content.encode("utf-8"))}
+             for note_id, content in contents],
+        )
+        last_id = rows[-1].id
+
+
+def _backfill_search_signature(conn: Connection, notes: Table) -> None:
+    """Sign compressed bodies (plain ones are searched directly)."""
+    from .models.note import make_search_signature
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(notes.c.id, notes.c.content)
+            .where(notes.c.id > last_id, notes.c.content.startswith(COMPRESSION_MARKER))
+            .order_by(notes.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        conn.execute(
+            update(notes)
+            .where(notes.c.id == bindparam("row_id"))
+            .values(search_signature=bindparam("row_signature"), updated_at=notes.c.updated_at),
+            [{"row_id": row.id, "row_signature": make_search_signature(decode_text(row.content), row.content)}
+             for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def _backfill_positions(conn: Connection, table: Table, parent_column, *order_by) -> None:
+    """Give each parent's rows evenly spaced keys, in the order they used to be listed in."""
+    rows = conn.execute(select(table.c.id, parent_column).order_by(parent_column, *order_by)).all()
+    updates = []
+    for _, siblings in groupby(rows, key=lambda row: row[1]):
+        ids = [row.id for row in siblings]
+        updates.extend({"row_id": row_id, "row_position": key} for row_id, key in zip(ids, spread_keys(len(ids))))
+    if updates:
+        conn.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(position=bindparam("row_position"), updated_at=table.c.updated_at),
+            updates,
+        )
+
+
+def _backfills(tables: dict[str, Table]) -> list[tuple[str, str, callable]]:
+    """(table, column, fill) for every column added since the first release, in dependency order."""
+    books, chapters, notes = tables.get("books"), tables.get("chapters"), tables.get("notes")
+    return [
+        ("chapters", "user_id", lambda conn: _backfill_owner(conn, chapters, books, chapters.c.book_id)),
+        # Depends on chapters.user_id
+        ("notes", "user_id", lambda conn: _backfill_owner(conn, notes, chapters, notes.c.chapter_id)),
+        ("chapters", "deleted_at", lambda conn: _backfill_deleted(conn, chapters, books, chapters.c.book_id)),
+        # Depends on chapters.deleted_at
+        ("notes", "deleted_at", lambda conn: _backfill_deleted(conn, notes, chapters, notes.c.chapter_id)),
+        ("notes", "version", lambda conn: _backfill_version(conn, notes)),
+        ("books", "version", lambda conn: _backfill_version(conn, books)),
+        ("chapters", "version", lambda conn: _backfill_version(conn, chapters)),
+        ("notes", "preview", lambda conn: _backfill_note_summary(conn, notes)),
+        ("notes", "search_signature", lambda conn: _backfill_search_signature(conn, notes)),
+        # Fills storage_bytes too; both columns were added together
+        ("notes", "word_count", lambda conn: _backfill_note_sizes(conn, notes)),
+        # Chapters were listed by creation, notes newest first
+        ("chapters", "position", lambda conn: _backfill_positions(
+            conn, chapters, chapters.c.book_id, chapters.c.created_at, chapters.c.id)),
+        ("notes", "position", lambda conn: _backfill_positions(
+            conn, notes, notes.c.chapter_id, notes.c.created_at.desc(), notes.c.id.desc())),
+    ]
+
+
+def migrate(conn: Connection, tables: list[Table]) -> list[str]:
+    """Add missing columns and indexes to existing tables, set collations and drop retired columns. Returns what changed."""
+    inspector = inspect(conn)
+    added_columns: set[tuple[str, str]] = set()
+    changes = []
+    for table in tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                _add_column(conn, table, column)
+                added_columns.add((table.name, column.name))
+                changes.append(f"added {table.name}.{column.name}")
+        for table_name, column_name in DROPPED_COLUMNS:
+            if table_name == table.name and column_name in existing:
+                _drop_column(conn, table, column_name)
+                changes.append(f"dropped {table.name}.{column_name}")
+
+    by_name = {table.name: table for table in tables}
+    for table_name, column_name, fill in _backfills(by_name):
+        if (table_name, column_name) in added_columns:
+            fill(conn)
+
+    for table_name, column_name in added_columns:
+        column = by_name[table_name].c[column_name]
+        if not column.nullable:
+            _set_not_null(conn, by_name[table_name], column)
+
+    for table_name, column_name in COLLATED_COLUMNS:
+        table = by_name.get(table_name)
+        if table is not None and _set_collation(conn, table, table.c[column_name]):
+            changes.append(f"collated {table_name}.{column_name}")
+
+    inspector = inspect(conn)
+    for table in tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                changes.append(f"added index {index.name}")
+    return changes
+
+
+def schema_differences(conn: Connection, tables: list[Table]) -> list[str]:
+    """Tables, columns and indexes the models define but the database lacks."""
+    inspector = inspect(conn)
+    missing = []
+    for table in tables:
+        if not inspector.has_table(table.name):
+            missing.append(table.name)
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in columns)
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(f"index {index.name}" for index in table.indexes if index.name not in indexes)
+    return missing
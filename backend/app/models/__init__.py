@@ -3,5 +3,13 @@ from .book import Book
 from .chapter import Chapter
 from .note import Note
 from .tag import Tag
+from .outbox import OutboxEmail
+from .stats import UserStats, BookStats, ChapterStats, DailyStats
+from .attachment import Attachment
+from .revision import NoteRevision
 
-__all__ = ["User", "Book", "Chapter", "Note", "Tag"]
+__all__ = [
+    "User", "Book", "Chapter", "Note", "Tag", "OutboxEmail",
+    "UserStats", "BookStats", "ChapterStats", "DailyStats", "Attachment",
+    "NoteRevision",
+]
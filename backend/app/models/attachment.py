@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class Attachment(Base):
+    """Attachment model - a file attached to a note.
+
+    The bytes live on disk under their SHA-256 (see app.services.attachments),
+    so identical files are stored once however many rows point at them.
+    """
+    
+    __tablename__ = "attachments"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(255), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    note = relationship("Note")
+    
+    # Fetch server-generated timestamps with INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+    
+    __table_args__ = (
+        Index("ix_attachments_user_id_note_id", "user_id", "note_id"),
+        # Download authorization and garbage collection look files up by hash
+        Index("ix_attachments_user_id_sha256", "user_id", "sha256"),
+    )
+    
+    def __repr__(self):
+        return f"<Attachment(id={self.id}, filename='{self.filename}')>"
@@ -12,17 +12,17 @@ class Book(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False, default=1)  # Bumped on every update (optimistic concurrency)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)  # Set while a background purge is pending
     
     # Relationships
     owner = relationship("User", back_populates="books")
-    chapters = relationship("Chapter", back_populates="book", cascade="all, delete-orphan")
+    chapters = relationship("Chapter", back_populates="book", cascade="all, delete-orphan", passive_deletes=True)
     
-    @property
-    def note_count(self) -> int:
-        """Calculate total notes in this book."""
-        return sum(len(chapter.notes) for chapter in self.chapters)
+    # eager_defaults fetches server-generated timestamps with RETURNING
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
     
     def __repr__(self):
         return f"<Book(id={self.id}, name='{self.name}')>"
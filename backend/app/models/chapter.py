@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
+from ..utils.positions import POSITION_TYPE
 
 
 class Chapter(Base):
@@ -12,12 +13,30 @@ class Chapter(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    # Denormalized owner (same as book.user_id) so ownership checks skip the join
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Fractional key for manual ordering within the book (see app.utils.positions)
+    position = Column(POSITION_TYPE, nullable=False)
+    version = Column(Integer, nullable=False, default=1)  # Bumped on every update (optimistic concurrency)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Copied from the book when it is deleted in the background, so lookups needn't join it
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Row this one was copied from, if any; pairs clones with their sources (see app.services.clone)
+    cloned_from_id = Column(Integer, nullable=True)
     
     # Relationships
     book = relationship("Book", back_populates="chapters")
-    notes = relationship("Note", back_populates="chapter", cascade="all, delete-orphan")
+    notes = relationship("Note", back_populates="chapter", cascade="all, delete-orphan", passive_deletes=True)
+    
+    # eager_defaults fetches server-generated timestamps with RETURNING
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
+    
+    __table_args__ = (
+        Index("ix_chapters_user_id_id", "user_id", "id"),
+        # Lists a book's chapters in position order
+        Index("ix_chapters_user_id_book_id_position", "user_id", "book_id", "position"),
+    )
     
     def __repr__(self):
         return f"<Chapter(id={self.id}, name='{self.name}')>"
@@ -1,7 +1,37 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+import re
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, type_coerce
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from ..database import Base
+from ..utils.compression import CompressedText, decode_text, encode_text, is_compressed
+from ..utils.positions import POSITION_TYPE
+from ..utils.signatures import make_signature
+
+PREVIEW_LENGTH = 200
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def make_preview(content: str, length: int = PREVIEW_LENGTH) -> str:
+    """Build a plain-text preview of a note body (HTML tags stripped)."""
+    text = _WHITESPACE_RE.sub(" ", _TAG_RE.sub(" ", content)).strip()
+    return text[:length]
+
+
+def count_words(content: str) -> int:
+    """Number of words in a note body, ignoring HTML tags."""
+    return len(_TAG_RE.sub(" ", content).split())
+
+
+def make_search_signature(content: str, stored: str) -> str | None:
+    """Trigram signature of a body that is stored compressed (see app.utils.signatures).
+
+    Bodies stored as plain text are matched directly with LIKE and get None.
+    """
+    return make_signature(content) if is_compressed(stored) else None
 
 
 class Note(Base):
@@ -10,13 +40,67 @@ class Note(Base):
     __tablename__ = "notes"
     
     id = Column(Integer, primary_key=True, index=True)
-    content = Column(Text, nullable=False)
+    # Body in its stored form (see app.utils.compression); read and write it through ``content``
+    stored_content = Column("content", Text, nullable=False)
+    preview = Column(String(PREVIEW_LENGTH), nullable=False, default="")  # Kept in sync with content
+    content_length = Column(Integer, nullable=False, default=0)  # Length of content in characters
+    word_count = Column(Integer, nullable=False, default=0)  # See count_words; kept for the stats rollups
+    storage_bytes = Column(Integer, nullable=False, default=0)  # UTF-8 size of content
+    # Search filter for compressed bodies (see make_search_signature); loaded only when asked for
+    search_signature = deferred(Column(Text, nullable=True))
+    version = Column(Integer, nullable=False, default=1)  # Bumped on every update (optimistic concurrency)
     chapter_id = Column(Integer, ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False)
+    # Denormalized owner (same as chapter.book.user_id) so ownership checks skip the joins
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Fractional key for manual ordering within the chapter (see app.utils.positions)
+    position = Column(POSITION_TYPE, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Copied from the book when it is deleted in the background, so lookups needn't join it
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Row this one was copied from, if any; pairs clones with their sources (see app.services.clone)
+    cloned_from_id = Column(Integer, nullable=True)
     
     # Relationships
     chapter = relationship("Chapter", back_populates="notes")
     
+    # eager_defaults fetches server-generated timestamps with RETURNING
+    __mapper_args__ = {"version_id_col": version, "eager_defaults": True}
+    
+    __table_args__ = (
+        Index("ix_notes_user_id_id", "user_id", "id"),
+        # Lists a chapter's notes in position order
+        Index("ix_notes_user_id_chapter_id_position", "user_id", "chapter_id", "position"),
+    )
+    
+    @hybrid_property
+    def content(self) -> str | None:
+        """The body, decompressed on first read (rows loaded without reading it are never decoded)."""
+        stored = self.stored_content
+        if stored is None:
+            return None
+        decoded = self.__dict__.get("_decoded")
+        if decoded is None or decoded[0] is not stored:
+            decoded = self.__dict__["_decoded"] = (stored, decode_text(stored))
+        return decoded[1]
+    
+    @content.inplace.setter
+    def _set_content(self, content: str) -> None:
+        """Encode the body and maintain the preview, size and search columns."""
+        stored = encode_text(content)
+        self.stored_content = stored
+        self.__dict__["_decoded"] = (stored, content)
+        self.preview = make_preview(content)
+        self.content_length = len(content)
+        self.word_count = count_words(content)
+        self.storage_bytes = len(content.encode("utf-8"))
+        self.search_signature = make_search_signature(content, stored)
+    
+    @content.inplace.expression
+    @classmethod
+    def _content_expression(cls):
+        # Selected bodies come back decoded
+        return type_coerce(cls.stored_content, CompressedText)
+    
     def __repr__(self):
-        return f"<Note(id={self.id}, content='{self.content[:30]}...')>"
+        return f"<Note(id={self.id}, preview='{self.preview[:30]}...')>"
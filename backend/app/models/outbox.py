@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class OutboxEmail(Base):
+    """Transactional outbox for emails.
+
+    Rows are written in the same transaction as the change that triggers the
+    email and delivered later by the outbox dispatcher.
+    """
+    
+    __tablename__ = "email_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    to_address = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, sent or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    # When the row is next due; claiming a row pushes this out by the lease
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        # Dispatcher polls for due pending rows
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    
+    __mapper_args__ = {"eager_defaults": True}
+    
+    def __repr__(self):
+        return f"<OutboxEmail(id={self.id}, to='{self.to_address}', status='{self.status}')>"
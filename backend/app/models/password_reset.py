@@ -16,6 +16,9 @@ class PasswordResetToken(Base):
     used = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Fetch server-generated timestamps with INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+
     def is_valid(self) -> bool:
         """Check if token is valid (not used and not expired)."""
         return not self.used and datetime.now() < self.expires_at.replace(tzinfo=None)
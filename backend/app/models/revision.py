@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+from ..utils.compression import CompressedText
+
+
+class NoteRevision(Base):
+    """Note revision model - one past version of a note's content.
+
+    Most rows store a delta from the previous revision; every so often (and
+    whenever a delta wouldn't be smaller) a full snapshot is stored instead,
+    so rebuilding any version replays a bounded chain. See app.services.revisions.
+    """
+    
+    __tablename__ = "note_revisions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)  # The note version this content had
+    kind = Column(String(10), nullable=False)  # "snapshot" or "delta"
+    data = Column(CompressedText, nullable=False)  # Full content, or JSON text operations from the previous revision
+    chain_length = Column(Integer, nullable=False, default=0)  # Deltas since the last snapshot
+    content_length = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Fetch server-generated timestamps with INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+    
+    __table_args__ = (
+        UniqueConstraint("note_id", "version", name="uq_note_revisions_note_id_version"),
+    )
+    
+    def __repr__(self):
+        return f"<NoteRevision(note_id={self.note_id}, version={self.version}, kind='{self.kind}')>"
@@ -0,0 +1,64 @@
+from sqlalchemy import Column, Integer, BigInteger, Date, DateTime, Index
+from ..database import Base
+
+# Rollup tables for GET /api/stats. They are maintained incrementally by
+# app.services.stats from the note write paths; rebuild them with
+# scripts/rebuild_stats.py. No foreign keys: rows are removed explicitly when
+# their chapter or book is deleted, after being subtracted from the parents.
+
+
+class UserStats(Base):
+    """Totals across all of a user's notes."""
+    
+    __tablename__ = "stats_users"
+    
+    user_id = Column(Integer, primary_key=True)
+    note_count = Column(Integer, nullable=False, default=0)
+    word_count = Column(Integer, nullable=False, default=0)
+    storage_bytes = Column(BigInteger, nullable=False, default=0)  # UTF-8 size of note bodies
+    attachment_bytes = Column(BigInteger, nullable=False, default=0)  # Counted against attachment_quota_bytes
+
+
+class BookStats(Base):
+    """Totals per book."""
+    
+    __tablename__ = "stats_books"
+    
+    user_id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, primary_key=True)
+    note_count = Column(Integer, nullable=False, default=0)
+    word_count = Column(Integer, nullable=False, default=0)
+    storage_bytes = Column(BigInteger, nullable=False, default=0)
+
+
+class ChapterStats(Base):
+    """Totals per chapter, plus how many note writes it has seen."""
+    
+    __tablename__ = "stats_chapters"
+    
+    user_id = Column(Integer, primary_key=True)
+    chapter_id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, nullable=False)
+    note_count = Column(Integer, nullable=False, default=0)
+    word_count = Column(Integer, nullable=False, default=0)
+    storage_bytes = Column(BigInteger, nullable=False, default=0)
+    activity = Column(Integer, nullable=False, default=0)  # Notes created, updated or deleted
+    last_activity_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        # Most active chapters without sorting every row
+        Index("ix_stats_chapters_user_id_activity", "user_id", "activity"),
+        Index("ix_stats_chapters_user_id_book_id", "user_id", "book_id"),
+    )
+
+
+class DailyStats(Base):
+    """Note activity per calendar day."""
+    
+    __tablename__ = "stats_daily"
+    
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    notes_created = Column(Integer, nullable=False, default=0)
+    notes_updated = Column(Integer, nullable=False, default=0)
+    words_added = Column(Integer, nullable=False, default=0)  # Net words added that day
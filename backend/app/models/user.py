@@ -16,8 +16,11 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    books = relationship("Book", back_populates="owner", cascade="all, delete-orphan")
-    tags = relationship("Tag", back_populates="owner", cascade="all, delete-orphan")
+    books = relationship("Book", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    tags = relationship("Tag", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    
+    # Fetch server-generated timestamps with INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
     
     def __repr__(self):
         return f"<User(id={self.id}, email='{self.email}')>"
@@ -3,5 +3,13 @@ from .books import router as books_router
 from .chapters import router as chapters_router
 from .notes import router as notes_router
 from .tags import router as tags_router
+from .stats import router as stats_router
+from .attachments import router as attachments_router
+from .revisions import router as revisions_router
+from .events import router as events_router
+from .admin import router as admin_router
 
-__all__ = ["auth_router", "books_router", "chapters_router", "notes_router", "tags_router"]
+__all__ = [
+    "auth_router", "books_router", "chapters_router", "notes_router", "tags_router", "stats_router",
+    "attachments_router", "revisions_router", "events_router", "admin_router",
+]
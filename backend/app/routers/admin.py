@@ -0,0 +1,57 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from ..middleware.admission import GROUPS, admission_controller
+from ..schemas.admin import AdmissionUpdate
+from ..services.query_log import query_log
+from ..utils.security import require_admin
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/queries")
+def get_query_log(
+    limit: int = Query(50, ge=1, le=500),
+    order_by: Literal["total", "slow", "max"] = "total",
+    slow_only: bool = False
+):
+    """Statement timings grouped by normalized SQL, with percentiles and captured query plans.
+
+    Covers the worker that answers the request, since the last reset.
+    """
+    snapshot = query_log.snapshot(limit=limit if not slow_only else query_log.max_fingerprints, order_by=order_by)
+    if slow_only:
+        snapshot["queries"] = [query for query in snapshot["queries"] if query["slow"]][:limit]
+    return snapshot
+
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT)
+def reset_query_log():
+    """Clear the query log on the worker that answers the request."""
+    query_log.reset()
+
+
+@router.get("/admission")
+async def get_admission():
+    """Admission limits, plus queue and wait metrics of the worker that answers the request."""
+    return admission_controller.stats()
+
+
+@router.put("/admission")
+async def update_admission(update: AdmissionUpdate):
+    """Change admission limits on every worker.
+
+    Async so it runs on the event loop, where queued requests are admitted
+    as soon as limits rise.
+    """
+    unknown = sorted(set(update.groups) - set(GROUPS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown admission groups: {', '.join(unknown)}"
+        )
+    admission_controller.update(
+        max_concurrency=update.max_concurrency,
+        groups={name: group.model_dump() for name, group in update.groups.items()}
+    )
+    return admission_controller.stats()
@@ -0,0 +1,232 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..models.user import User
+from ..models.note import Note
+from ..models.attachment import Attachment
+from ..models.stats import UserStats
+from ..schemas.attachment import AttachmentResponse
+from ..services.attachments import attachment_store
+from ..services.cache import response_cache
+from ..services.events import publish_event
+from ..services.stats import add_attachment_bytes, reserve_attachment_bytes
+from ..config import get_settings
+from ..utils.security import get_current_user, get_read_db, get_user_db
+
+router = APIRouter(tags=["Attachments"])
+settings = get_settings()
+
+# Types a browser may render in place; anything else is served as a download.
+# Images are raster formats only: SVG (and any markup) can run script.
+INLINE_CONTENT_TYPES = {
+    "image/png", "image/jpeg", "image/gif", "image/webp", "image/avif", "image/bmp", "application/pdf"
+}
+INLINE_CONTENT_PREFIXES = ("video/", "audio/")
+
+
+def attachment_to_response(attachment: Attachment) -> AttachmentResponse:
+    """Convert attachment model to response schema."""
+    return AttachmentResponse(
+        id=attachment.id,
+        note_id=attachment.note_id,
+        filename=attachment.filename,
+        content_type=attachment.content_type,
+        size=attachment.size,
+        sha256=attachment.sha256,
+        url=f"/api/attachments/{attachment.sha256}",
+        created_at=attachment.created_at
+    )
+
+
+def _get_note(db: Session, note_id: int, user_id: int) -> Note:
+    note = db.query(Note).filter(
+        Note.id == note_id,
+        Note.user_id == user_id,
+        Note.deleted_at.is_(None)
+    ).first()
+    
+    if not note:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+    return note
+
+
+def _check_upload(db: Session, note_id: int, user_id: int, declared_size: int | None) -> Note:
+    """Reject an upload before reading its body, when possible."""
+    note = _get_note(db, note_id, user_id)
+    if declared_size is None:
+        return note
+    
+    if declared_size > settings.attachment_max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"Attachments are limited to {settings.attachment_max_bytes} bytes"
+        )
+    if settings.attachment_quota_bytes:
+        used = db.query(UserStats.attachment_bytes).filter(UserStats.user_id == user_id).scalar() or 0
+        if used + declared_size > settings.attachment_quota_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                detail="Attachment quota exceeded"
+            )
+    return note
+
+
+def _record_upload(db: Session, note: Note, user_id: int, sha256: str, size: int, filename: str,
+                   content_type: str) -> AttachmentResponse:
+    if not reserve_attachment_bytes(db, user_id, size, settings.attachment_quota_bytes):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail="Attachment quota exceeded"
+        )
+    
+    attachment = Attachment(
+        note_id=note.id,
+        user_id=user_id,
+        sha256=sha256,
+        size=size,
+        filename=filename,
+        content_type=content_type
+    )
+    db.add(attachment)
+    db.commit()
+    response_cache.invalidate(user_id, f"attachments:{note.id}")
+    publish_event(user_id, "attachment.created", id=attachment.id, note_id=note.id)
+    
+    return attachment_to_response(attachment)
+
+
+@router.get("/api/notes/{note_id}/attachments", response_model=List[AttachmentResponse])
+def get_attachments(
+    note_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get all attachments of a note."""
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+    
+    note = _get_note(db, note_id, current_user.id)
+    attachments = db.query(Attachment).filter(
+        Attachment.user_id == current_user.id,
+        Attachment.note_id == note_id
+    ).order_by(Attachment.id).all()
+    return cache.put(
+        [attachment_to_response(attachment) for attachment in attachments],
+        f"attachments:{note_id}", f"note:{note_id}", f"notes:{note.chapter_id}", f"book:{note.chapter.book_id}"
+    )
+
+
+@router.post(
+    "/api/notes/{note_id}/attachments",
+    response_model=AttachmentResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def upload_attachment(
+    note_id: int,
+    request: Request,
+    filename: str = Query(min_length=1, max_length=255),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Attach a file to a note.
+
+    The request body is the raw file (not a multipart form), with its type in
+    Content-Type. It is streamed to disk in chunks, so large files are never
+    held in memory, and stored once however many times it is uploaded.
+    """
+    content_length = request.headers.get("content-length", "")
+    declared_size = int(content_length) if content_length.isdigit() else None
+    # Database work runs in the threadpool, like it does for sync endpoints
+    note = await run_in_threadpool(_check_upload, db, note_id, current_user.id, declared_size)
+    
+    try:
+        sha256, size = await attachment_store.save(request.stream(), settings.attachment_max_bytes)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=str(e)
+        )
+    
+    content_type = request.headers.get("content-type") or "application/octet-stream"
+    return await run_in_threadpool(
+        _record_upload, db, note, current_user.id, sha256, size, filename, content_type
+    )
+
+
+@router.get("/api/attachments/{sha256}")
+def download_attachment(
+    sha256: str = Path(pattern="^[0-9a-f]{64}$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Download an attachment.
+
+    Supports Range requests (resumable downloads, media seeking). The file is
+    sent by the server directly when it supports zero-copy sends. The URL
+    names the content, so responses can be cached indefinitely.
+    """
+    attachment = db.query(Attachment).filter(
+        Attachment.user_id == current_user.id,
+        Attachment.sha256 == sha256
+    ).order_by(Attachment.id).first()
+    
+    if not attachment or not attachment_store.exists(sha256):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment not found"
+        )
+    
+    media_type = attachment.content_type.partition(";")[0].strip().lower()
+    inline = media_type in INLINE_CONTENT_TYPES or media_type.startswith(INLINE_CONTENT_PREFIXES)
+    return FileResponse(
+        attachment_store.path(sha256),
+        media_type=attachment.content_type,
+        filename=attachment.filename,
+        content_disposition_type="inline" if inline else "attachment",
+        headers={
+            "ETag": f'"{sha256}"',
+            "Cache-Control": "private, max-age=31536000, immutable",
+            "X-Content-Type-Options": "nosniff",
+            # Even if a file is rendered, it runs without script or same-origin access
+            "Content-Security-Policy": "sandbox",
+        }
+    )
+
+
+@router.delete("/api/notes/{note_id}/attachments/{attachment_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_attachment(
+    note_id: int,
+    attachment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Remove an attachment from a note."""
+    attachment = db.query(Attachment).filter(
+        Attachment.id == attachment_id,
+        Attachment.note_id == note_id,
+        Attachment.user_id == current_user.id
+    ).first()
+    
+    if not attachment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment not found"
+        )
+    
+    add_attachment_bytes(db, current_user.id, -attachment.size)
+    db.delete(attachment)
+    db.commit()
+    response_cache.invalidate(current_user.id, f"attachments:{note_id}")
+    publish_event(current_user.id, "attachment.deleted", id=attachment_id, note_id=note_id)
+    
+    return None
@@ -7,6 +7,7 @@ from ..database import get_db
 from ..schemas.user import UserCreate, UserResponse, UserLogin, Token
 from ..schemas.password_reset import PasswordResetRequest, PasswordResetConfirm, PasswordResetResponse
 from ..services.auth import get_user_by_email, create_user, authenticate_user
+from ..services.outbox import outbox_dispatcher
 from ..services.password_reset import (
     create_password_reset_token,
     get_reset_token,
@@ -100,12 +101,12 @@ def request_password_reset(
             reset_token=None
         )
 
-    # Create reset token
-    reset_token = create_password_reset_token(db, user.id, expires_in_hours=1)
+    # Create reset token; the email is queued in the same transaction and sent
+    # by the outbox dispatcher, so mail delivery never delays this response
+    reset_token = create_password_reset_token(db, user.id, expires_in_hours=1, email_to=user.email)
+    outbox_dispatcher.wake()
 
-    # In production, you would send an email here
-    # For now, in development mode, we'll return the token
-    # TODO: Implement email sending service
+    # In development mode, we also return the token
 
     if settings.environment == "development":
         return PasswordResetResponse(
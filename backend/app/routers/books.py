@@ -1,40 +1,67 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from sqlalchemy import and_, select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import func
 
-from ..database import get_db
 from ..models.user import User
 from ..models.book import Book
-from ..schemas.book import BookCreate, BookUpdate, BookResponse
-from ..utils.security import get_current_user
+from ..models.stats import BookStats
+from ..schemas.book import BookClone, BookCreate, BookUpdate, BookResponse
+from ..services.clone import clone_book
+from ..services.purge import hide_book_contents, purge_book
+from ..services.cache import response_cache
+from ..services.events import publish_event
+from ..services.stats import book_deleted
+from ..services.write_behind import note_write_buffer
+from ..utils.security import get_current_user, get_read_db, get_user_db
 
 router = APIRouter(prefix="/api/books", tags=["Books"])
 
 
+def _note_count(db: Session, book: Book) -> int:
+    """Notes in a book, from the stats rollup rather than by loading them."""
+    return db.scalar(
+        select(BookStats.note_count).where(BookStats.user_id == book.user_id, BookStats.book_id == book.id)
+    ) or 0
+
+
 @router.get("", response_model=List[BookResponse])
 def get_books(
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all books for the current user."""
-    books = db.query(Book).filter(Book.user_id == current_user.id).all()
-    return [
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+    
+    books = db.query(Book, BookStats.note_count).outerjoin(
+        BookStats, and_(BookStats.user_id == Book.user_id, BookStats.book_id == Book.id)
+    ).filter(
+        Book.user_id == current_user.id,
+        Book.deleted_at.is_(None)
+    ).all()
+    return cache.put([
         BookResponse(
             id=book.id,
             name=book.name,
-            note_count=book.note_count,
+            note_count=note_count or 0,
             created_at=book.created_at,
             updated_at=book.updated_at
         )
-        for book in books
-    ]
+        for book, note_count in books
+    ], "books")
 
 
 @router.post("", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
 def create_book(
     book_data: BookCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Create a new book."""
     book = Book(
@@ -43,12 +70,13 @@ def create_book(
     )
     db.add(book)
     db.commit()
-    db.refresh(book)
+    response_cache.invalidate(current_user.id, "books")
+    publish_event(current_user.id, "book.created", id=book.id)
     
     return BookResponse(
         id=book.id,
         name=book.name,
-        note_count=book.note_count,
+        note_count=0,  # A new book has no notes; avoids loading the empty collection
         created_at=book.created_at,
         updated_at=book.updated_at
     )
@@ -57,13 +85,20 @@ def create_book(
 @router.get("/{book_id}", response_model=BookResponse)
 def get_book(
     book_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific book by ID."""
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+    
     book = db.query(Book).filter(
         Book.id == book_id,
-        Book.user_id == current_user.id
+        Book.user_id == current_user.id,
+        Book.deleted_at.is_(None)
     ).first()
     
     if not book:
@@ -72,13 +107,13 @@ def get_book(
             detail="Book not found"
         )
     
-    return BookResponse(
+    return cache.put(BookResponse(
         id=book.id,
         name=book.name,
-        note_count=book.note_count,
+        note_count=_note_count(db, book),
         created_at=book.created_at,
         updated_at=book.updated_at
-    )
+    ), "books")
 
 
 @router.put("/{book_id}", response_model=BookResponse)
@@ -86,12 +121,13 @@ def update_book(
     book_id: int,
     book_data: BookUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Update a book."""
     book = db.query(Book).filter(
         Book.id == book_id,
-        Book.user_id == current_user.id
+        Book.user_id == current_user.id,
+        Book.deleted_at.is_(None)
     ).first()
     
     if not book:
@@ -103,28 +139,82 @@ def update_book(
     if book_data.name is not None:
         book.name = book_data.name
     
-    db.commit()
-    db.refresh(book)
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Book has changed"
+        )
+    response_cache.invalidate(current_user.id, "books", "search")
+    publish_event(current_user.id, "book.updated", id=book.id)
     
     return BookResponse(
         id=book.id,
         name=book.name,
-        note_count=book.note_count,
+        note_count=_note_count(db, book),
         created_at=book.created_at,
         updated_at=book.updated_at
     )
 
 
+@router.post("/{book_id}/clone", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
+def clone_book_endpoint(
+    book_id: int,
+    clone_data: Optional[BookClone] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Copy a book with all its chapters and notes, in one transaction inside the database."""
+    book = db.query(Book).filter(
+        Book.id == book_id,
+        Book.user_id == current_user.id,
+        Book.deleted_at.is_(None)
+    ).first()
+    
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+    
+    # Autosaved content has to be in the DB to be copied
+    note_write_buffer.flush(note_write_buffer.keys_for(current_user.id))
+    
+    name = clone_data.name if clone_data and clone_data.name else f"{book.name} (copy)"
+    new_book_id, note_count = clone_book(db, current_user.id, book.id, name)
+    db.commit()
+    response_cache.invalidate(current_user.id, "books", "search")
+    publish_event(current_user.id, "book.created", id=new_book_id)
+    
+    clone = db.get(Book, new_book_id)
+    return BookResponse(
+        id=clone.id,
+        name=clone.name,
+        note_count=note_count,  # Counted by the copy; avoids loading the notes
+        created_at=clone.created_at,
+        updated_at=clone.updated_at
+    )
+
+
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_book(
     book_id: int,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
-    """Delete a book and all its chapters and notes."""
+    """Delete a book and all its chapters and notes.
+
+    With ``background=true`` the book is hidden immediately and its contents are
+    purged in batches after the response is sent (useful for very large books).
+    """
     book = db.query(Book).filter(
         Book.id == book_id,
-        Book.user_id == current_user.id
+        Book.user_id == current_user.id,
+        Book.deleted_at.is_(None)
     ).first()
     
     if not book:
@@ -133,7 +223,35 @@ def delete_book(
             detail="Book not found"
         )
     
+    book_deleted(db, current_user.id, book.id)
+    
+    if background:
+        book.deleted_at = func.now()
+        hide_book_contents(db, book.id, current_user.id)
+        try:
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Book has changed"
+            )
+        response_cache.invalidate(current_user.id, "books", f"book:{book.id}", "search")
+        publish_event(current_user.id, "book.deleted", id=book.id)
+        background_tasks.add_task(purge_book, book.id, current_user.id)
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+    
+    # Chapters and notes are removed by ON DELETE CASCADE in the database
     db.delete(book)
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Book has changed"
+        )
+    response_cache.invalidate(current_user.id, "books", f"book:{book_id}", "search")
+    publish_event(current_user.id, "book.deleted", id=book_id)
     
     return None
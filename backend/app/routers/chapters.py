@@ -1,15 +1,27 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from sqlalchemy import case, null, select, union_all, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
-from ..database import get_db
 from ..models.user import User
 from ..models.book import Book
 from ..models.chapter import Chapter
-from ..schemas.chapter import ChapterCreate, ChapterUpdate, ChapterResponse
-from ..utils.security import get_current_user
+from ..schemas.chapter import ChapterClone, ChapterCreate, ChapterMove, ChapterUpdate, ChapterResponse
+from ..schemas.position import MoveResult, PositionUpdate
+from ..services.cache import response_cache
+from ..services.clone import clone_chapter
+from ..services.events import publish_event
+from ..services.positions import (
+    needs_rebalance, position_at_end, position_between, positions_at_end, rebalance_positions
+)
+from ..services.stats import chapter_deleted, chapters_moved
+from ..services.write_behind import note_write_buffer
+from ..config import get_settings
+from ..utils.security import get_current_user, get_read_db, get_user_db
 
 router = APIRouter(tags=["Chapters"])
+settings = get_settings()
 
 
 def format_chapter_date(chapter: Chapter) -> str:
@@ -25,6 +37,7 @@ def chapter_to_response(chapter: Chapter) -> ChapterResponse:
         id=chapter.id,
         name=chapter.name,
         book_id=chapter.book_id,
+        position=chapter.position,
         date=format_chapter_date(chapter),
         created_at=chapter.created_at,
         updated_at=chapter.updated_at
@@ -34,14 +47,21 @@ def chapter_to_response(chapter: Chapter) -> ChapterResponse:
 @router.get("/api/books/{book_id}/chapters", response_model=List[ChapterResponse])
 def get_chapters(
     book_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all chapters for a specific book."""
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+    
     # Verify the book belongs to the user
     book = db.query(Book).filter(
         Book.id == book_id,
-        Book.user_id == current_user.id
+        Book.user_id == current_user.id,
+        Book.deleted_at.is_(None)
     ).first()
     
     if not book:
@@ -50,22 +70,30 @@ def get_chapters(
             detail="Book not found"
         )
     
-    chapters = db.query(Chapter).filter(Chapter.book_id == book_id).all()
-    return [chapter_to_response(chapter) for chapter in chapters]
+    chapters = db.query(Chapter).filter(
+        Chapter.user_id == current_user.id,
+        Chapter.book_id == book_id
+    ).order_by(Chapter.position, Chapter.id).all()
+    return cache.put(
+        [chapter_to_response(chapter) for chapter in chapters],
+        f"chapters:{book_id}", f"book:{book_id}"
+    )
 
 
 @router.post("/api/books/{book_id}/chapters", response_model=ChapterResponse, status_code=status.HTTP_201_CREATED)
 def create_chapter(
     book_id: int,
     chapter_data: ChapterCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Create a new chapter in a book."""
     # Verify the book belongs to the user
     book = db.query(Book).filter(
         Book.id == book_id,
-        Book.user_id == current_user.id
+        Book.user_id == current_user.id,
+        Book.deleted_at.is_(None)
     ).first()
     
     if not book:
@@ -76,11 +104,19 @@ def create_chapter(
     
     chapter = Chapter(
         name=chapter_data.name,
-        book_id=book_id
+        book_id=book_id,
+        user_id=current_user.id,
+        position=position_at_end(db, Chapter, Chapter.book_id, book_id, current_user.id)
     )
     db.add(chapter)
     db.commit()
-    db.refresh(chapter)
+    response_cache.invalidate(current_user.id, f"chapters:{book_id}")
+    publish_event(current_user.id, "chapter.created", id=chapter.id, book_id=book_id)
+    
+    if needs_rebalance(chapter.position):
+        background_tasks.add_task(
+            rebalance_positions, Chapter, Chapter.book_id, book_id, current_user.id, f"chapters:{book_id}"
+        )
     
     return chapter_to_response(chapter)
 
@@ -88,13 +124,20 @@ def create_chapter(
 @router.get("/api/chapters/{chapter_id}", response_model=ChapterResponse)
 def get_chapter(
     chapter_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific chapter by ID."""
-    chapter = db.query(Chapter).join(Book).filter(
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+    
+    chapter = db.query(Chapter).filter(
         Chapter.id == chapter_id,
-        Book.user_id == current_user.id
+        Chapter.user_id == current_user.id,
+        Chapter.deleted_at.is_(None)
     ).first()
     
     if not chapter:
@@ -103,7 +146,7 @@ def get_chapter(
             detail="Chapter not found"
         )
     
-    return chapter_to_response(chapter)
+    return cache.put(chapter_to_response(chapter), f"chapter:{chapter_id}", f"book:{chapter.book_id}")
 
 
 @router.put("/api/chapters/{chapter_id}", response_model=ChapterResponse)
@@ -111,12 +154,13 @@ def update_chapter(
     chapter_id: int,
     chapter_data: ChapterUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Update a chapter."""
-    chapter = db.query(Chapter).join(Book).filter(
+    chapter = db.query(Chapter).filter(
         Chapter.id == chapter_id,
-        Book.user_id == current_user.id
+        Chapter.user_id == current_user.id,
+        Chapter.deleted_at.is_(None)
     ).first()
     
     if not chapter:
@@ -128,22 +172,226 @@ def update_chapter(
     if chapter_data.name is not None:
         chapter.name = chapter_data.name
     
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Chapter has changed"
+        )
+    response_cache.invalidate(
+        current_user.id, f"chapters:{chapter.book_id}", f"chapter:{chapter_id}", "search"
+    )
+    publish_event(current_user.id, "chapter.updated", id=chapter_id, book_id=chapter.book_id)
+    
+    return chapter_to_response(chapter)
+
+
+@router.put("/api/chapters/{chapter_id}/position", response_model=ChapterResponse)
+def move_chapter(
+    chapter_id: int,
+    position_data: PositionUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Move a chapter between two neighbours within its book (drag and drop).
+
+    Only the moved chapter's row is updated.
+    """
+    chapter = db.query(Chapter).filter(
+        Chapter.id == chapter_id,
+        Chapter.user_id == current_user.id,
+        Chapter.deleted_at.is_(None)
+    ).first()
+    
+    if not chapter:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chapter not found"
+        )
+    
+    try:
+        position = position_between(
+            db, Chapter, Chapter.book_id, chapter.book_id, current_user.id,
+            position_data.previous_id, position_data.next_id
+        )
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Neighbouring chapter not found in this book"
+        )
+    
+    # Reordering isn't an edit, so updated_at is left alone
+    db.execute(
+        update(Chapter)
+        .where(Chapter.id == chapter.id)
+        .values(position=position, updated_at=Chapter.updated_at)
+    )
     db.commit()
-    db.refresh(chapter)
+    response_cache.invalidate(current_user.id, f"chapters:{chapter.book_id}", f"chapter:{chapter_id}")
+    publish_event(current_user.id, "chapter.updated", id=chapter_id, book_id=chapter.book_id)
+    
+    if needs_rebalance(position):
+        background_tasks.add_task(
+            rebalance_positions, Chapter, Chapter.book_id, chapter.book_id, current_user.id,
+            f"chapters:{chapter.book_id}"
+        )
     
     return chapter_to_response(chapter)
 
 
+@router.post("/api/chapters/{chapter_id}/clone", response_model=ChapterResponse, status_code=status.HTTP_201_CREATED)
+def clone_chapter_endpoint(
+    chapter_id: int,
+    background_tasks: BackgroundTasks,
+    clone_data: Optional[ChapterClone] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Copy a chapter with all its notes to the end of a book (its own by default)."""
+    clone_data = clone_data or ChapterClone()
+    chapter = db.query(Chapter).filter(
+        Chapter.id == chapter_id,
+        Chapter.user_id == current_user.id,
+        Chapter.deleted_at.is_(None)
+    ).first()
+    
+    if not chapter:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chapter not found"
+        )
+    
+    book_id = clone_data.book_id or chapter.book_id
+    if book_id != chapter.book_id:
+        book = db.query(Book).filter(
+            Book.id == book_id,
+            Book.user_id == current_user.id,
+            Book.deleted_at.is_(None)
+        ).first()
+        
+        if not book:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Book not found"
+            )
+    
+    # Autosaved content has to be in the DB to be copied
+    note_write_buffer.flush(note_write_buffer.keys_for(current_user.id))
+    
+    new_chapter_id, _ = clone_chapter(
+        db, current_user.id, chapter, book_id,
+        clone_data.name or f"{chapter.name} (copy)",
+        position_at_end(db, Chapter, Chapter.book_id, book_id, current_user.id)
+    )
+    db.commit()
+    response_cache.invalidate(current_user.id, "books", f"chapters:{book_id}", f"book:{book_id}", "search")
+    publish_event(current_user.id, "chapter.created", id=new_chapter_id, book_id=book_id)
+    
+    clone = db.get(Chapter, new_chapter_id)
+    if needs_rebalance(clone.position):
+        background_tasks.add_task(
+            rebalance_positions, Chapter, Chapter.book_id, book_id, current_user.id, f"chapters:{book_id}"
+        )
+    
+    return chapter_to_response(clone)
+
+
+@router.post("/api/chapters/move", response_model=MoveResult)
+def move_chapters(
+    move_data: ChapterMove,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Move chapters, with their notes, to another book.
+
+    The chapters keep their relative order and go after the book's existing
+    chapters. All of them are moved with a single UPDATE, or none are.
+    """
+    chapter_ids = list(dict.fromkeys(move_data.chapter_ids))
+    if len(chapter_ids) > settings.bulk_move_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.bulk_move_max_items} chapters can be moved at once"
+        )
+    
+    # Check ownership of the chapters and the destination in one query; the
+    # destination is the row without a chapter id
+    chapters = select(Chapter.id, Chapter.book_id, Chapter.position).where(
+        Chapter.user_id == current_user.id,
+        Chapter.id.in_(chapter_ids),
+        Chapter.deleted_at.is_(None)
+    )
+    destination = select(null(), Book.id, null()).where(
+        Book.id == move_data.book_id,
+        Book.user_id == current_user.id,
+        Book.deleted_at.is_(None)
+    )
+    rows = db.execute(union_all(chapters, destination)).all()
+    
+    if not any(row[0] is None for row in rows):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+    if len(rows) - 1 != len(chapter_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chapter not found"
+        )
+    
+    book_id = move_data.book_id
+    moving = sorted(
+        (row for row in rows if row[0] is not None and row[1] != book_id),
+        key=lambda row: (row[2], row[0])
+    )
+    if not moving:
+        return MoveResult(moved=0)
+    
+    moved_ids = [row[0] for row in moving]
+    keys = positions_at_end(db, Chapter, Chapter.book_id, book_id, current_user.id, len(moving))
+    db.execute(
+        update(Chapter)
+        .where(Chapter.user_id == current_user.id, Chapter.id.in_(moved_ids))
+        .values(book_id=book_id, position=case(dict(zip(moved_ids, keys)), value=Chapter.id))
+        .execution_options(synchronize_session=False)
+    )
+    chapters_moved(db, current_user.id, moved_ids, book_id)
+    db.commit()
+    
+    source_book_ids = {row[1] for row in moving}
+    response_cache.invalidate(
+        current_user.id, "books", "search", f"chapters:{book_id}", f"book:{book_id}",
+        *(f"chapters:{source_book_id}" for source_book_id in source_book_ids),
+        *(f"book:{source_book_id}" for source_book_id in source_book_ids),
+        *(f"chapter:{chapter_id}" for chapter_id in moved_ids)
+    )
+    publish_event(
+        current_user.id, "chapter.moved", ids=moved_ids, book_id=book_id, from_book_ids=sorted(source_book_ids)
+    )
+    
+    if any(needs_rebalance(key) for key in keys):
+        background_tasks.add_task(
+            rebalance_positions, Chapter, Chapter.book_id, book_id, current_user.id, f"chapters:{book_id}"
+        )
+    
+    return MoveResult(moved=len(moving))
+
+
 @router.delete("/api/chapters/{chapter_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_chapter(
     chapter_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Delete a chapter and all its notes."""
-    chapter = db.query(Chapter).join(Book).filter(
+    chapter = db.query(Chapter).filter(
         Chapter.id == chapter_id,
-        Book.user_id == current_user.id
+        Chapter.user_id == current_user.id,
+        Chapter.deleted_at.is_(None)
     ).first()
     
     if not chapter:
@@ -152,7 +400,22 @@ def delete_chapter(
             detail="Chapter not found"
         )
     
+    book_id = chapter.book_id
+    chapter_deleted(db, current_user.id, chapter_id, book_id)
+    # Notes are removed by ON DELETE CASCADE in the database
     db.delete(chapter)
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Chapter has changed"
+        )
+    response_cache.invalidate(
+        current_user.id, "books", f"chapters:{book_id}", f"chapter:{chapter_id}",
+        f"notes:{chapter_id}", "search"
+    )
+    publish_event(current_user.id, "chapter.deleted", id=chapter_id, book_id=book_id)
     
     return None
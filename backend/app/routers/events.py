@@ -0,0 +1,67 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import get_db
+from ..models.user import User
+from ..services.events import event_broker
+from ..utils.security import get_current_user
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+settings = get_settings()
+
+
+async def _event_frames(user_id: int, last_event_id: Optional[str]):
+    # Subscribed here rather than in the handler, so the finally always unsubscribes
+    yield f"retry: {settings.events_retry_ms}\n\n".encode()
+    subscription = event_broker.subscribe(user_id, last_event_id)
+    if subscription is None:
+        return
+    stream, replay = subscription
+    try:
+        for frame in replay:
+            yield frame
+        while True:
+            try:
+                frame = await asyncio.wait_for(stream.queue.get(), settings.events_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                # Keeps proxies from timing the connection out, and notices clients that left
+                yield b": ping\n\n"
+                continue
+            if frame is None:
+                return
+            yield frame
+    finally:
+        event_broker.unsubscribe(stream)
+
+
+@router.get("")
+async def stream_events(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Stream changes to the current user's library as server-sent events.
+
+    Events are named after what changed (``note.updated``, ``chapter.deleted``,
+    ...) and carry its ids. ``resync`` means the client may have missed
+    events and should re-fetch what it shows.
+    """
+    # The stream can stay open for hours; don't hold a pooled connection that long
+    db.close()
+
+    if not event_broker.has_room():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many event streams",
+            headers={"Retry-After": str(max(settings.events_retry_ms // 1000, 1))}
+        )
+
+    return StreamingResponse(
+        _event_frames(current_user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
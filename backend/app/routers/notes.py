@@ -1,16 +1,31 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from sqlalchemy import and_, case, null, or_, select, union_all, update
+from sqlalchemy.orm import Session, defer
+from sqlalchemy.orm.exc import StaleDataError
 
-from ..database import get_db
 from ..models.user import User
 from ..models.book import Book
 from ..models.chapter import Chapter
-from ..models.note import Note
-from ..schemas.note import NoteCreate, NoteUpdate, NoteResponse, NoteSearchResult
-from ..utils.security import get_current_user
+from ..models.note import Note, make_preview
+from ..schemas.note import NoteCreate, NoteMove, NoteUpdate, NotePatch, NoteResponse, NoteSearchResult
+from ..schemas.position import MoveResult, PositionUpdate
+from ..services.cache import response_cache
+from ..services.events import publish_event
+from ..services.positions import (
+    needs_rebalance, position_at_start, position_between, positions_at_end, rebalance_positions
+)
+from ..services.revisions import record_revision, thin_note_revisions
+from ..services.stats import note_created, note_deleted, note_updated, notes_moved
+from ..services.text_ops import apply_operations
+from ..services.write_behind import note_write_buffer
+from ..config import get_settings
+from ..utils.encoding import negotiate
+from ..utils.signatures import may_contain
+from ..utils.security import get_current_user, get_read_db, get_user_db
 
 router = APIRouter(tags=["Notes"])
+settings = get_settings()
 
 
 def format_note_date(note: Note) -> str:
@@ -20,12 +35,26 @@ def format_note_date(note: Note) -> str:
     return ""
 
 
-def note_to_response(note: Note) -> NoteResponse:
-    """Convert note model to response schema."""
+def note_to_response(note: Note, include_content: bool = True) -> NoteResponse:
+    """Convert note model to response schema, including unflushed autosaved content."""
+    buffered = note_write_buffer.get(note.id, note.user_id)
+    version = note.version
+    if buffered is not None:
+        content, preview, content_length = buffered, make_preview(buffered), len(buffered)
+        if buffered != note.content:
+            # The version the pending flush will write, so clients can patch against it
+            version += 1
+    else:
+        content = note.content if include_content else None
+        preview, content_length = note.preview, note.content_length
     return NoteResponse(
         id=note.id,
-        content=note.content,
+        content=content if include_content else None,
+        preview=preview,
+        content_length=content_length,
+        version=version,
         chapter_id=note.chapter_id,
+        position=note.position,
         date=format_note_date(note),
         created_at=note.created_at,
         updated_at=note.updated_at
@@ -35,14 +64,39 @@ def note_to_response(note: Note) -> NoteResponse:
 @router.get("/api/notes/search", response_model=List[NoteSearchResult])
 def search_notes(
     q: str,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Search for notes across all books and chapters for the current user."""
     if not q or len(q.strip()) == 0:
-        return []
+        return negotiate(request, [])
 
-    search_term = f"%{q}%"
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+
+    needle = q.lower()
+    # LIKE wildcards in the query are matched literally
+    pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    # Autosaved content not yet in the DB is matched instead of the stored body
+    buffered = {}
+    for _, note_id in note_write_buffer.keys_for(current_user.id):
+        content = note_write_buffer.get(note_id, current_user.id)
+        if content is not None:  # Not flushed in the meantime
+            buffered[note_id] = content
+
+    # Compressed bodies can't be matched as stored. Their signatures rule out
+    # most non-matching notes; the rest are decoded and checked below.
+    signatures = db.execute(
+        select(Note.id, Note.search_signature).where(
+            Note.user_id == current_user.id,
+            Note.deleted_at.is_(None),
+            Note.search_signature.is_not(None)
+        )
+    ).all()
+    to_check = {note_id for note_id, signature in signatures if may_contain(signature, needle)} | set(buffered)
 
     # Query notes with book and chapter information
     results = db.query(Note, Chapter, Book).join(
@@ -50,15 +104,22 @@ def search_notes(
     ).join(
         Book, Chapter.book_id == Book.id
     ).filter(
-        Book.user_id == current_user.id,
-        Note.content.ilike(search_term)
-    ).order_by(Note.created_at.desc()).limit(50).all()
+        Note.user_id == current_user.id,
+        Note.deleted_at.is_(None),
+        or_(
+            and_(Note.search_signature.is_(None), Note.stored_content.ilike(pattern, escape="\\")),
+            Note.id.in_(to_check)
+        )
+    ).order_by(Note.created_at.desc()).limit(50 + len(to_check))
 
     search_results = []
     for note, chapter, book in results:
+        content = buffered.get(note.id, note.content)
+        if note.id in to_check and needle not in content.lower():
+            continue
         search_results.append(NoteSearchResult(
             id=note.id,
-            content=note.content,
+            content=content,
             chapter_id=note.chapter_id,
             chapter_name=chapter.name,
             book_id=book.id,
@@ -67,21 +128,34 @@ def search_notes(
             created_at=note.created_at,
             updated_at=note.updated_at
         ))
+        if len(search_results) == 50:
+            break
 
-    return search_results
+    return cache.put(search_results, "search")
 
 
 @router.get("/api/chapters/{chapter_id}/notes", response_model=List[NoteResponse])
 def get_notes(
     chapter_id: int,
+    request: Request,
+    include_content: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get all notes for a specific chapter."""
-    # Verify the chapter belongs to the user (through book)
-    chapter = db.query(Chapter).join(Book).filter(
+    """Get all notes for a specific chapter.
+
+    Returns previews only; pass ``include_content=true`` to also load full bodies.
+    """
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+
+    # Verify the chapter belongs to the user
+    chapter = db.query(Chapter).filter(
         Chapter.id == chapter_id,
-        Book.user_id == current_user.id
+        Chapter.user_id == current_user.id,
+        Chapter.deleted_at.is_(None)
     ).first()
 
     if not chapter:
@@ -90,22 +164,33 @@ def get_notes(
             detail="Chapter not found"
         )
 
-    notes = db.query(Note).filter(Note.chapter_id == chapter_id).order_by(Note.created_at.desc()).all()
-    return [note_to_response(note) for note in notes]
+    query = db.query(Note).filter(
+        Note.user_id == current_user.id,
+        Note.chapter_id == chapter_id
+    )
+    if not include_content:
+        query = query.options(defer(Note.stored_content))
+    notes = query.order_by(Note.position, Note.id).all()
+    return cache.put(
+        [note_to_response(note, include_content) for note in notes],
+        f"notes:{chapter_id}", f"book:{chapter.book_id}"
+    )
 
 
 @router.post("/api/chapters/{chapter_id}/notes", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
 def create_note(
     chapter_id: int,
     note_data: NoteCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Create a new note in a chapter."""
-    # Verify the chapter belongs to the user (through book)
-    chapter = db.query(Chapter).join(Book).filter(
+    # Verify the chapter belongs to the user
+    chapter = db.query(Chapter).filter(
         Chapter.id == chapter_id,
-        Book.user_id == current_user.id
+        Chapter.user_id == current_user.id,
+        Chapter.deleted_at.is_(None)
     ).first()
     
     if not chapter:
@@ -116,11 +201,22 @@ def create_note(
     
     note = Note(
         content=note_data.content,
-        chapter_id=chapter_id
+        chapter_id=chapter_id,
+        user_id=current_user.id,
+        # New notes go first, as the list was newest-first before manual ordering
+        position=position_at_start(db, Note, Note.chapter_id, chapter_id, current_user.id)
     )
     db.add(note)
+    note_created(db, note, chapter.book_id)
     db.commit()
-    db.refresh(note)
+    response_cache.invalidate(current_user.id, "books", f"notes:{chapter_id}", "search")
+    publish_event(current_user.id, "note.created", id=note.id, chapter_id=chapter_id, book_id=chapter.book_id)
+    
+    # Each note added at the start makes the first key longer
+    if needs_rebalance(note.position):
+        background_tasks.add_task(
+            rebalance_positions, Note, Note.chapter_id, chapter_id, current_user.id, f"notes:{chapter_id}"
+        )
     
     return note_to_response(note)
 
@@ -128,13 +224,20 @@ def create_note(
 @router.get("/api/notes/{note_id}", response_model=NoteResponse)
 def get_note(
     note_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific note by ID."""
-    note = db.query(Note).join(Chapter).join(Book).filter(
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+    
+    note = db.query(Note).filter(
         Note.id == note_id,
-        Book.user_id == current_user.id
+        Note.user_id == current_user.id,
+        Note.deleted_at.is_(None)
     ).first()
     
     if not note:
@@ -143,20 +246,35 @@ def get_note(
             detail="Note not found"
         )
     
-    return note_to_response(note)
+    return cache.put(
+        note_to_response(note),
+        f"note:{note_id}", f"notes:{note.chapter_id}", f"book:{note.chapter.book_id}"
+    )
 
 
 @router.put("/api/notes/{note_id}", response_model=NoteResponse)
 def update_note(
     note_id: int,
     note_data: NoteUpdate,
+    background_tasks: BackgroundTasks,
+    autosave: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
-    """Update a note."""
-    note = db.query(Note).join(Chapter).join(Book).filter(
+    """Update a note.
+
+    With ``autosave=true`` (and write-behind enabled) the content is buffered
+    and written to the DB once the note stops changing.
+    """
+    buffered = autosave and settings.note_write_behind_enabled
+    if not buffered:
+        # This write supersedes anything still buffered for the note
+        note_write_buffer.discard(note_id, current_user.id)
+    
+    note = db.query(Note).filter(
         Note.id == note_id,
-        Book.user_id == current_user.id
+        Note.user_id == current_user.id,
+        Note.deleted_at.is_(None)
     ).first()
     
     if not note:
@@ -165,25 +283,257 @@ def update_note(
             detail="Note not found"
         )
     
-    if note_data.content is not None:
+    if buffered:
+        if note_data.content is not None:
+            note_write_buffer.put(note.id, current_user.id, note.chapter_id, note_data.content)
+            response_cache.invalidate(current_user.id, f"note:{note_id}", f"notes:{note.chapter_id}", "search")
+        return note_to_response(note)
+    
+    if note_data.content is not None and note_data.content != note.content:
+        old_content = note.content
         note.content = note_data.content
+        note_updated(db, note, note.chapter.book_id, old_content)
+        if record_revision(db, note, old_content):
+            background_tasks.add_task(thin_note_revisions, note.id, current_user.id)
+    
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Note has changed"
+        )
+    response_cache.invalidate(current_user.id, f"note:{note_id}", f"notes:{note.chapter_id}", "search")
+    publish_event(current_user.id, "note.updated", id=note_id, chapter_id=note.chapter_id, version=note.version)
+    
+    return note_to_response(note)
+
+
+@router.patch("/api/notes/{note_id}", response_model=NoteResponse)
+def patch_note(
+    note_id: int,
+    patch_data: NotePatch,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Apply text operations to a note, based on the version the client last saw."""
+    # Patch against the latest content, including anything autosaved
+    note_write_buffer.flush([(current_user.id, note_id)])
+    
+    note = db.query(Note).filter(
+        Note.id == note_id,
+        Note.user_id == current_user.id,
+        Note.deleted_at.is_(None)
+    ).first()
+    
+    if not note:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+    
+    if note.version != patch_data.base_version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Note has changed (current version {note.version})"
+        )
+    
+    old_content = note.content
+    try:
+        note.content = apply_operations(old_content, patch_data.operations)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    note_updated(db, note, note.chapter.book_id, old_content)
+    if record_revision(db, note, old_content):
+        background_tasks.add_task(thin_note_revisions, note.id, current_user.id)
+    
+    try:
+        db.commit()
+    except StaleDataError:
+        # Another update committed between our read and write
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Note has changed"
+        )
+    response_cache.invalidate(current_user.id, f"note:{note_id}", f"notes:{note.chapter_id}", "search")
+    publish_event(current_user.id, "note.updated", id=note_id, chapter_id=note.chapter_id, version=note.version)
+    
+    return note_to_response(note)
+
+
+@router.put("/api/notes/{note_id}/position", response_model=NoteResponse)
+def move_note(
+    note_id: int,
+    position_data: PositionUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Move a note between two neighbours within its chapter (drag and drop).
+
+    Only the moved note's row is updated; its content version is unchanged.
+    """
+    note = db.query(Note).filter(
+        Note.id == note_id,
+        Note.user_id == current_user.id,
+        Note.deleted_at.is_(None)
+    ).first()
+    
+    if not note:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+    
+    try:
+        position = position_between(
+            db, Note, Note.chapter_id, note.chapter_id, current_user.id,
+            position_data.previous_id, position_data.next_id
+        )
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Neighbouring note not found in this chapter"
+        )
     
+    # Bulk-style UPDATE so the version counter and updated_at are left alone
+    db.execute(
+        update(Note)
+        .where(Note.id == note.id)
+        .values(position=position, updated_at=Note.updated_at)
+    )
     db.commit()
-    db.refresh(note)
+    response_cache.invalidate(current_user.id, f"note:{note_id}", f"notes:{note.chapter_id}")
+    publish_event(current_user.id, "note.updated", id=note_id, chapter_id=note.chapter_id, version=note.version)
+    
+    if needs_rebalance(position):
+        background_tasks.add_task(
+            rebalance_positions, Note, Note.chapter_id, note.chapter_id, current_user.id,
+            f"notes:{note.chapter_id}"
+        )
     
     return note_to_response(note)
 
 
+@router.post("/api/notes/move", response_model=MoveResult)
+def move_notes(
+    move_data: NoteMove,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Move notes to another chapter (possibly in another book).
+
+    The notes keep their relative order and go after the chapter's existing
+    notes. All of them are moved with a single UPDATE, or none are.
+    """
+    note_ids = list(dict.fromkeys(move_data.note_ids))
+    if len(note_ids) > settings.bulk_move_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.bulk_move_max_items} notes can be moved at once"
+        )
+    
+    # Autosaved content has to be in the DB before the totals are read
+    note_write_buffer.flush([(current_user.id, note_id) for note_id in note_ids])
+    
+    # Check ownership of the notes and the destination in one query; the
+    # destination is the row without a note id
+    notes = select(
+        Note.id, Note.chapter_id, Chapter.book_id, Note.position, Note.word_count, Note.storage_bytes
+    ).join(
+        Chapter, Note.chapter_id == Chapter.id
+    ).where(
+        Note.user_id == current_user.id,
+        Note.id.in_(note_ids),
+        Note.deleted_at.is_(None)
+    )
+    destination = select(null(), Chapter.id, Chapter.book_id, null(), null(), null()).where(
+        Chapter.id == move_data.chapter_id,
+        Chapter.user_id == current_user.id,
+        Chapter.deleted_at.is_(None)
+    )
+    rows = db.execute(union_all(notes, destination)).all()
+    
+    targets = [row for row in rows if row[0] is None]
+    if not targets:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chapter not found"
+        )
+    if len(rows) - 1 != len(note_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+    
+    chapter_id, book_id = targets[0][1], targets[0][2]
+    moving = sorted(
+        (row for row in rows if row[0] is not None and row[1] != chapter_id),
+        key=lambda row: (row[3], row[0])
+    )
+    if not moving:
+        return MoveResult(moved=0)
+    
+    keys = positions_at_end(db, Note, Note.chapter_id, chapter_id, current_user.id, len(moving))
+    db.execute(
+        update(Note)
+        .where(Note.user_id == current_user.id, Note.id.in_([row[0] for row in moving]))
+        .values(
+            chapter_id=chapter_id,
+            position=case(dict(zip((row[0] for row in moving), keys)), value=Note.id)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    
+    sources = {}
+    for note_id, source_chapter_id, source_book_id, _, words, size in moving:
+        totals = sources.setdefault((source_chapter_id, source_book_id), {
+            "note_count": 0, "word_count": 0, "storage_bytes": 0
+        })
+        totals["note_count"] += 1
+        totals["word_count"] += words
+        totals["storage_bytes"] += size
+    notes_moved(db, current_user.id, sources, chapter_id, book_id)
+    db.commit()
+    
+    # Search matches through joins, so dropping cached results is enough
+    response_cache.invalidate(
+        current_user.id, "books", "search", f"notes:{chapter_id}", f"book:{book_id}",
+        *{f"notes:{source_chapter_id}" for source_chapter_id, _ in sources},
+        *{f"book:{source_book_id}" for _, source_book_id in sources},
+        *(f"note:{row[0]}" for row in moving)
+    )
+    publish_event(
+        current_user.id, "note.moved", ids=[row[0] for row in moving], chapter_id=chapter_id, book_id=book_id,
+        from_chapter_ids=sorted({source_chapter_id for source_chapter_id, _ in sources})
+    )
+    
+    if any(needs_rebalance(key) for key in keys):
+        background_tasks.add_task(
+            rebalance_positions, Note, Note.chapter_id, chapter_id, current_user.id, f"notes:{chapter_id}"
+        )
+    
+    return MoveResult(moved=len(moving))
+
+
 @router.delete("/api/notes/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_note(
     note_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Delete a note."""
-    note = db.query(Note).join(Chapter).join(Book).filter(
+    note = db.query(Note).filter(
         Note.id == note_id,
-        Book.user_id == current_user.id
+        Note.user_id == current_user.id,
+        Note.deleted_at.is_(None)
     ).first()
     
     if not note:
@@ -192,7 +542,12 @@ def delete_note(
             detail="Note not found"
         )
     
+    chapter_id, book_id = note.chapter_id, note.chapter.book_id
+    note_write_buffer.discard(note_id, current_user.id)
+    note_deleted(db, note, book_id)
     db.delete(note)
     db.commit()
+    response_cache.invalidate(current_user.id, "books", f"note:{note_id}", f"notes:{chapter_id}", "search")
+    publish_event(current_user.id, "note.deleted", id=note_id, chapter_id=chapter_id, book_id=book_id)
     
     return None
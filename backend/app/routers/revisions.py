@@ -0,0 +1,127 @@
+from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..models.user import User
+from ..models.note import Note
+from ..models.revision import NoteRevision
+from ..schemas.note import NoteResponse, NoteRevisionContent, NoteRevisionResponse
+from ..services.cache import response_cache
+from ..services.events import publish_event
+from ..services.revisions import record_revision, revision_content, thin_note_revisions
+from ..services.stats import note_updated
+from ..services.write_behind import note_write_buffer
+from ..utils.security import get_current_user, get_read_db, get_user_db
+from .notes import note_to_response
+
+router = APIRouter(tags=["Revisions"])
+
+
+def _get_note(db: Session, note_id: int, user_id: int) -> Note:
+    note = db.query(Note).filter(
+        Note.id == note_id,
+        Note.user_id == user_id,
+        Note.deleted_at.is_(None)
+    ).first()
+    
+    if not note:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+    return note
+
+
+def _get_revision(db: Session, note_id: int, version: int) -> tuple[NoteRevision, str]:
+    revision = db.query(NoteRevision).filter(
+        NoteRevision.note_id == note_id,
+        NoteRevision.version == version
+    ).first()
+    content = revision_content(db, note_id, version) if revision else None
+    
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Revision not found"
+        )
+    return revision, content
+
+
+@router.get("/api/notes/{note_id}/revisions", response_model=List[NoteRevisionResponse])
+def get_revisions(
+    note_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """List a note's kept versions, newest first (old ones are thinned over time)."""
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+    
+    note = _get_note(db, note_id, current_user.id)
+    revisions = db.query(
+        NoteRevision.version, NoteRevision.content_length, NoteRevision.created_at
+    ).filter(
+        NoteRevision.note_id == note_id
+    ).order_by(NoteRevision.version.desc()).all()
+    return cache.put(
+        [NoteRevisionResponse.model_validate(revision) for revision in revisions],
+        f"note:{note_id}", f"notes:{note.chapter_id}", f"book:{note.chapter.book_id}"
+    )
+
+
+@router.get("/api/notes/{note_id}/revisions/{version}", response_model=NoteRevisionContent)
+def get_revision(
+    note_id: int,
+    version: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get a note's content as it was at a version."""
+    _get_note(db, note_id, current_user.id)
+    revision, content = _get_revision(db, note_id, version)
+    
+    return NoteRevisionContent(
+        version=revision.version,
+        content=content,
+        created_at=revision.created_at
+    )
+
+
+@router.post("/api/notes/{note_id}/revisions/{version}/restore", response_model=NoteResponse)
+def restore_revision(
+    note_id: int,
+    version: int,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Make a past version the note's current content. This is saved as a new version."""
+    # Anything autosaved becomes a version of its own first
+    note_write_buffer.flush([(current_user.id, note_id)])
+    
+    note = _get_note(db, note_id, current_user.id)
+    _, content = _get_revision(db, note_id, version)
+    
+    if content != note.content:
+        old_content = note.content
+        note.content = content
+        note_updated(db, note, note.chapter.book_id, old_content)
+        if record_revision(db, note, old_content):
+            background_tasks.add_task(thin_note_revisions, note.id, current_user.id)
+    
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Note has changed"
+        )
+    response_cache.invalidate(current_user.id, f"note:{note_id}", f"notes:{note.chapter_id}", "search")
+    publish_event(current_user.id, "note.updated", id=note_id, chapter_id=note.chapter_id, version=note.version)
+    
+    return note_to_response(note)
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..models.user import User
+from ..models.book import Book
+from ..models.chapter import Chapter
+from ..models.stats import BookStats, ChapterStats, DailyStats, UserStats
+from ..schemas.stats import BookWords, ChapterActivity, DailyActivity, StatsResponse
+from ..utils.security import get_current_user, get_read_db
+
+router = APIRouter(prefix="/api/stats", tags=["Stats"])
+
+
+@router.get("", response_model=StatsResponse)
+def get_stats(
+    days: int = Query(30, ge=1, le=366),
+    top_chapters: int = Query(5, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get writing statistics for the current user.
+
+    Served from rollup tables, so the cost does not grow with the number of notes.
+    """
+    totals = db.get(UserStats, current_user.id)
+    
+    since = date.today() - timedelta(days=days - 1)
+    daily = db.query(DailyStats).filter(
+        DailyStats.user_id == current_user.id,
+        DailyStats.day >= since
+    ).order_by(DailyStats.day).all()
+    
+    books = db.query(BookStats, Book.name).join(
+        Book, Book.id == BookStats.book_id
+    ).filter(
+        BookStats.user_id == current_user.id,
+        Book.deleted_at.is_(None)
+    ).order_by(BookStats.word_count.desc()).all()
+    
+    chapters = db.query(ChapterStats, Chapter.name).join(
+        Chapter, Chapter.id == ChapterStats.chapter_id
+    ).filter(
+        ChapterStats.user_id == current_user.id
+    ).order_by(ChapterStats.activity.desc()).limit(top_chapters).all()
+    
+    return StatsResponse(
+        total_notes=totals.note_count if totals else 0,
+        total_words=totals.word_count if totals else 0,
+        storage_bytes=totals.storage_bytes if totals else 0,
+        notes_per_day=[
+            DailyActivity(
+                day=row.day,
+                notes_created=row.notes_created,
+                notes_updated=row.notes_updated,
+                words_added=row.words_added
+            )
+            for row in daily
+        ],
+        words_per_book=[
+            BookWords(
+                book_id=row.book_id,
+                book_name=name,
+                note_count=row.note_count,
+                word_count=row.word_count,
+                storage_bytes=row.storage_bytes
+            )
+            for row, name in books
+        ],
+        most_active_chapters=[
+            ChapterActivity(
+                chapter_id=row.chapter_id,
+                chapter_name=name,
+                book_id=row.book_id,
+                activity=row.activity,
+                note_count=row.note_count,
+                last_activity_at=row.last_activity_at
+            )
+            for row, name in chapters
+        ]
+    )
@@ -1,31 +1,38 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
-from ..database import get_db
 from ..models.user import User
 from ..models.tag import Tag
 from ..schemas.tag import TagCreate, TagUpdate, TagResponse
-from ..utils.security import get_current_user
+from ..services.cache import response_cache
+from ..services.events import publish_event
+from ..utils.security import get_current_user, get_read_db, get_user_db
 
 router = APIRouter(prefix="/api/tags", tags=["Tags"])
 
 
 @router.get("", response_model=List[TagResponse])
 def get_tags(
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all tags for the current user."""
+    cache = response_cache.for_request(request, current_user.id)
+    cached = cache.get()
+    if cached is not None:
+        return cached
+    
     tags = db.query(Tag).filter(Tag.user_id == current_user.id).all()
-    return tags
+    return cache.put([TagResponse.model_validate(tag) for tag in tags], "tags")
 
 
 @router.post("", response_model=TagResponse, status_code=status.HTTP_201_CREATED)
 def create_tag(
     tag_data: TagCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Create a new tag."""
     tag = Tag(
@@ -35,7 +42,8 @@ def create_tag(
     )
     db.add(tag)
     db.commit()
-    db.refresh(tag)
+    response_cache.invalidate(current_user.id, "tags")
+    publish_event(current_user.id, "tag.created", id=tag.id)
     
     return tag
 
@@ -45,7 +53,7 @@ def update_tag(
     tag_id: int,
     tag_data: TagUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Update a tag."""
     tag = db.query(Tag).filter(
@@ -65,7 +73,8 @@ def update_tag(
         tag.color = tag_data.color
     
     db.commit()
-    db.refresh(tag)
+    response_cache.invalidate(current_user.id, "tags")
+    publish_event(current_user.id, "tag.updated", id=tag_id)
     
     return tag
 
@@ -74,7 +83,7 @@ def update_tag(
 def delete_tag(
     tag_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_db)
 ):
     """Delete a tag."""
     tag = db.query(Tag).filter(
@@ -90,5 +99,7 @@ def delete_tag(
     
     db.delete(tag)
     db.commit()
+    response_cache.invalidate(current_user.id, "tags")
+    publish_event(current_user.id, "tag.deleted", id=tag_id)
     
     return None
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+
+
+class AdmissionGroupUpdate(BaseModel):
+    """Schema for changing one route group's admission limits (omitted fields are kept)."""
+    limit: Optional[int] = Field(None, ge=0)
+    queue_size: Optional[int] = Field(None, ge=0)
+    timeout_ms: Optional[int] = Field(None, ge=0)
+
+
+class AdmissionUpdate(BaseModel):
+    """Schema for changing admission limits at runtime."""
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    groups: Dict[str, AdmissionGroupUpdate] = {}
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class AttachmentResponse(BaseModel):
+    """Schema for attachment response."""
+    id: int
+    note_id: int
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+    url: str  # Download URL; the same for every attachment with identical content
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
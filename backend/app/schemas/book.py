@@ -13,6 +13,11 @@ class BookUpdate(BaseModel):
     name: Optional[str] = None
 
 
+class BookClone(BaseModel):
+    """Schema for cloning a book."""
+    name: Optional[str] = None  # Defaults to "<name> (copy)"
+
+
 class BookResponse(BaseModel):
     """Schema for book response."""
     id: int
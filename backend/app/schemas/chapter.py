@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class ChapterCreate(BaseModel):
@@ -13,11 +13,24 @@ class ChapterUpdate(BaseModel):
     name: Optional[str] = None
 
 
+class ChapterClone(BaseModel):
+    """Schema for cloning a chapter."""
+    name: Optional[str] = None  # Defaults to "<name> (copy)"
+    book_id: Optional[int] = None  # Defaults to the chapter's own book
+
+
+class ChapterMove(BaseModel):
+    """Schema for moving chapters to another book."""
+    chapter_ids: List[int] = Field(min_length=1)
+    book_id: int
+
+
 class ChapterResponse(BaseModel):
     """Schema for chapter response."""
     id: int
     name: str
     book_id: int
+    position: str  # Sort key for manual ordering
     date: str  # Formatted date string for frontend
     created_at: datetime
     updated_at: datetime
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 
 class NoteCreate(BaseModel):
@@ -13,11 +13,35 @@ class NoteUpdate(BaseModel):
     content: Optional[str] = None
 
 
+class NoteMove(BaseModel):
+    """Schema for moving notes to another chapter."""
+    note_ids: List[int] = Field(min_length=1)
+    chapter_id: int
+
+
+class TextOperation(BaseModel):
+    """A single text edit. Offsets and lengths count Unicode code points."""
+    op: Literal["insert", "delete"]
+    offset: int = Field(ge=0)
+    text: Optional[str] = None  # Inserted text (insert only)
+    length: Optional[int] = Field(default=None, ge=0)  # Characters removed (delete only)
+
+
+class NotePatch(BaseModel):
+    """Schema for patching a note's content with text operations."""
+    base_version: int
+    operations: List[TextOperation]
+
+
 class NoteResponse(BaseModel):
     """Schema for note response."""
     id: int
-    content: str
+    content: Optional[str] = None  # Omitted from list responses unless requested
+    preview: str
+    content_length: int
+    version: int
     chapter_id: int
+    position: str  # Sort key for manual ordering
     date: str  # Formatted date string for frontend
     created_at: datetime
     updated_at: datetime
@@ -26,6 +50,23 @@ class NoteResponse(BaseModel):
         from_attributes = True
 
 
+class NoteRevisionResponse(BaseModel):
+    """Schema for an entry in a note's revision history."""
+    version: int
+    content_length: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class NoteRevisionContent(BaseModel):
+    """Schema for a note's content at a past version."""
+    version: int
+    content: str
+    created_at: datetime
+
+
 class NoteSearchResult(BaseModel):
     """Schema for search results with context."""
     id: int
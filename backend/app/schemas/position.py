@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class PositionUpdate(BaseModel):
+    """Schema for moving a chapter or note between two neighbours.
+
+    ``previous_id`` is the item it should follow and ``next_id`` the item it
+    should precede, as shown after the drop. Either may be omitted at the
+    ends of the list; with neither, the item moves to the end.
+    """
+    previous_id: Optional[int] = None
+    next_id: Optional[int] = None
+
+
+class MoveResult(BaseModel):
+    """Schema for the result of a bulk move."""
+    moved: int  # Items whose parent changed (ones already there are skipped)
@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import List, Optional
+
+
+class DailyActivity(BaseModel):
+    """Note activity on one day."""
+    day: date
+    notes_created: int
+    notes_updated: int
+    words_added: int
+
+
+class BookWords(BaseModel):
+    """Words and notes in one book."""
+    book_id: int
+    book_name: str
+    note_count: int
+    word_count: int
+    storage_bytes: int
+
+
+class ChapterActivity(BaseModel):
+    """A chapter ranked by note activity."""
+    chapter_id: int
+    chapter_name: str
+    book_id: int
+    activity: int
+    note_count: int
+    last_activity_at: Optional[datetime] = None
+
+
+class StatsResponse(BaseModel):
+    """Schema for the statistics overview."""
+    total_notes: int
+    total_words: int
+    storage_bytes: int
+    notes_per_day: List[DailyActivity]
+    words_per_book: List[BookWords]
+    most_active_chapters: List[ChapterActivity]
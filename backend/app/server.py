@@ -0,0 +1,308 @@
+"""Production server launcher: pre-forked uvicorn workers sharing one socket.
+
+The app (and every import it pulls in) is loaded once in the parent, the
+database schema is created, and then N workers are forked. The parent
+supervises them: it restarts workers that exit (including after
+``max_requests`` recycling) or stop heartbeating, and on SIGTERM/SIGINT
+asks every worker to drain in-flight requests before exiting.
+
+Usage (from the backend directory):
+    python -m app.server
+"""
+import math
+import os
+import random
+import signal
+import socket
+import time
+from multiprocessing.sharedctypes import RawArray
+
+import uvicorn
+
+from .config import get_settings
+from .services.events import EventRelay, event_broker
+
+settings = get_settings()
+
+# Shared-memory worker table, created before forking so every worker can read it
+_worker_table = None
+
+
+class WorkerTable:
+    """Per-worker state in shared memory, indexed by worker slot."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.pids = RawArray("i", size)
+        self.started = RawArray("d", size)
+        self.heartbeats = RawArray("d", size)
+        self.requests = RawArray("l", size)
+        self.restarts = RawArray("i", size)
+
+    def snapshot(self) -> list[dict]:
+        now = time.time()
+        return [
+            {
+                "slot": slot,
+                "pid": self.pids[slot],
+                "uptime_seconds": round(now - self.started[slot], 1) if self.started[slot] else None,
+                "heartbeat_age_seconds": round(now - self.heartbeats[slot], 2) if self.heartbeats[slot] else None,
+                "requests": self.requests[slot],
+                "restarts": self.restarts[slot],
+            }
+            for slot in range(self.size)
+        ]
+
+
+def worker_health() -> list[dict] | None:
+    """Health of every worker when running under this launcher, else None."""
+    return _worker_table.snapshot() if _worker_table is not None else None
+
+
+def detect_cpu_count() -> int:
+    """Number of CPUs available to this process, honouring cgroup CPU quotas."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(cpus, 1)
+
+
+def _event_loop() -> str:
+    try:
+        import uvloop  # noqa: F401
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+
+def _http_protocol() -> str:
+    try:
+        import httptools  # noqa: F401
+        return "httptools"
+    except ImportError:
+        return "h11"
+
+
+class WorkerServer(uvicorn.Server):
+    """Uvicorn server that heartbeats from its event loop into the worker table."""
+
+    def __init__(self, config: uvicorn.Config, slot: int):
+        super().__init__(config)
+        self.slot = slot
+
+    async def on_tick(self, counter: int) -> bool:
+        _worker_table.heartbeats[self.slot] = time.time()
+        _worker_table.requests[self.slot] = self.server_state.total_requests
+        return await super().on_tick(counter)
+
+    async def shutdown(self, sockets=None) -> None:
+        # Event streams never finish on their own; end them so draining isn't held up
+        event_broker.close()
+        await super().shutdown(sockets)
+
+
+class Supervisor:
+    """Forks, monitors and gracefully stops worker processes."""
+
+    def __init__(self, app, sock: socket.socket, workers: int, relay: EventRelay | None = None):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.relay = relay
+        self.stopping = False
+
+    def spawn(self, slot: int) -> None:
+        _worker_table.heartbeats[slot] = time.time()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(slot)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        _worker_table.pids[slot] = pid
+        _worker_table.started[slot] = time.time()
+
+    def _run_worker(self, slot: int) -> None:
+        # Default signal handling; uvicorn installs its own graceful handlers
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        # Never reuse connections opened before the fork
+        from .database import engine, read_engine
+        engine.dispose(close=False)
+        read_engine.dispose(close=False)
+
+        if self.relay is not None:
+            event_broker.attach_relay(self.relay, slot)
+        # One worker resuming interrupted purges is enough (see app.main.lifespan)
+        self.app.state.resume_purges = slot == 0
+
+        max_requests = None
+        if settings.max_requests > 0:
+            # Jitter so workers don't all recycle at the same moment
+            max_requests = settings.max_requests + random.randint(0, max(settings.max_requests_jitter, 0))
+
+        config = uvicorn.Config(
+            self.app,
+            loop=_event_loop(),
+            http=_http_protocol(),
+            lifespan="on",
+            limit_max_requests=max_requests,
+            timeout_graceful_shutdown=settings.graceful_timeout,
+            proxy_headers=True,
+            forwarded_allow_ips=settings.forwarded_allow_ips,
+        )
+        WorkerServer(config, slot).run(sockets=[self.sock])
+
+    def _slot_of(self, pid: int) -> int | None:
+        for slot in range(self.workers):
+            if _worker_table.pids[slot] == pid:
+                return slot
+        return None
+
+    def _handle_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for slot in range(self.workers):
+            self.spawn(slot)
+        print(f"🚀 Started {self.workers} workers on {self.sock.getsockname()}")
+
+        while not self.stopping:
+            time.sleep(0.5)
+            self._reap_and_respawn()
+            self._kill_unresponsive()
+
+        self._shutdown()
+
+    def _reap_and_respawn(self) -> None:
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self._slot_of(pid)
+            if slot is not None and not self.stopping:
+                _worker_table.restarts[slot] += 1
+                print(f"♻️ Worker {pid} (slot {slot}) exited; restarting")
+                self.spawn(slot)
+
+    def _kill_unresponsive(self) -> None:
+        now = time.time()
+        for slot in range(self.workers):
+            if now - _worker_table.heartbeats[slot] > settings.worker_timeout:
+                print(f"⚠️ Worker {_worker_table.pids[slot]} (slot {slot}) stopped heartbeating; killing")
+                _worker_table.heartbeats[slot] = now
+                try:
+                    os.kill(_worker_table.pids[slot], signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _shutdown(self) -> None:
+        print("👋 Draining workers...")
+        for slot in range(self.workers):
+            try:
+                os.kill(_worker_table.pids[slot], signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.time() + settings.graceful_timeout + 5
+        remaining = {_worker_table.pids[slot] for slot in range(self.workers)}
+        while remaining and time.time() < deadline:
+            for pid in list(remaining):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    remaining.discard(pid)
+            time.sleep(0.1)
+
+        for pid in remaining:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        if self.relay is not None:
+            self.relay.close()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Create the listening socket shared by all workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main():
+    global _worker_table
+
+    workers = settings.web_concurrency or detect_cpu_count()
+    port = int(os.environ.get("PORT", settings.port))
+    if workers > 1 and settings.response_cache_backend == "memory":
+        # Each worker would keep its own copy, and other workers' writes never invalidate it
+        raise SystemExit(
+            f"❌ RESPONSE_CACHE_BACKEND=memory is per process and would serve stale data with {workers} workers; "
+            "use sqlite (or none), or set WEB_CONCURRENCY=1"
+        )
+    if workers > 1 and settings.note_write_behind_enabled:
+        # Autosaves wait in the buffer of the worker that took them; reads in other workers miss them
+        raise SystemExit(
+            f"❌ NOTE_WRITE_BEHIND_ENABLED buffers autosaves per process, so {workers} workers would read stale notes; "
+            "disable it or set WEB_CONCURRENCY=1"
+        )
+
+    # Preload the app and its imports once, so forked workers share them
+    from .main import app
+    from .database import engine, init_db, read_engine
+
+    init_db()
+    engine.dispose()
+    read_engine.dispose()
+
+    _worker_table = WorkerTable(workers)
+    sock = bind_socket(settings.host, port)
+    # Lets each worker's change events reach streams held by the others
+    relay = EventRelay(workers) if workers > 1 else None
+    Supervisor(app, sock, workers, relay).run()
+
+
+if __name__ == "__main__":
+    # Run through the importable module so app.main sees the same worker table
+    from app.server import main as run
+    run()
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import time
+import uuid
+from typing import AsyncIterable, Iterator
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import get_settings
+
+settings = get_settings()
+
+
+class AttachmentStore:
+    """Attachment files on local disk, addressed by SHA-256 (<root>/ab/cd/abcd...).
+
+    Uploads are streamed to a temporary file while being hashed, then renamed
+    into place, so a stored file is always complete. If the content is
+    already stored the temporary file is dropped instead (deduplication).
+    Files are never deleted on the request path, since other attachments may
+    share them; scripts/gc_attachments.py removes unreferenced ones.
+    """
+
+    def __init__(self, root: str, chunk_size: int):
+        self.root = root
+        self.chunk_size = chunk_size
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.isfile(self.path(sha256))
+
+    async def save(self, chunks: AsyncIterable[bytes], max_bytes: int) -> tuple[str, int]:
+        """Stream chunks to disk and return (sha256, size).
+
+        Chunks are gathered into ``chunk_size`` writes, done off the event
+        loop. Raises ValueError once more than ``max_bytes`` arrive.
+        """
+        temp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+        temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        buffer = bytearray()
+        f = await run_in_threadpool(open, temp_path, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Attachment is larger than {max_bytes} bytes")
+                buffer += chunk
+                if len(buffer) >= self.chunk_size:
+                    await run_in_threadpool(self._write, f, digest, bytes(buffer))
+                    buffer.clear()
+            await run_in_threadpool(self._write, f, digest, bytes(buffer))
+            await run_in_threadpool(self._close, f)
+        except BaseException:
+            f.close()
+            os.remove(temp_path)
+            raise
+
+        sha256 = digest.hexdigest()
+        await run_in_threadpool(self._move_into_place, temp_path, sha256)
+        return sha256, size
+
+    @staticmethod
+    def _write(f, digest, data: bytes) -> None:
+        digest.update(data)
+        f.write(data)
+
+    @staticmethod
+    def _close(f) -> None:
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+
+    def _move_into_place(self, temp_path: str, sha256: str) -> None:
+        path = self.path(sha256)
+        if os.path.exists(path):
+            os.remove(temp_path)
+            # Refresh the mtime so garbage collection leaves it alone until our row commits
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+
+    def files(self) -> Iterator[tuple[str, str, float]]:
+        """Yield (sha256, path, mtime) for every stored file and leftover temporary file."""
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    yield name, path, os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+
+    def remove_unreferenced(self, referenced: set[str], grace_seconds: float, dry_run: bool = False) -> tuple[int, int]:
+        """Delete files (and abandoned uploads) not in ``referenced`` and older than the grace period.
+
+        Returns (files removed, bytes freed).
+        """
+        cutoff = time.time() - grace_seconds
+        removed = freed = 0
+        for name, path, mtime in self.files():
+            if name in referenced or mtime >= cutoff:
+                continue
+            size = os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+            removed += 1
+            freed += size
+        return removed, freed
+
+
+attachment_store = AttachmentStore(settings.attachment_dir, settings.attachment_chunk_size)
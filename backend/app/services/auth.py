@@ -2,7 +2,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 from ..models.user import User
 from ..schemas.user import UserCreate
-from ..utils.security import get_password_hash, verify_password
+from ..utils.security import get_password_hash, verify_and_update_password
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -20,7 +20,6 @@ def create_user(db: Session, user_data: UserCreate) -> User:
     )
     db.add(user)
     db.commit()
-    db.refresh(user)
     return user
 
 
@@ -29,6 +28,11 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     user = get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = verify_and_update_password(password, user.password_hash)
+    if not valid:
         return None
+    if new_hash is not None:
+        # Move the stored hash to the current cost while the password is at hand
+        user.password_hash = new_hash
+        db.commit()
     return user
@@ -0,0 +1,305 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from ..config import get_settings
+from ..utils.encoding import MSGPACK_MEDIA_TYPE, negotiate, packb, wants_msgpack
+
+settings = get_settings()
+
+# Every entry depends on its user's generation, so a user can be flushed at once
+USER_TAG = "*"
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache bounded by total value size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+
+    def generations(self, names: list[str]) -> dict[str, int]:
+        with self._lock:
+            return {name: self._generations.get(name, 0) for name in names}
+
+    def bump(self, names: list[str]) -> None:
+        with self._lock:
+            for name in names:
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "evictions": self._evictions}
+
+
+class SQLiteCacheBackend:
+    """Cache stored in a local SQLite file, shared by all worker processes on a host.
+
+    Triggers keep the total size of the entries in cache_counters, so a store
+    needn't sum the table. Hits only rewrite an entry's access time once it is
+    ACCESS_RESOLUTION_SECONDS old, so most cached reads don't write.
+    """
+
+    ACCESS_RESOLUTION_SECONDS = 60  # Eviction order is least recently used to within this
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed ON cache_entries (accessed);
+            CREATE TABLE IF NOT EXISTS cache_generations (name TEXT PRIMARY KEY, gen INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS cache_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO cache_counters (name, value)
+                SELECT 'bytes', COALESCE(SUM(size), 0) FROM cache_entries;
+            CREATE TRIGGER IF NOT EXISTS cache_entries_added AFTER INSERT ON cache_entries BEGIN
+                UPDATE cache_counters SET value = value + NEW.size WHERE name = 'bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS cache_entries_removed AFTER DELETE ON cache_entries BEGIN
+                UPDATE cache_counters SET value = value - OLD.size WHERE name = 'bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS cache_entries_resized AFTER UPDATE OF size ON cache_entries BEGIN
+                UPDATE cache_counters SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+            END;
+            COMMIT;
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection opened before the launcher forked belongs to the parent
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> bytes | None:
+        conn = self._conn()
+        row = conn.execute("SELECT value, accessed FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] >= self.ACCESS_RESOLUTION_SECONDS:
+            conn.execute("UPDATE cache_entries SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        conn = self._conn()
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the triggers
+        conn.execute(
+            "INSERT INTO cache_entries (key, value, size, accessed) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, accessed = excluded.accessed",
+            (key, value, len(value), time.time()),
+        )
+        total = self._total(conn)
+        while total > self.max_bytes:
+            row = conn.execute("SELECT key, size FROM cache_entries ORDER BY accessed LIMIT 1").fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (row[0],))
+            conn.execute(
+                "INSERT INTO cache_counters (name, value) VALUES ('evictions', 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+            )
+            total -= row[1]
+
+    @staticmethod
+    def _total(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM cache_counters WHERE name = 'bytes'").fetchone()
+        return row[0] if row else 0
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def generations(self, names: list[str]) -> dict[str, int]:
+        placeholders = ",".join("?" * len(names))
+        rows = self._conn().execute(
+            f"SELECT name, gen FROM cache_generations WHERE name IN ({placeholders})", names
+        ).fetchall()
+        found = dict(rows)
+        return {name: found.get(name, 0) for name in names}
+
+    def bump(self, names: list[str]) -> None:
+        self._conn().executemany(
+            "INSERT INTO cache_generations (name, gen) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET gen = gen + 1",
+            [(name,) for name in names],
+        )
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        entries = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        size = self._total(conn)
+        evictions = conn.execute("SELECT value FROM cache_counters WHERE name = 'evictions'").fetchone()
+        return {"entries": entries, "bytes": size, "evictions": evictions[0] if evictions else 0}
+
+
+class ResponseCache:
+    """Per-user cache for GET responses with tag-based invalidation.
+
+    Each entry records the generation of every tag it depends on, plus the
+    user's own generation. Writes bump those generations, which makes any
+    dependent entry stale on its next lookup.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def tag_names(user_id: int, tags) -> list[str]:
+        return [f"{user_id}:{tag}" for tag in tags]
+
+    @staticmethod
+    def writes_name(user_id: int) -> str:
+        return f"{user_id}:writes"
+
+    def for_request(self, request: Request, user_id: int) -> "CachedRequest":
+        """Start a cache lookup for a GET request made by a user."""
+        return CachedRequest(self, request, user_id)
+
+    def invalidate(self, user_id: int, *tags: str) -> None:
+        """Invalidate a user's entries that depend on any of the tags (all of them if none given)."""
+        if not self.enabled:
+            return
+        names = self.tag_names(user_id, tags or (USER_TAG,))
+        self.backend.bump(names + [self.writes_name(user_id)])
+        with self._lock:
+            self.invalidations += 1
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            result = {
+                "backend": type(self.backend).__name__ if self.backend else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+        if self.enabled:
+            result.update(self.backend.stats())
+        return result
+
+
+class CachedRequest:
+    """Cache lookup and store for a single GET request."""
+
+    def __init__(self, cache: ResponseCache, request: Request, user_id: int):
+        self.cache = cache
+        self.request = request
+        self.user_id = user_id
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        self.key = f"{user_id}:{request.url.path}?{query}"
+        self._writes = None
+        if cache.enabled:
+            # Snapshot before the handler reads the DB, so a write that lands
+            # in between prevents caching a stale result
+            self._writes = cache.backend.generations([cache.writes_name(user_id)])
+
+    def get(self) -> Response | None:
+        """Return the cached response, or None on a miss."""
+        if not self.cache.enabled:
+            return None
+        raw = self.cache.backend.get(self.key)
+        if raw is not None:
+            header, _, body = raw.partition(b"\n")
+            generations = json.loads(header)
+            if self.cache.backend.generations(list(generations)) == generations:
+                self.cache.record(hit=True)
+                return self._respond(body)
+            self.cache.backend.delete(self.key)
+        self.cache.record(hit=False)
+        return None
+
+    def put(self, payload, *tags: str):
+        """Cache a payload under the given dependency tags and return it as a response."""
+        if not self.cache.enabled:
+            return negotiate(self.request, payload)
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+        names = self.cache.tag_names(self.user_id, (USER_TAG, *tags))
+        generations = self.cache.backend.generations(names)
+        # Skip caching if the user wrote anything since this request started
+        if self.cache.backend.generations(list(self._writes)) == self._writes:
+            header = json.dumps(generations).encode("utf-8")
+            self.cache.backend.set(self.key, header + b"\n" + body)
+        return self._respond(body)
+
+    def _respond(self, body: bytes) -> Response:
+        if wants_msgpack(self.request):
+            return Response(packb(json.loads(body)), media_type=MSGPACK_MEDIA_TYPE, headers={"Vary": "Accept"})
+        return Response(body, media_type="application/json")
+
+
+def create_backend():
+    """Build the configured cache backend (None disables caching)."""
+    if settings.response_cache_backend == "memory":
+        return MemoryCacheBackend(settings.response_cache_max_bytes)
+    if settings.response_cache_backend == "sqlite":
+        return SQLiteCacheBackend(settings.response_cache_path, settings.response_cache_max_bytes)
+    return None
+
+
+response_cache = ResponseCache(create_backend())
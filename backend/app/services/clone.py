@@ -0,0 +1,111 @@
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from ..models.attachment import Attachment
+from ..models.book import Book
+from ..models.chapter import Chapter
+from ..models.note import Note
+from .stats import add_attachment_bytes, book_cloned, chapter_cloned
+
+# Cloning copies rows with INSERT ... SELECT, so note bodies (compressed or
+# not) go from table to table without being loaded into Python. Each copy
+# records its source in cloned_from_id, which pairs the two for the next step.
+
+
+def _clone_map(model, *criteria):
+    """Subquery pairing source rows (old_id) with their clones (new_id), for clones matching ``criteria``."""
+    return select(
+        model.cloned_from_id.label("old_id"), model.id.label("new_id")
+    ).where(model.cloned_from_id.is_not(None), *criteria).subquery()
+
+
+def _copy_notes(db: Session, user_id: int, source, chapter_id) -> int:
+    """Copy the notes selected by ``source`` into new rows. Returns the number copied.
+
+    ``chapter_id`` is the SQL expression giving each copy's chapter.
+    """
+    result = db.execute(
+        insert(Note).from_select(
+            ["content", "preview", "content_length", "word_count", "storage_bytes", "search_signature", "version",
+             "chapter_id", "user_id", "position", "cloned_from_id"],
+            source.with_only_columns(
+                Note.stored_content, Note.preview, Note.content_length, Note.word_count, Note.storage_bytes,
+                Note.search_signature, literal(1), chapter_id, Note.user_id, Note.position, Note.id
+            ).where(Note.user_id == user_id)
+        ).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _copy_attachments(db: Session, user_id: int, note_map) -> None:
+    """Attach the source notes' files to their clones; the files themselves are shared."""
+    size = db.scalar(
+        select(func.coalesce(func.sum(Attachment.size), 0))
+        .join(note_map, note_map.c.old_id == Attachment.note_id)
+        .where(Attachment.user_id == user_id)
+    )
+    if not size:
+        return
+    db.execute(
+        insert(Attachment).from_select(
+            ["note_id", "user_id", "sha256", "size", "filename", "content_type"],
+            select(
+                note_map.c.new_id, Attachment.user_id, Attachment.sha256, Attachment.size,
+                Attachment.filename, Attachment.content_type
+            )
+            .join(note_map, note_map.c.old_id == Attachment.note_id)
+            .where(Attachment.user_id == user_id)
+        ).execution_options(synchronize_session=False)
+    )
+    # Counted like any other attachment, though a clone can't be refused for quota
+    add_attachment_bytes(db, user_id, size)
+
+
+def clone_book(db: Session, user_id: int, source_book_id: int, name: str) -> tuple[int, int]:
+    """Copy a book with its chapters, notes and attachments. Doesn't commit.
+
+    Returns the new book's id and the number of notes copied.
+    """
+    book_id = db.execute(
+        insert(Book).values(name=name, user_id=user_id).returning(Book.id)
+    ).scalar_one()
+
+    db.execute(
+        insert(Chapter).from_select(
+            ["name", "book_id", "user_id", "position", "cloned_from_id"],
+            select(Chapter.name, literal(book_id), Chapter.user_id, Chapter.position, Chapter.id)
+            .where(Chapter.user_id == user_id, Chapter.book_id == source_book_id)
+        ).execution_options(synchronize_session=False)
+    )
+
+    # Everything in the new book is a copy
+    chapter_map = _clone_map(Chapter, Chapter.user_id == user_id, Chapter.book_id == book_id)
+    note_count = _copy_notes(
+        db, user_id,
+        select(Note).join(chapter_map, chapter_map.c.old_id == Note.chapter_id),
+        chapter_map.c.new_id
+    )
+
+    _copy_attachments(db, user_id, _clone_map(
+        Note, Note.user_id == user_id, Note.chapter_id.in_(select(chapter_map.c.new_id))
+    ))
+    book_cloned(db, user_id, source_book_id, book_id, chapter_map)
+    return book_id, note_count
+
+
+def clone_chapter(db: Session, user_id: int, source: Chapter, book_id: int, name: str,
+                  position: str) -> tuple[int, int]:
+    """Copy a chapter with its notes and attachments into a book. Doesn't commit.
+
+    Returns the new chapter's id and the number of notes copied.
+    """
+    chapter_id = db.execute(
+        insert(Chapter).values(
+            name=name, book_id=book_id, user_id=user_id, position=position, cloned_from_id=source.id
+        ).returning(Chapter.id)
+    ).scalar_one()
+
+    note_count = _copy_notes(db, user_id, select(Note).where(Note.chapter_id == source.id), literal(chapter_id))
+    _copy_attachments(db, user_id, _clone_map(Note, Note.user_id == user_id, Note.chapter_id == chapter_id))
+    chapter_cloned(db, user_id, source.id, chapter_id, book_id)
+    return chapter_id, note_count
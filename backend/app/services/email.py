@@ -0,0 +1,111 @@
+import importlib
+import os
+import smtplib
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+from functools import lru_cache
+
+from ..config import get_settings
+
+settings = get_settings()
+
+
+class EmailBackend(ABC):
+    """Delivers a single email. Raise on failure so the outbox retries it."""
+
+    @abstractmethod
+    def send(self, message: EmailMessage) -> None:
+        ...
+
+
+class ConsoleBackend(EmailBackend):
+    """Writes emails to stdout (development only, since reset links end up in the logs)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def send(self, message: EmailMessage) -> None:
+        with self._lock:
+            self.stream.write(f"📧 {message.as_string()}\n")
+            self.stream.flush()
+
+
+class FileBackend(EmailBackend):
+    """Writes each email to its own .eml file in a directory (tests and staging)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def send(self, message: EmailMessage) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.time_ns()}-{threading.get_ident()}.eml")
+        with open(path, "wb") as f:
+            f.write(message.as_bytes())
+
+
+class SMTPBackend(EmailBackend):
+    """Sends email through an SMTP server, one connection per message."""
+
+    def __init__(self, host: str, port: int, username: str = "", password: str = "",
+                 use_tls: bool = True, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send(self, message: EmailMessage) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+@lru_cache()
+def get_email_backend() -> EmailBackend:
+    """Backend selected by ``email_backend``: console, file, smtp or "module:Class".
+
+    Raises (so emails stay queued in the outbox) when none is configured, or
+    when the console backend is used outside development.
+    """
+    development = settings.environment == "development"
+    name = settings.email_backend or ("console" if development else "")
+    if not name:
+        raise RuntimeError("No email backend configured; set EMAIL_BACKEND to file, smtp or package.module:Class")
+    if name == "console":
+        if not development:
+            raise RuntimeError("The console email backend writes reset links to the logs and is only allowed "
+                               "when ENVIRONMENT=development")
+        return ConsoleBackend()
+    if name == "file":
+        return FileBackend(settings.email_file_dir)
+    if name == "smtp":
+        return SMTPBackend(
+            settings.smtp_host,
+            settings.smtp_port,
+            settings.smtp_username,
+            settings.smtp_password,
+            settings.smtp_use_tls,
+            settings.smtp_timeout,
+        )
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown email backend '{name}'")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def build_message(to_address: str, subject: str, body: str) -> EmailMessage:
+    """Build a plain-text email from the configured sender."""
+    message = EmailMessage()
+    message["From"] = settings.email_from
+    message["To"] = to_address
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from ..config import get_settings
+
+settings = get_settings()
+
+
+def _resync_frame(id_line: bytes) -> bytes:
+    """Event telling a client it may have missed events and must re-fetch what it shows.
+
+    It carries the id of the latest event, so the client resumes from there.
+    """
+    return id_line + b"\nevent: resync\ndata: {}\n\n"
+
+
+class EventStream:
+    """One connected client: a bounded queue of encoded events, used on the stream's event loop."""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, max_queued: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(max_queued)
+        self.overflowed = False
+
+    def push(self, frame: bytes) -> None:
+        """Queue a frame. A client that falls max_queued behind gets a resync instead."""
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self._replace_with(_resync_frame(frame.split(b"\n", 1)[0]))
+
+    def close(self) -> None:
+        self._replace_with(None)
+
+    def _replace_with(self, item: bytes | None) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(item)
+
+
+class _UserHistory:
+    def __init__(self, size: int, dropped_seq: int):
+        self.events: deque[tuple[int, bytes]] = deque(maxlen=size)
+        self.dropped_seq = dropped_seq  # Newest event no longer kept
+
+
+class EventRelay:
+    """Unix datagram sockets, one per worker slot, so each worker's events reach the others.
+
+    Created by the launcher before forking; each worker reads the socket of
+    its slot and sends to the rest. Sockets outlive worker restarts.
+    """
+
+    def __init__(self, slots: int):
+        self.directory = tempfile.mkdtemp(prefix="notekeeper-events-")
+        self.paths = [os.path.join(self.directory, f"{slot}.sock") for slot in range(slots)]
+        self.sockets = []
+        for path in self.paths:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            sock.setblocking(False)
+            self.sockets.append(sock)
+
+    def close(self) -> None:
+        for sock in self.sockets:
+            sock.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class EventBroker:
+    """Fans out library change events to each user's SSE streams on this worker.
+
+    Events are numbered "<boot>-<seq>" from a per-process sequence, and the
+    last events_replay_size per user are kept so a reconnecting client can
+    resume after its Last-Event-ID. A client whose position can't be
+    resumed (events from another process, or too far behind) gets a resync
+    event instead.
+    """
+
+    def __init__(self, max_streams: int, max_queued: int, replay_size: int, history_users: int):
+        self.max_streams = max_streams
+        self.max_queued = max_queued
+        self.replay_size = replay_size
+        self.history_users = history_users
+        self.boot = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._forgotten_seq = 0  # Newest event of any user whose history was evicted
+        self._streams: dict[int, set[EventStream]] = {}
+        self._stream_count = 0
+        self._history: OrderedDict[int, _UserHistory] = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._relay_socket: socket.socket | None = None
+        self._relay_sender: socket.socket | None = None
+        self._relay_peers: list[str] = []
+        self._stalled_until: dict[str, float] = {}
+        self.published = 0
+        self.rejected = 0
+        self.overflows = 0
+        self.relay_received = 0
+        self.relay_dropped = 0
+
+    def attach_relay(self, relay: EventRelay, slot: int) -> None:
+        """Share events with the other workers through ``relay`` (call in the worker, after forking)."""
+        self._relay_socket = relay.sockets[slot]
+        self._relay_peers = [path for i, path in enumerate(relay.paths) if i != slot]
+        self._relay_sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        # Peers' queues are short; wait briefly for room rather than drop
+        self._relay_sender.settimeout(0.05)
+
+    def start(self) -> None:
+        """Start on the worker's event loop. Ids restart here, so forked workers never share them."""
+        self.boot = uuid.uuid4().hex[:8]
+        self._closed = False
+        self._loop = asyncio.get_running_loop()
+        if self._relay_socket is not None:
+            self._loop.add_reader(self._relay_socket.fileno(), self._receive)
+        # Servers drain open responses before shutting the app down, and streams never finish
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                self._close_on_signal(sig)
+
+    def _close_on_signal(self, sig: int) -> None:
+        previous = signal.getsignal(sig)
+
+        def handler(signum, frame):
+            self.close()
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                signal.signal(signum, previous or signal.SIG_DFL)
+                signal.raise_signal(signum)
+
+        signal.signal(sig, handler)
+
+    def close(self) -> None:
+        """End every stream (at shutdown), so clients reconnect instead of holding the worker."""
+        with self._lock:
+            self._closed = True
+            streams = [stream for user_streams in self._streams.values() for stream in user_streams]
+        for stream in streams:
+            self._call(stream, stream.close)
+        if self._loop is not None and self._relay_socket is not None:
+            self._loop.remove_reader(self._relay_socket.fileno())
+
+    def has_room(self) -> bool:
+        with self._lock:
+            return not self._closed and self._stream_count < self.max_streams
+
+    def subscribe(self, user_id: int, last_event_id: str | None) -> tuple[EventStream, list[bytes]] | None:
+        """Open a stream for a user, with the frames to replay first, or None if at the stream cap."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._closed or self._stream_count >= self.max_streams:
+                self.rejected += 1
+                return None
+            stream = EventStream(user_id, loop, self.max_queued)
+            self._streams.setdefault(user_id, set()).add(stream)
+            self._stream_count += 1
+            # Under the lock, so every event is either replayed or queued, never both
+            replay = self._replay(user_id, last_event_id) if last_event_id else []
+        return stream, replay
+
+    def unsubscribe(self, stream: EventStream) -> None:
+        with self._lock:
+            user_streams = self._streams.get(stream.user_id)
+            if user_streams is None or stream not in user_streams:
+                return
+            user_streams.discard(stream)
+            if not user_streams:
+                del self._streams[stream.user_id]
+            self._stream_count -= 1
+            if stream.overflowed:
+                self.overflows += 1
+
+    def _replay(self, user_id: int, last_event_id: str) -> list[bytes]:
+        resync = [_resync_frame(f"id: {self.boot}-{self._seq}".encode())]
+        boot, _, seq = last_event_id.strip().partition("-")
+        if boot != self.boot or not seq.isdigit():
+            return resync
+        last = int(seq)
+        history = self._history.get(user_id)
+        dropped_seq = history.dropped_seq if history is not None else self._forgotten_seq
+        if last < dropped_seq:
+            return resync
+        return [frame for event_seq, frame in history.events if event_seq > last] if history else []
+
+    def publish(self, user_id: int, event_type: str, data: dict, relay: bool = True) -> None:
+        """Send an event to the user's streams (on every worker, with a relay). Thread-safe."""
+        payload = json.dumps(data, separators=(",", ":"))
+        if relay and self._relay_sender is not None:
+            self._send_to_peers(json.dumps({"user_id": user_id, "type": event_type, "data": payload}).encode())
+
+        with self._lock:
+            self._seq += 1
+            frame = f"id: {self.boot}-{self._seq}\nevent: {event_type}\ndata: {payload}\n\n".encode()
+            history = self._history.get(user_id)
+            if history is None:
+                history = self._history[user_id] = _UserHistory(self.replay_size, self._forgotten_seq)
+                if len(self._history) > self.history_users:
+                    _, evicted = self._history.popitem(last=False)
+                    if evicted.events:
+                        self._forgotten_seq = max(self._forgotten_seq, evicted.events[-1][0])
+            else:
+                self._history.move_to_end(user_id)
+            if len(history.events) == history.events.maxlen:
+                history.dropped_seq = history.events[0][0]
+            history.events.append((self._seq, frame))
+            streams = list(self._streams.get(user_id, ()))
+            self.published += 1
+
+        for stream in streams:
+            self._call(stream, stream.push, frame)
+
+    @staticmethod
+    def _call(stream: EventStream, callback, *args) -> None:
+        try:
+            stream.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:  # Loop already closed
+            pass
+
+    def _send_to_peers(self, message: bytes) -> None:
+        now = time.monotonic()
+        for path in self._relay_peers:
+            # Skip a peer that recently stopped reading (restarting or stuck) instead of waiting on every event
+            if self._stalled_until.get(path, 0) > now:
+                self.relay_dropped += 1
+                continue
+            try:
+                self._relay_sender.sendto(message, path)
+            except OSError:
+                self._stalled_until[path] = now + 1.0
+                self.relay_dropped += 1
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                message = self._relay_socket.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                event = json.loads(message)
+                self.publish(event["user_id"], event["type"], json.loads(event["data"]), relay=False)
+                self.relay_received += 1
+            except (ValueError, KeyError) as e:
+                print(f"⚠️ Dropped malformed relayed event: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "streams": self._stream_count,
+                "users": len(self._streams),
+                "published": self.published,
+                "rejected": self.rejected,
+                "overflows": self.overflows,
+                "relay_received": self.relay_received,
+                "relay_dropped": self.relay_dropped,
+            }
+
+
+event_broker = EventBroker(
+    max_streams=settings.events_max_streams,
+    max_queued=settings.events_queue_size,
+    replay_size=settings.events_replay_size,
+    history_users=settings.events_history_users,
+)
+
+
+def publish_event(user_id: int, event_type: str, **data) -> None:
+    """Tell the user's open event streams about a change (call after it commits)."""
+    event_broker.publish(user_id, event_type, data)
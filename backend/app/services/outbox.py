@@ -0,0 +1,184 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models.outbox import OutboxEmail
+from .email import build_message, get_email_backend
+
+settings = get_settings()
+
+
+def enqueue_email(db: Session, to_address: str, subject: str, body: str) -> OutboxEmail:
+    """Add an email to the outbox. It is sent only if the caller's transaction commits."""
+    email = OutboxEmail(
+        to_address=to_address,
+        subject=subject,
+        body=body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.now(),
+    )
+    db.add(email)
+    return email
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: ~30s, 1m, 2m, ... capped at one hour."""
+    delay = min(settings.email_outbox_retry_base_seconds * 2 ** (attempts - 1), 3600)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class OutboxDispatcher:
+    """Background thread that drains the email outbox.
+
+    Due rows are claimed in batches by pushing ``next_attempt_at`` out by a
+    lease, so several workers can run dispatchers without sending twice, and
+    rows claimed by a worker that died become due again. Each batch is sent
+    with at most ``concurrency`` deliveries in flight.
+    """
+
+    def __init__(self, batch_size: int, concurrency: int, poll_seconds: float, max_attempts: int,
+                 lease_seconds: float):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Start the dispatcher thread."""
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the dispatcher after its current batch."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+
+    def wake(self) -> None:
+        """Drain the outbox now instead of at the next poll."""
+        self._wakeup.set()
+
+    def _claim(self, db: Session) -> list[OutboxEmail]:
+        """Lease a batch of due rows to this dispatcher."""
+        now = datetime.now()
+        due_ids = db.scalars(
+            select(OutboxEmail.id)
+            .where(OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.next_attempt_at)
+            .limit(self.batch_size)
+        ).all()
+        claimed = []
+        for email_id in due_ids:
+            # Conditional update so only one dispatcher wins each row
+            result = db.execute(
+                update(OutboxEmail)
+                .where(
+                    OutboxEmail.id == email_id,
+                    OutboxEmail.status == "pending",
+                    OutboxEmail.next_attempt_at <= now,
+                )
+                .values(
+                    next_attempt_at=now + timedelta(seconds=self.lease_seconds),
+                    attempts=OutboxEmail.attempts + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append(email_id)
+        db.commit()
+        if not claimed:
+            return []
+        return db.scalars(select(OutboxEmail).where(OutboxEmail.id.in_(claimed))).all()
+
+    def _deliver(self, email: OutboxEmail) -> str | None:
+        """Send one email, returning an error message on failure."""
+        try:
+            get_email_backend().send(build_message(email.to_address, email.subject, email.body))
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    def drain_once(self) -> int:
+        """Claim and send one batch. Returns the number of rows processed."""
+        db = SessionLocal()
+        try:
+            emails = self._claim(db)
+            if not emails:
+                return 0
+
+            with ThreadPoolExecutor(max_workers=max(self.concurrency, 1)) as pool:
+                errors = list(pool.map(self._deliver, emails))
+
+            now = datetime.now()
+            for email, error in zip(emails, errors):
+                if error is None:
+                    email.status = "sent"
+                    email.sent_at = now
+                    email.last_error = None
+                elif email.attempts >= self.max_attempts:
+                    email.status = "failed"
+                    email.last_error = error
+                else:
+                    email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+                    email.last_error = error
+            db.commit()
+
+            with self._lock:
+                for email, error in zip(emails, errors):
+                    if error is None:
+                        self.sent += 1
+                    elif email.status == "failed":
+                        self.failed += 1
+                    else:
+                        self.retried += 1
+            return len(emails)
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                # Keep going while full batches come back
+                while self.drain_once() >= self.batch_size and not self._stopping.is_set():
+                    pass
+            except Exception as e:  # Keep the dispatcher alive; rows stay in the outbox
+                print(f"⚠️ Email outbox dispatch failed: {e}")
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": settings.email_backend,
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+            }
+
+
+outbox_dispatcher = OutboxDispatcher(
+    batch_size=settings.email_outbox_batch_size,
+    concurrency=settings.email_outbox_concurrency,
+    poll_seconds=settings.email_outbox_poll_seconds,
+    max_attempts=settings.email_outbox_max_attempts,
+    lease_seconds=settings.email_outbox_lease_seconds,
+)
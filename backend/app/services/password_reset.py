@@ -3,9 +3,11 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from ..models.user import User
 from ..models.password_reset import PasswordResetToken
-from passlib.context import CryptContext
+from ..config import get_settings
+from ..utils.security import get_password_hash
+from .outbox import enqueue_email
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+settings = get_settings()
 
 
 def generate_reset_token() -> str:
@@ -13,8 +15,17 @@ def generate_reset_token() -> str:
     return secrets.token_urlsafe(32)
 
 
-def create_password_reset_token(db: Session, user_id: int, expires_in_hours: int = 1) -> PasswordResetToken:
-    """Create a new password reset token for a user."""
+def create_password_reset_token(
+    db: Session,
+    user_id: int,
+    expires_in_hours: int = 1,
+    email_to: str | None = None
+) -> PasswordResetToken:
+    """Create a new password reset token for a user.
+
+    With ``email_to``, the reset link email is queued in the outbox in the same
+    transaction, so it is sent if and only if the token is saved.
+    """
     token = generate_reset_token()
     expires_at = datetime.now() + timedelta(hours=expires_in_hours)
 
@@ -26,8 +37,15 @@ def create_password_reset_token(db: Session, user_id: int, expires_in_hours: int
     )
 
     db.add(reset_token)
+    if email_to:
+        enqueue_email(
+            db,
+            email_to,
+            "Reset your NoteKeeper password",
+            f"Use this link to reset your password:\n\n{settings.password_reset_url.format(token=token)}\n\n"
+            f"The link expires in {expires_in_hours} hour(s). If you didn't ask for this, ignore this email.",
+        )
     db.commit()
-    db.refresh(reset_token)
 
     return reset_token
 
@@ -45,14 +63,9 @@ def mark_token_as_used(db: Session, reset_token: PasswordResetToken) -> None:
     db.commit()
 
 
-def hash_password(password: str) -> str:
-    """Hash a password for storing."""
-    return pwd_context.hash(password)
-
-
 def update_user_password(db: Session, user: User, new_password: str) -> None:
     """Update a user's password."""
-    user.password_hash = hash_password(new_password)
+    user.password_hash = get_password_hash(new_password)
     db.commit()
 
 
@@ -0,0 +1,114 @@
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import session_for_user
+from ..utils.positions import key_between, spread_keys
+from .cache import response_cache
+
+settings = get_settings()
+
+
+def _bounds(db: Session, model, parent_column, parent_id: int, user_id: int):
+    return db.execute(
+        select(func.min(model.position), func.max(model.position))
+        .where(model.user_id == user_id, parent_column == parent_id)
+    ).one()
+
+
+def position_at_start(db: Session, model, parent_column, parent_id: int, user_id: int) -> str:
+    """Key placing a new row before every sibling."""
+    first, _ = _bounds(db, model, parent_column, parent_id, user_id)
+    return key_between(None, first)
+
+
+def position_at_end(db: Session, model, parent_column, parent_id: int, user_id: int) -> str:
+    """Key placing a new row after every sibling."""
+    _, last = _bounds(db, model, parent_column, parent_id, user_id)
+    return key_between(last, None)
+
+
+def positions_at_end(db: Session, model, parent_column, parent_id: int, user_id: int, count: int) -> list[str]:
+    """Keys placing ``count`` rows, in order, after every sibling."""
+    key = position_at_end(db, model, parent_column, parent_id, user_id)
+    keys = [key]
+    for _ in range(count - 1):
+        key = key_between(key, None)
+        keys.append(key)
+    return keys
+
+
+def position_between(db: Session, model, parent_column, parent_id: int, user_id: int,
+                     previous_id: int | None, next_id: int | None) -> str:
+    """Key placing a row right after ``previous_id`` and/or right before ``next_id``.
+
+    With neither, the row goes to the end. Raises LookupError if a neighbour
+    isn't a sibling owned by the user. If the neighbours' keys are out of
+    order (two concurrent moves into the same gap), the siblings are
+    rebalanced in the current transaction first.
+    """
+    if previous_id is None and next_id is None:
+        return position_at_end(db, model, parent_column, parent_id, user_id)
+    
+    args = (db, model, parent_column, parent_id, user_id, previous_id, next_id)
+    try:
+        return key_between(*_neighbour_keys(*args))
+    except ValueError:
+        _rebalance(db, model, parent_column, parent_id, user_id)
+        return key_between(*_neighbour_keys(*args))
+
+
+def _neighbour_keys(db: Session, model, parent_column, parent_id: int, user_id: int,
+                    previous_id: int | None, next_id: int | None) -> tuple[str | None, str | None]:
+    """Keys of the given neighbours, filling in the adjacent sibling when only one is given."""
+    siblings = (model.user_id == user_id, parent_column == parent_id)
+    neighbour_ids = {i for i in (previous_id, next_id) if i is not None}
+    keys = dict(db.execute(
+        select(model.id, model.position).where(model.id.in_(neighbour_ids), *siblings)
+    ).all())
+    if len(keys) != len(neighbour_ids):
+        raise LookupError("Neighbour not found")
+    
+    if next_id is None:
+        previous_key = keys[previous_id]
+        return previous_key, db.scalar(select(func.min(model.position)).where(*siblings, model.position > previous_key))
+    if previous_id is None:
+        next_key = keys[next_id]
+        return db.scalar(select(func.max(model.position)).where(*siblings, model.position < next_key)), next_key
+    return keys[previous_id], keys[next_id]
+
+
+def needs_rebalance(key: str) -> bool:
+    """Whether a key has grown long enough that its siblings should be respaced."""
+    return len(key) > settings.position_max_length
+
+
+def _rebalance(db: Session, model, parent_column, parent_id: int, user_id: int) -> list[int]:
+    """Give every sibling an evenly spaced short key, keeping their order. Doesn't commit."""
+    ids = db.scalars(
+        select(model.id)
+        .where(model.user_id == user_id, parent_column == parent_id)
+        .order_by(model.position, model.id)
+    ).all()
+    if ids:
+        table = model.__table__
+        # Core executemany; updated_at is kept since reordering isn't an edit
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(position=bindparam("row_position"), updated_at=table.c.updated_at),
+            [{"row_id": row_id, "row_position": key} for row_id, key in zip(ids, spread_keys(len(ids)))],
+        )
+    return ids
+
+
+def rebalance_positions(model, parent_column, parent_id: int, user_id: int, *cache_tags: str) -> None:
+    """Respace the ordering keys of one parent's children (run as a background task)."""
+    db = session_for_user(user_id)
+    try:
+        ids = _rebalance(db, model, parent_column, parent_id, user_id)
+        db.commit()
+    finally:
+        db.close()
+    item_tag = model.__tablename__[:-1]  # "note" / "chapter"
+    response_cache.invalidate(user_id, *cache_tags, *(f"{item_tag}:{row_id}" for row_id in ids))
@@ -0,0 +1,71 @@
+from sqlalchemy import func, select, delete, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import data_owners, session_for_user
+from ..models.book import Book
+from ..models.chapter import Chapter
+from ..models.note import Note
+
+settings = get_settings()
+
+
+def _delete_in_batches(db: Session, model, id_subquery_filter, batch_size: int) -> int:
+    """Delete rows of a model matching a filter, one batch per transaction."""
+    total = 0
+    while True:
+        batch_ids = select(model.id).where(id_subquery_filter).limit(batch_size)
+        result = db.execute(
+            delete(model).where(model.id.in_(batch_ids)).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+def hide_book_contents(db: Session, book_id: int, user_id: int) -> None:
+    """Mark a book's chapters and notes deleted along with the book, ahead of purge_book. Doesn't commit.
+
+    Lookups check the chapter's or note's own flag, so they needn't join the
+    book. One UPDATE per table; no index covers the flag, so none is rewritten.
+    """
+    chapter_ids = select(Chapter.id).where(Chapter.user_id == user_id, Chapter.book_id == book_id)
+    db.execute(
+        update(Chapter)
+        .where(Chapter.user_id == user_id, Chapter.book_id == book_id)
+        .values(deleted_at=func.now(), updated_at=Chapter.updated_at)
+    )
+    db.execute(
+        update(Note)
+        .where(Note.user_id == user_id, Note.chapter_id.in_(chapter_ids))
+        .values(deleted_at=func.now(), updated_at=Note.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def purge_book(book_id: int, user_id: int, batch_size: int | None = None) -> None:
+    """Delete a soft-deleted book's notes, chapters and the book itself in batches."""
+    batch_size = batch_size or settings.purge_batch_size
+    db = session_for_user(user_id)
+    try:
+        chapter_ids = select(Chapter.id).where(Chapter.book_id == book_id)
+        _delete_in_batches(db, Note, Note.chapter_id.in_(chapter_ids), batch_size)
+        _delete_in_batches(db, Chapter, Chapter.book_id == book_id, batch_size)
+        db.execute(delete(Book).where(Book.id == book_id, Book.deleted_at.is_not(None)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_pending_books() -> None:
+    """Resume purges for books that were marked deleted but not yet removed."""
+    pending = []
+    for owner in data_owners():
+        db = session_for_user(owner)
+        try:
+            pending.extend(db.execute(select(Book.id, Book.user_id).where(Book.deleted_at.is_not(None))).all())
+        finally:
+            db.close()
+    for book_id, user_id in pending:
+        purge_book(book_id, user_id)
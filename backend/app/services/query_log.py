@@ -0,0 +1,241 @@
+import contextvars
+import hashlib
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from ..config import get_settings
+
+settings = get_settings()
+
+# ASGI scope of the request running the current statement; None for background jobs
+current_scope: contextvars.ContextVar[dict | None] = contextvars.ContextVar("current_scope", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_NAMED_PARAM = re.compile(r"%\(\w+\)s|\$\d+")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL with literals and parameters replaced by ?, so runs of one statement group together.
+
+    Parameter lists of any length (IN clauses) collapse to ``(?...)``.
+    """
+    sql = _STRING.sub("?", statement)
+    sql = _NAMED_PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PARAM_LIST.sub("(?...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def parameter_shape(parameters, executemany: bool = False) -> str:
+    """Types of the bound parameters, without their values, e.g. ``(int, str, int×40)``."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} rows × {parameter_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        values = list(parameters.values())
+    else:
+        values = list(parameters or ())
+
+    runs: list[list] = []
+    for value in values:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return "(" + ", ".join(name if count == 1 else f"{name}×{count}" for name, count in runs) + ")"
+
+
+def explain(dbapi_connection, dialect_name: str, statement: str, parameters) -> str:
+    """Query plan of a statement, from a separate cursor so SQLAlchemy's events don't see it.
+
+    Nothing is executed: SQLite's EXPLAIN QUERY PLAN and PostgreSQL's EXPLAIN
+    (without ANALYZE) only plan the statement.
+    """
+    if not statement.lstrip().lower().startswith(_EXPLAINABLE):
+        return "(not explainable)"
+    cursor = dbapi_connection.cursor()
+    try:
+        if dialect_name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return "\n".join(f"{row[0]}|{row[1]}|{row[3]}" for row in cursor.fetchall())
+        if dialect_name == "postgresql":
+            # A failed statement would abort the caller's transaction
+            cursor.execute("SAVEPOINT query_log_explain")
+            try:
+                cursor.execute("EXPLAIN " + statement, parameters)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT query_log_explain")
+                raise
+            cursor.execute("RELEASE SAVEPOINT query_log_explain")
+            return plan
+        return f"(EXPLAIN not supported for {dialect_name})"
+    except Exception as e:
+        return f"(EXPLAIN failed: {e})"
+    finally:
+        cursor.close()
+
+
+def route_label() -> str:
+    """The route template running the current statement, e.g. ``GET /api/notes/{note_id}``."""
+    scope = current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return f"{scope.get('method', '')} {getattr(route, 'path', None) or scope.get('path', '')}"
+
+
+class _QueryStats:
+    def __init__(self, sql: str, samples: int):
+        self.sql = sql
+        self.count = 0
+        self.slow = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent: deque[float] = deque(maxlen=samples)
+        self.routes: Counter = Counter()
+        self.slowest: dict | None = None
+        self.plan: str | None = None
+        self.plan_at: float | None = None
+
+
+class QueryLog:
+    """Timings of every statement, grouped by normalized SQL fingerprint.
+
+    Statements slower than ``slow_ms`` are printed with their route and
+    parameter shape, and the first slow run of each fingerprint has its
+    query plan captured. Percentiles come from the last ``samples`` runs.
+    Kept per process.
+    """
+
+    def __init__(self, slow_ms: float, max_fingerprints: int, samples: int):
+        self.slow_seconds = slow_ms / 1000
+        self.max_fingerprints = max_fingerprints
+        self.samples = samples
+        self._stats: OrderedDict[str, _QueryStats] = OrderedDict()
+        self._fingerprints: dict[str, tuple[str, str]] = {}  # Statement -> (fingerprint, normalized SQL)
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.slow_statements = 0
+        self.evicted = 0
+
+    def _fingerprint(self, statement: str) -> tuple[str, str]:
+        # SQLAlchemy reuses the same compiled strings, so normalize each one once
+        known = self._fingerprints.get(statement)
+        if known is None:
+            sql = normalize_sql(statement)
+            known = (hashlib.sha1(sql.encode()).hexdigest()[:12], sql)
+            if len(self._fingerprints) >= self.max_fingerprints * 4:
+                self._fingerprints.clear()
+            self._fingerprints[statement] = known
+        return known
+
+    def record(self, statement: str, seconds: float) -> tuple[str, bool]:
+        """Add one run. Returns the fingerprint and whether the caller should capture its plan."""
+        fingerprint, sql = self._fingerprint(statement)
+        route = route_label()
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                stats = self._stats[fingerprint] = _QueryStats(sql, self.samples)
+                if len(self._stats) > self.max_fingerprints:
+                    self._stats.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._stats.move_to_end(fingerprint)
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.recent.append(seconds)
+            stats.routes[route] += 1
+            self.statements += 1
+            if slow:
+                stats.slow += 1
+                self.slow_statements += 1
+            needs_plan = slow and stats.plan is None
+        return fingerprint, needs_plan
+
+    def record_slow(self, fingerprint: str, seconds: float, parameters: str, plan: str | None) -> None:
+        """Remember a slow run's details and print it."""
+        route = route_label()
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                return
+            if stats.slowest is None or seconds >= stats.slowest["ms"] / 1000:
+                stats.slowest = {"ms": round(seconds * 1000, 2), "route": route, "parameters": parameters,
+                                 "at": time.time()}
+            if plan is not None:
+                stats.plan = plan
+                stats.plan_at = time.time()
+            sql = stats.sql
+        print(f"🐢 Slow query {seconds * 1000:.1f} ms [{route}] {fingerprint} {parameters}: {sql[:500]}")
+        if plan is not None:
+            print(f"   Query plan for {fingerprint}:\n   " + plan.replace("\n", "\n   "))
+
+    def snapshot(self, limit: int = 50, order_by: str = "total") -> dict:
+        """Fingerprints ordered by total time ("total"), slow runs ("slow") or worst time ("max")."""
+        with self._lock:
+            entries = [
+                (fingerprint, stats, sorted(stats.recent), stats.routes.most_common(5), stats.slowest)
+                for fingerprint, stats in self._stats.items()
+            ]
+            totals = {
+                "statements": self.statements,
+                "slow_statements": self.slow_statements,
+                "slow_threshold_ms": self.slow_seconds * 1000,
+                "fingerprints": len(self._stats),
+                "evicted": self.evicted,
+            }
+
+        sort_keys = {
+            "total": lambda entry: entry[1].total_seconds,
+            "slow": lambda entry: entry[1].slow,
+            "max": lambda entry: entry[1].max_seconds,
+        }
+        entries.sort(key=sort_keys.get(order_by, sort_keys["total"]), reverse=True)
+
+        def percentile(timings: list[float], fraction: float) -> float:
+            return round(timings[min(int(len(timings) * fraction), len(timings) - 1)] * 1000, 2)
+
+        queries = []
+        for fingerprint, stats, timings, routes, slowest in entries[:limit]:
+            queries.append({
+                "fingerprint": fingerprint,
+                "sql": stats.sql,
+                "count": stats.count,
+                "slow": stats.slow,
+                "total_ms": round(stats.total_seconds * 1000, 2),
+                "mean_ms": round(stats.total_seconds / stats.count * 1000, 3),
+                "p50_ms": percentile(timings, 0.5),
+                "p95_ms": percentile(timings, 0.95),
+                "p99_ms": percentile(timings, 0.99),
+                "max_ms": round(stats.max_seconds * 1000, 2),
+                "routes": dict(routes),
+                "slowest": slowest,
+                "plan": stats.plan,
+                "plan_at": stats.plan_at,
+            })
+        return {**totals, "queries": queries}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.statements = 0
+            self.slow_statements = 0
+            self.evicted = 0
+
+
+query_log = QueryLog(
+    slow_ms=settings.slow_query_ms,
+    max_fingerprints=settings.query_log_max_fingerprints,
+    samples=settings.query_log_samples,
+)
@@ -0,0 +1,169 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import session_for_user
+from ..models.note import Note
+from ..models.revision import NoteRevision
+from ..schemas.note import TextOperation
+from .cache import response_cache
+from .text_ops import apply_operations, diff_operations
+
+settings = get_settings()
+
+
+def _encode_delta(old: str, new: str) -> str:
+    return json.dumps(
+        [operation.model_dump(exclude_none=True) for operation in diff_operations(old, new)],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+
+
+def _apply_delta(content: str, data: str) -> str:
+    return apply_operations(content, [TextOperation(**operation) for operation in json.loads(data)])
+
+
+def _encode(previous_content: str | None, previous_chain: int, content: str) -> tuple[str, str, int]:
+    """(kind, data, chain_length) for a revision following one with ``previous_content``."""
+    if previous_content is not None and previous_chain + 1 < settings.note_revision_snapshot_interval:
+        delta = _encode_delta(previous_content, content)
+        if len(delta) < len(content):
+            return "delta", delta, previous_chain + 1
+    return "snapshot", content, 0
+
+
+def record_revision(db: Session, note: Note, old_content: str) -> bool:
+    """Add a revision for a note's new content. Call before the change is flushed.
+
+    The first change to a note also stores the content it replaces, as the
+    base of the chain. Returns True if a snapshot was written, which is when
+    callers should thin the note's history.
+    """
+    if not settings.note_revisions_enabled or note.content == old_content:
+        return False
+
+    old_version = note.version
+    latest = db.execute(
+        select(NoteRevision.version, NoteRevision.chain_length)
+        .where(NoteRevision.note_id == note.id)
+        .order_by(NoteRevision.version.desc())
+        .limit(1)
+    ).first()
+    if latest is None:
+        db.add(NoteRevision(
+            note_id=note.id,
+            user_id=note.user_id,
+            version=old_version,
+            kind="snapshot",
+            data=old_content,
+            chain_length=0,
+            content_length=len(old_content),
+            created_at=note.updated_at or func.now(),
+        ))
+        latest = (old_version, 0)
+
+    # If the chain doesn't end at the replaced version, start a new one
+    previous_content = old_content if latest[0] == old_version else None
+    kind, data, chain_length = _encode(previous_content, latest[1], note.content)
+    db.add(NoteRevision(
+        note_id=note.id,
+        user_id=note.user_id,
+        version=old_version + 1,  # What version_id_col will assign on flush
+        kind=kind,
+        data=data,
+        chain_length=chain_length,
+        content_length=len(note.content),
+    ))
+    return kind == "snapshot"
+
+
+def revision_content(db: Session, note_id: int, version: int) -> str | None:
+    """Rebuild a note's content at a version, or None if that version isn't kept.
+
+    Reads the nearest snapshot at or before the version and replays the
+    deltas after it (at most note_revision_snapshot_interval - 1 of them).
+    """
+    base_version = db.scalar(
+        select(func.max(NoteRevision.version))
+        .where(NoteRevision.note_id == note_id, NoteRevision.version <= version, NoteRevision.kind == "snapshot")
+    )
+    if base_version is None:
+        return None
+    chain = db.scalars(
+        select(NoteRevision)
+        .where(NoteRevision.note_id == note_id, NoteRevision.version.between(base_version, version))
+        .order_by(NoteRevision.version)
+    ).all()
+    if chain[-1].version != version:
+        return None
+
+    content = chain[0].data
+    for revision in chain[1:]:
+        content = revision.data if revision.kind == "snapshot" else _apply_delta(content, revision.data)
+    return content
+
+
+def _as_utc(moment: datetime) -> datetime:
+    # SQLite hands back the UTC CURRENT_TIMESTAMP without a timezone
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+def thin_revisions(db: Session, note_id: int, now: datetime | None = None) -> int:
+    """Thin a note's old revisions, rewriting the chain around the removed ones. Doesn't commit.
+
+    Revisions newer than note_revision_keep_all_hours are all kept, then
+    the latest per hour up to note_revision_keep_hourly_days, then the
+    latest per day. The newest revision is always kept. Returns the number
+    of revisions removed.
+    """
+    revisions = db.scalars(
+        select(NoteRevision).where(NoteRevision.note_id == note_id).order_by(NoteRevision.version)
+    ).all()
+    now = now or datetime.now(timezone.utc)
+    keep_all_after = now - timedelta(hours=settings.note_revision_keep_all_hours)
+    hourly_after = now - timedelta(days=settings.note_revision_keep_hourly_days)
+
+    kept, buckets = set(), set()
+    # Newest first, so each hour or day keeps its latest revision
+    for i, revision in enumerate(reversed(revisions)):
+        created_at = _as_utc(revision.created_at)
+        if i == 0 or created_at >= keep_all_after:
+            kept.add(revision.version)
+            continue
+        bucket = created_at.replace(minute=0, second=0, microsecond=0) if created_at >= hourly_after else created_at.date()
+        if bucket not in buckets:
+            buckets.add(bucket)
+            kept.add(revision.version)
+    if len(kept) == len(revisions):
+        return 0
+
+    # Rebuild every version, then store the kept ones as a fresh chain
+    content = None
+    previous_content, previous_chain = None, 0
+    for revision in revisions:
+        content = revision.data if revision.kind == "snapshot" else _apply_delta(content, revision.data)
+        if revision.version not in kept:
+            db.delete(revision)
+            continue
+        kind, data, chain_length = _encode(previous_content, previous_chain, content)
+        if (kind, data) != (revision.kind, revision.data):
+            revision.kind, revision.data = kind, data
+        revision.chain_length = chain_length
+        previous_content, previous_chain = content, chain_length
+    return len(revisions) - len(kept)
+
+
+def thin_note_revisions(note_id: int, user_id: int) -> None:
+    """Thin one note's history in its own transaction (run as a background task)."""
+    db = session_for_user(user_id)
+    try:
+        removed = thin_revisions(db, note_id)
+        db.commit()
+    finally:
+        db.close()
+    if removed:
+        # Cached revision lists still name the removed versions
+        response_cache.invalidate(user_id, f"note:{note_id}")
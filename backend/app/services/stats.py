@@ -0,0 +1,304 @@
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models.attachment import Attachment
+from ..models.chapter import Chapter
+from ..models.note import Note, count_words
+from ..models.stats import BookStats, ChapterStats, DailyStats, UserStats
+
+
+def word_count(content: str | None) -> int:
+    """Number of words in a note body, ignoring HTML tags."""
+    return count_words(content) if content else 0
+
+
+def storage_bytes(content: str | None) -> int:
+    """UTF-8 size of a note body."""
+    return len(content.encode("utf-8")) if content else 0
+
+
+def _increment(db: Session, model, keys: dict, deltas: dict, values: dict | None = None) -> None:
+    """Add deltas to a rollup row, creating it if needed, in one upsert statement."""
+    values = values or {}
+    insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    stmt = insert(model).values(**keys, **deltas, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={**{name: getattr(model, name) + delta for name, delta in deltas.items()}, **values},
+    )
+    db.execute(stmt)
+
+
+def _apply(db: Session, user_id: int, book_id: int, chapter_id: int, notes: int, words: int, size: int,
+           created: int = 0, updated: int = 0) -> None:
+    now = datetime.now()
+    totals = {"note_count": notes, "word_count": words, "storage_bytes": size}
+    _increment(db, UserStats, {"user_id": user_id}, totals)
+    _increment(db, BookStats, {"user_id": user_id, "book_id": book_id}, totals)
+    _increment(
+        db, ChapterStats, {"user_id": user_id, "chapter_id": chapter_id},
+        {**totals, "activity": 1},
+        {"book_id": book_id, "last_activity_at": now},
+    )
+    _increment(
+        db, DailyStats, {"user_id": user_id, "day": now.date()},
+        {"notes_created": created, "notes_updated": updated, "words_added": words},
+    )
+
+
+def note_created(db: Session, note: Note, book_id: int) -> None:
+    """Record a new note. Call before committing the note."""
+    _apply(db, note.user_id, book_id, note.chapter_id, 1, word_count(note.content), storage_bytes(note.content),
+           created=1)
+
+
+def note_updated(db: Session, note: Note, book_id: int, old_content: str) -> None:
+    """Record a change to a note's content. Call before committing the change."""
+    _apply(
+        db, note.user_id, book_id, note.chapter_id, 0,
+        word_count(note.content) - word_count(old_content),
+        storage_bytes(note.content) - storage_bytes(old_content),
+        updated=1,
+    )
+
+
+def note_deleted(db: Session, note: Note, book_id: int) -> None:
+    """Record a note's removal, and of its attachments. Call before committing the delete."""
+    _apply(db, note.user_id, book_id, note.chapter_id, -1, -word_count(note.content), -storage_bytes(note.content))
+    _attachments_deleted(db, note.user_id, Attachment.note_id == note.id)
+
+
+def add_attachment_bytes(db: Session, user_id: int, size: int) -> None:
+    """Add to (or, with a negative size, subtract from) a user's attachment usage."""
+    if size:
+        _increment(db, UserStats, {"user_id": user_id}, {"attachment_bytes": size})
+
+
+def reserve_attachment_bytes(db: Session, user_id: int, size: int, quota: int) -> bool:
+    """Add to a user's attachment usage unless that would exceed ``quota`` (0 = unlimited).
+
+    A single conditional UPDATE, so concurrent uploads can't overshoot the quota.
+    """
+    if not quota:
+        add_attachment_bytes(db, user_id, size)
+        return True
+    _increment(db, UserStats, {"user_id": user_id}, {"attachment_bytes": 0})
+    result = db.execute(
+        update(UserStats)
+        .where(UserStats.user_id == user_id, UserStats.attachment_bytes + size <= quota)
+        .values(attachment_bytes=UserStats.attachment_bytes + size)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _attachments_deleted(db: Session, user_id: int, *criteria) -> None:
+    """Subtract the attachments about to be removed (by cascade) from the user's usage."""
+    size = db.scalar(
+        select(func.coalesce(func.sum(Attachment.size), 0))
+        .join(Note, Note.id == Attachment.note_id)
+        .join(Chapter, Chapter.id == Note.chapter_id)
+        .where(Attachment.user_id == user_id, *criteria)
+    )
+    add_attachment_bytes(db, user_id, -size)
+
+
+def _subtract(db: Session, user_id: int, rows) -> dict:
+    totals = {
+        "note_count": -sum(row.note_count for row in rows),
+        "word_count": -sum(row.word_count for row in rows),
+        "storage_bytes": -sum(row.storage_bytes for row in rows),
+    }
+    if any(totals.values()):
+        _increment(db, UserStats, {"user_id": user_id}, totals)
+    return totals
+
+
+def chapter_deleted(db: Session, user_id: int, chapter_id: int, book_id: int) -> None:
+    """Drop a chapter's rollup and subtract it from its book and user. Call before committing."""
+    _attachments_deleted(db, user_id, Note.chapter_id == chapter_id)
+    row = db.get(ChapterStats, (user_id, chapter_id))
+    if row is None:
+        return
+    totals = _subtract(db, user_id, [row])
+    if any(totals.values()):
+        _increment(db, BookStats, {"user_id": user_id, "book_id": book_id}, totals)
+    db.execute(delete(ChapterStats).where(ChapterStats.user_id == user_id, ChapterStats.chapter_id == chapter_id))
+
+
+def book_deleted(db: Session, user_id: int, book_id: int) -> None:
+    """Drop a book's rollups (book and chapters) and subtract them from the user. Call before committing."""
+    _attachments_deleted(db, user_id, Chapter.book_id == book_id)
+    row = db.get(BookStats, (user_id, book_id))
+    if row is None:
+        return
+    _subtract(db, user_id, [row])
+    db.execute(delete(BookStats).where(BookStats.user_id == user_id, BookStats.book_id == book_id))
+    db.execute(delete(ChapterStats).where(ChapterStats.user_id == user_id, ChapterStats.book_id == book_id))
+
+
+def _add_totals(target: dict, totals: dict) -> None:
+    for name, value in totals.items():
+        target[name] = target.get(name, 0) + value
+
+
+def _negate(totals: dict) -> dict:
+    return {name: -value for name, value in totals.items()}
+
+
+def notes_moved(db: Session, user_id: int, sources: dict, chapter_id: int, book_id: int) -> None:
+    """Move notes' totals to another chapter. Call before committing.
+
+    ``sources`` maps each (chapter_id, book_id) the notes came from to their
+    note_count/word_count/storage_bytes totals. One upsert per chapter and book.
+    """
+    moved, other_books = {}, {}
+    for (source_chapter_id, source_book_id), totals in sources.items():
+        _increment(db, ChapterStats, {"user_id": user_id, "chapter_id": source_chapter_id}, _negate(totals),
+                   {"book_id": source_book_id})
+        _add_totals(moved, totals)
+        if source_book_id != book_id:
+            _add_totals(other_books.setdefault(source_book_id, {}), totals)
+
+    _increment(db, ChapterStats, {"user_id": user_id, "chapter_id": chapter_id}, moved, {"book_id": book_id})
+    if other_books:
+        arrived = {}
+        for source_book_id, totals in other_books.items():
+            _increment(db, BookStats, {"user_id": user_id, "book_id": source_book_id}, _negate(totals))
+            _add_totals(arrived, totals)
+        _increment(db, BookStats, {"user_id": user_id, "book_id": book_id}, arrived)
+
+
+def chapters_moved(db: Session, user_id: int, chapter_ids: list[int], book_id: int) -> None:
+    """Move chapters' rollups to another book with one statement per affected book. Call before committing."""
+    rows = db.execute(
+        select(
+            ChapterStats.book_id,
+            func.sum(ChapterStats.note_count),
+            func.sum(ChapterStats.word_count),
+            func.sum(ChapterStats.storage_bytes),
+        )
+        .where(
+            ChapterStats.user_id == user_id,
+            ChapterStats.chapter_id.in_(chapter_ids),
+            ChapterStats.book_id != book_id,
+        )
+        .group_by(ChapterStats.book_id)
+    ).all()
+    moved = {}
+    for source_book_id, notes, words, size in rows:
+        totals = {"note_count": notes, "word_count": words, "storage_bytes": size}
+        _increment(db, BookStats, {"user_id": user_id, "book_id": source_book_id}, _negate(totals))
+        _add_totals(moved, totals)
+    if moved:
+        _increment(db, BookStats, {"user_id": user_id, "book_id": book_id}, moved)
+    db.execute(
+        update(ChapterStats)
+        .where(ChapterStats.user_id == user_id, ChapterStats.chapter_id.in_(chapter_ids))
+        .values(book_id=book_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _cloned(db: Session, user_id: int, book_id: int, totals: dict) -> None:
+    """Add cloned notes to the user's and book's totals and today's counts."""
+    _increment(db, UserStats, {"user_id": user_id}, totals)
+    _increment(db, BookStats, {"user_id": user_id, "book_id": book_id}, totals)
+    _increment(
+        db, DailyStats, {"user_id": user_id, "day": datetime.now().date()},
+        {"notes_created": totals["note_count"], "words_added": totals["word_count"]},
+    )
+
+
+def chapter_cloned(db: Session, user_id: int, source_chapter_id: int, chapter_id: int, book_id: int) -> None:
+    """Give a cloned chapter its source's totals. Call before committing."""
+    row = db.get(ChapterStats, (user_id, source_chapter_id))
+    if row is None or not row.note_count:
+        return
+    totals = {"note_count": row.note_count, "word_count": row.word_count, "storage_bytes": row.storage_bytes}
+    db.add(ChapterStats(user_id=user_id, chapter_id=chapter_id, book_id=book_id, activity=0, **totals))
+    _cloned(db, user_id, book_id, totals)
+
+
+def book_cloned(db: Session, user_id: int, source_book_id: int, book_id: int, chapter_map) -> None:
+    """Copy a book's rollups to its clone with INSERT ... SELECT. Call before committing.
+
+    ``chapter_map`` pairs source chapter ids (old_id) with their clones (new_id).
+    """
+    row = db.get(BookStats, (user_id, source_book_id))
+    if row is None or not row.note_count:
+        return
+    db.execute(
+        insert(ChapterStats).from_select(
+            ["user_id", "chapter_id", "book_id", "note_count", "word_count", "storage_bytes", "activity"],
+            select(
+                ChapterStats.user_id, chapter_map.c.new_id, literal(book_id),
+                ChapterStats.note_count, ChapterStats.word_count, ChapterStats.storage_bytes, literal(0)
+            )
+            .join(chapter_map, chapter_map.c.old_id == ChapterStats.chapter_id)
+            .where(ChapterStats.user_id == user_id)
+        ).execution_options(synchronize_session=False)
+    )
+    _cloned(db, user_id, book_id, {
+        "note_count": row.note_count, "word_count": row.word_count, "storage_bytes": row.storage_bytes
+    })
+
+
+def rebuild_user_stats(db: Session, user_id: int, batch_size: int = 500) -> None:
+    """Recompute a user's rollups from their notes (backfill or repair).
+
+    Totals and notes created per day are exact; per-day update counts and
+    chapter activity before the rebuild cannot be recovered and restart at
+    the rebuilt values. Commits when done.
+    """
+    for model in (UserStats, BookStats, ChapterStats, DailyStats):
+        db.execute(delete(model).where(model.user_id == user_id))
+
+    users, books, chapters, days = {}, {}, {}, {}
+
+    def add(bucket: dict, key, **values):
+        row = bucket.setdefault(key, {})
+        for name, value in values.items():
+            row[name] = row.get(name, 0) + value
+
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Note.id, Note.chapter_id, Note.content, Note.created_at, Chapter.book_id)
+            .join(Chapter, Chapter.id == Note.chapter_id)
+            .where(Note.user_id == user_id, Note.id > last_id, Note.deleted_at.is_(None))
+            .order_by(Note.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for note_id, chapter_id, content, created_at, book_id in rows:
+            words, size = word_count(content), storage_bytes(content)
+            totals = {"note_count": 1, "word_count": words, "storage_bytes": size}
+            add(users, user_id, **totals)
+            add(books, book_id, **totals)
+            add(chapters, (chapter_id, book_id), **totals, activity=1)
+            add(days, created_at.date(), notes_created=1, words_added=words)
+        last_id = rows[-1][0]
+
+    attachment_bytes = db.scalar(
+        select(func.coalesce(func.sum(Attachment.size), 0))
+        .join(Note, Note.id == Attachment.note_id)
+        .where(Attachment.user_id == user_id, Note.deleted_at.is_(None))
+    )
+    if users or attachment_bytes:
+        db.add(UserStats(user_id=user_id, attachment_bytes=attachment_bytes, **users.get(user_id, {})))
+    db.add_all(BookStats(user_id=user_id, book_id=book_id, **values) for book_id, values in books.items())
+    db.add_all(
+        ChapterStats(user_id=user_id, chapter_id=chapter_id, book_id=book_id, **values)
+        for (chapter_id, book_id), values in chapters.items()
+    )
+    db.add_all(
+        DailyStats(user_id=user_id, day=day, notes_updated=0, **values)
+        for day, values in days.items()
+    )
+    db.commit()
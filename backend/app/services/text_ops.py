@@ -0,0 +1,53 @@
+from typing import Iterable
+
+from ..schemas.note import TextOperation
+
+
+def apply_operations(text: str, operations: Iterable[TextOperation]) -> str:
+    """Apply insert/delete operations to text in order.
+
+    Each operation's offset refers to the text as left by the previous
+    operation. Raises ValueError if an operation is malformed or out of range.
+    """
+    for operation in operations:
+        if operation.offset > len(text):
+            raise ValueError(f"Offset {operation.offset} is beyond the end of the text ({len(text)})")
+
+        if operation.op == "insert":
+            if operation.text is None:
+                raise ValueError("Insert operations require 'text'")
+            text = text[:operation.offset] + operation.text + text[operation.offset:]
+        else:
+            if operation.length is None:
+                raise ValueError("Delete operations require 'length'")
+            end = operation.offset + operation.length
+            if end > len(text):
+                raise ValueError(f"Delete range {operation.offset}-{end} is beyond the end of the text ({len(text)})")
+            text = text[:operation.offset] + text[end:]
+
+    return text
+
+
+def diff_operations(old: str, new: str) -> list[TextOperation]:
+    """The edit from old to new as at most one delete and one insert.
+
+    Trims the common prefix and suffix, like diffToOperations on the client,
+    so it's linear in the text length.
+    """
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+
+    operations = []
+    deleted = len(old) - prefix - suffix
+    if deleted > 0:
+        operations.append(TextOperation(op="delete", offset=prefix, length=deleted))
+    inserted = new[prefix:len(new) - suffix]
+    if inserted:
+        operations.append(TextOperation(op="insert", offset=prefix, text=inserted))
+    return operations
@@ -0,0 +1,196 @@
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..config import get_settings
+from ..database import session_for_user
+from ..models.note import Note
+from .revisions import record_revision, thin_note_revisions
+from .stats import note_updated
+from .cache import response_cache
+from .events import publish_event
+
+settings = get_settings()
+
+
+@dataclass
+class PendingWrite:
+    """Latest buffered content for a note that hasn't reached the DB yet."""
+    user_id: int
+    chapter_id: int
+    content: str
+    last_write: float
+
+
+class NoteWriteBuffer:
+    """Write-behind buffer that coalesces rapid content updates per note.
+
+    Updates overwrite each other in memory and are flushed to the DB once a
+    note has been quiet for ``quiet_seconds``, or right away when the buffer
+    holds more than ``max_bytes`` of content. Entries are keyed by
+    (user_id, note_id), since note IDs are only unique per shard when
+    storage is sharded.
+    """
+
+    def __init__(self, quiet_seconds: float, max_bytes: int):
+        self.quiet_seconds = quiet_seconds
+        self.max_bytes = max_bytes
+        self._pending: dict[tuple[int, int], PendingWrite] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.writes = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    def start(self) -> None:
+        """Start the background flusher thread."""
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="note-write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write everything still buffered."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def put(self, note_id: int, user_id: int, chapter_id: int, content: str) -> None:
+        """Buffer new content for a note, replacing any unflushed content."""
+        with self._lock:
+            previous = self._pending.get((user_id, note_id))
+            if previous is not None:
+                self._bytes -= len(previous.content)
+                self.coalesced += 1
+            self._pending[(user_id, note_id)] = PendingWrite(user_id, chapter_id, content, time.monotonic())
+            self._bytes += len(content)
+            self.writes += 1
+            over_budget = self._bytes > self.max_bytes
+        if over_budget:
+            self._wakeup.set()
+
+    def get(self, note_id: int, user_id: int) -> str | None:
+        """Return buffered content for a note, if any."""
+        with self._lock:
+            pending = self._pending.get((user_id, note_id))
+            return pending.content if pending else None
+
+    def discard(self, note_id: int, user_id: int) -> None:
+        """Drop buffered content for a note (e.g. when it is deleted)."""
+        with self._lock:
+            pending = self._pending.pop((user_id, note_id), None)
+            if pending is not None:
+                self._bytes -= len(pending.content)
+
+    def keys_for(self, user_id: int) -> list[tuple[int, int]]:
+        """Keys of a user's buffered notes, for flushing before bulk reads of their notes."""
+        with self._lock:
+            return [key for key in self._pending if key[0] == user_id]
+
+    def flush(self, keys=None, quiet_only: bool = False) -> int:
+        """Write buffered content to the DB in one transaction (per shard if sharded).
+
+        Flushes the given (user_id, note_id) keys (all notes if None). With
+        ``quiet_only`` only notes idle for the quiet period are written, unless
+        over the byte budget.
+        """
+        with self._flush_lock:
+            now = time.monotonic()
+            with self._lock:
+                over_budget = self._bytes > self.max_bytes
+                batch = {
+                    key: pending
+                    for key, pending in self._pending.items()
+                    if (keys is None or key in keys)
+                    and (not quiet_only or over_budget or now - pending.last_write >= self.quiet_seconds)
+                }
+            if not batch:
+                return 0
+
+            # One transaction per database: a single one, or one per user's shard
+            by_owner: dict[int | None, list[tuple[int, int]]] = {}
+            for key in batch:
+                by_owner.setdefault(key[0] if settings.is_sharded else None, []).append(key)
+
+            flushed = 0
+            to_thin = []
+            written = []
+            for owner, owner_keys in by_owner.items():
+                db = session_for_user(owner)
+                try:
+                    contents = {note_id: batch[(user_id, note_id)].content for user_id, note_id in owner_keys}
+                    notes = db.query(Note).options(joinedload(Note.chapter)).filter(
+                        Note.id.in_(list(contents))
+                    ).all()
+                    for note in notes:
+                        old_content = note.content
+                        note.content = contents[note.id]
+                        note_updated(db, note, note.chapter.book_id, old_content)
+                        if record_revision(db, note, old_content):
+                            to_thin.append((note.id, note.user_id))
+                    db.commit()
+                    flushed += len(notes)
+                    written += [(note.user_id, note.id, note.chapter_id, note.version) for note in notes]
+                except StaleDataError:
+                    # A direct update raced with us; retry those notes on the next pass
+                    db.rollback()
+                    for key in owner_keys:
+                        del batch[key]
+                    to_thin = [item for item in to_thin if (item[1], item[0]) not in owner_keys]
+                finally:
+                    db.close()
+
+            with self._lock:
+                for key, pending in batch.items():
+                    # Keep entries that were overwritten while we were flushing
+                    if self._pending.get(key) is pending:
+                        del self._pending[key]
+                        self._bytes -= len(pending.content)
+                self.flushes += 1
+                self.rows_flushed += flushed
+
+        for note_id, user_id in to_thin:
+            thin_note_revisions(note_id, user_id)
+        for (_, note_id), pending in batch.items():
+            response_cache.invalidate(pending.user_id, f"note:{note_id}", f"notes:{pending.chapter_id}", "search")
+        for user_id, note_id, chapter_id, version in written:
+            publish_event(user_id, "note.updated", id=note_id, chapter_id=chapter_id, version=version)
+        return flushed
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.quiet_seconds / 2)
+            self._wakeup.clear()
+            try:
+                self.flush(quiet_only=True)
+            except Exception as e:  # Keep the flusher alive; entries stay buffered
+                print(f"⚠️ Write-behind flush failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": settings.note_write_behind_enabled,
+                "pending_notes": len(self._pending),
+                "pending_bytes": self._bytes,
+                "writes": self.writes,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+                "rows_flushed": self.rows_flushed,
+            }
+
+
+note_write_buffer = NoteWriteBuffer(
+    quiet_seconds=settings.note_write_behind_quiet_ms / 1000,
+    max_bytes=settings.note_write_behind_max_bytes,
+)
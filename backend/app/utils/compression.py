@@ -0,0 +1,158 @@
+import base64
+import threading
+import time
+import zlib
+from importlib.util import find_spec
+
+from sqlalchemy.types import Text, TypeDecorator
+
+from ..config import get_settings
+
+# Optional dependency (zlib without it), imported on first use to keep startup fast
+HAS_ZSTD = find_spec("zstandard") is not None
+
+settings = get_settings()
+
+# Compressed values are stored as MARKER + codec + base85(payload). Plain text
+# without the marker is stored untouched, so old and new rows can coexist.
+COMPRESSION_MARKER = "\x1f"
+CODEC_RAW = "r"  # Plain text that happens to start with the marker
+CODEC_ZLIB = "z"
+CODEC_ZSTD = "s"
+
+
+class CompressionStats:
+    """Thread-safe counters for compression ratio and CPU cost."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.compressed_count = 0
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.compress_seconds = 0.0
+            self.decompressed_count = 0
+            self.decompress_seconds = 0.0
+
+    def record_compress(self, bytes_in: int, bytes_out: int, seconds: float) -> None:
+        with self._lock:
+            self.compressed_count += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.compress_seconds += seconds
+
+    def record_decompress(self, seconds: float) -> None:
+        with self._lock:
+            self.decompressed_count += 1
+            self.decompress_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "compressed_count": self.compressed_count,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_in / self.bytes_out, 3) if self.bytes_out else None,
+                "compress_ms_total": round(self.compress_seconds * 1000, 3),
+                "decompressed_count": self.decompressed_count,
+                "decompress_ms_total": round(self.decompress_seconds * 1000, 3),
+            }
+
+
+compression_stats = CompressionStats()
+
+
+def _default_codec() -> str:
+    """Pick the configured codec, falling back to zlib when zstd is unavailable."""
+    if settings.note_compression_codec == "zstd" and HAS_ZSTD:
+        return CODEC_ZSTD
+    return CODEC_ZLIB
+
+
+def _store_plain(value: str) -> str:
+    """Store text uncompressed, escaping values that look like encoded ones."""
+    if value.startswith(COMPRESSION_MARKER):
+        return COMPRESSION_MARKER + CODEC_RAW + value
+    return value
+
+
+def encode_text(value: str, threshold: int | None = None) -> str:
+    """Encode a text value for storage, compressing it above the size threshold."""
+    threshold = settings.note_compression_threshold if threshold is None else threshold
+    raw = value.encode("utf-8")
+
+    if threshold <= 0 or len(raw) < threshold:
+        return _store_plain(value)
+
+    start = time.perf_counter()
+    codec = _default_codec()
+    if codec == CODEC_ZSTD:
+        import zstandard
+
+        payload = zstandard.ZstdCompressor(level=3).compress(raw)
+    else:
+        payload = zlib.compress(raw, 6)
+    encoded = COMPRESSION_MARKER + codec + base64.b85encode(payload).decode("ascii")
+    compression_stats.record_compress(len(raw), len(encoded), time.perf_counter() - start)
+
+    # Not worth it for incompressible content
+    if len(encoded) >= len(raw):
+        return _store_plain(value)
+    return encoded
+
+
+def decode_text(value: str) -> str:
+    """Decode a stored text value, decompressing it if it carries the marker."""
+    if not value.startswith(COMPRESSION_MARKER):
+        return value
+
+    codec, body = value[1:2], value[2:]
+    if codec == CODEC_RAW:
+        return body
+
+    start = time.perf_counter()
+    payload = base64.b85decode(body)
+    if codec == CODEC_ZSTD:
+        if not HAS_ZSTD:
+            raise RuntimeError("zstandard is required to read zstd-compressed notes")
+        import zstandard
+
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    else:
+        raw = zlib.decompress(payload)
+    compression_stats.record_decompress(time.perf_counter() - start)
+    return raw.decode("utf-8")
+
+
+def is_encoded(value: str) -> bool:
+    """Check if a stored value is in compressed (or escaped) form."""
+    return value.startswith(COMPRESSION_MARKER)
+
+
+def is_compressed(value: str) -> bool:
+    """Check if a stored value is compressed, so its text can't be matched as stored."""
+    return value.startswith(COMPRESSION_MARKER) and value[1:2] != CODEC_RAW
+
+
+class CompressedText(TypeDecorator):
+    """Text column that transparently compresses large values at rest."""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decode_text(value)
+
+    def coerce_compared_value(self, op, value):
+        # Compare against the stored form (e.g. LIKE patterns) without encoding
+        return Text()
@@ -0,0 +1,61 @@
+from importlib.util import find_spec
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# Optional dependency (clients fall back to JSON), imported on first use to keep startup fast
+HAS_MSGPACK = find_spec("msgpack") is not None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_ACCEPT = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+_JSON_ACCEPT = ("application/json", "application/*", "*/*")
+
+
+def header_qualities(value: str) -> dict[str, float]:
+    """Quality (q, default 1) of each item of an Accept or Accept-Encoding header, by lowercased name."""
+    qualities = {}
+    for item in value.lower().split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name] = quality
+    return qualities
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Check if the client prefers a MessagePack response to JSON (ties go to MessagePack)."""
+    if not HAS_MSGPACK:
+        return False
+    qualities = header_qualities(request.headers.get("accept", ""))
+    msgpack_quality = max(qualities.get(media_type, 0) for media_type in _MSGPACK_ACCEPT)
+    json_quality = max(qualities.get(media_type, 0) for media_type in _JSON_ACCEPT)
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+def packb(content) -> bytes:
+    """Serialize response content (schemas, dicts, lists) to MessagePack."""
+    import msgpack
+
+    return msgpack.packb(jsonable_encoder(content), use_bin_type=True)
+
+
+def negotiate(request: Request, content):
+    """Return content as MessagePack if the client accepts it, otherwise unchanged.
+
+    Unchanged content is serialized to JSON by FastAPI as usual.
+    """
+    if not wants_msgpack(request):
+        return content
+    return Response(
+        content=packb(content),
+        media_type=MSGPACK_MEDIA_TYPE,
+        headers={"Vary": "Accept"},
+    )
@@ -0,0 +1,120 @@
+import math
+import statistics
+import threading
+import time
+
+from ..config import get_settings
+
+settings = get_settings()
+
+MIN_ROUNDS = 4  # bcrypt's own limits
+MAX_ROUNDS = 31
+SCHEME = b"2b"
+
+
+def _encode(password: str) -> bytes:
+    # bcrypt only uses the first 72 bytes; older versions truncated silently, and
+    # hashes made that way must keep verifying now that bcrypt refuses longer input
+    return password.encode("utf-8")[:72]
+
+
+def measure_hash_seconds(rounds: int, samples: int = 3) -> float:
+    """Median time to hash a password at a bcrypt cost."""
+    import bcrypt
+
+    salt = bcrypt.gensalt(rounds)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"benchmark-password", salt)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def pick_rounds(seconds_at: dict[int, float], target_ms: float, min_rounds: int) -> int:
+    """Highest cost expected to hash within target_ms, from timings at one or more costs, but at least min_rounds."""
+    probe = max(seconds_at)
+    rounds = probe + math.floor(math.log2(target_ms / 1000 / seconds_at[probe]))
+    return min(max(rounds, min_rounds, MIN_ROUNDS), MAX_ROUNDS)
+
+
+class PasswordHasher:
+    """bcrypt hashing at one configured cost, with counters.
+
+    Stored hashes at any other cost still verify. verify_and_update() returns
+    a replacement hash for ones below the configured cost, and for ones above
+    it only when ``allow_downgrade`` is set, so hosts configured differently
+    don't keep rehashing each other's output.
+    """
+
+    def __init__(self, rounds: int, allow_downgrade: bool = False):
+        if not MIN_ROUNDS <= rounds <= MAX_ROUNDS:
+            raise ValueError(f"bcrypt cost must be between {MIN_ROUNDS} and {MAX_ROUNDS}, got {rounds}")
+        self.rounds = rounds
+        self.allow_downgrade = allow_downgrade
+        self._lock = threading.Lock()
+        self.hashes = 0
+        self.hash_seconds = 0.0
+        self.verifies = 0
+        self.failures = 0
+        self.rehashes = 0
+
+    def hash(self, password: str) -> str:
+        import bcrypt  # Loaded on first use to keep startup fast
+
+        salt = bcrypt.gensalt(self.rounds)
+        start = time.perf_counter()
+        hashed = bcrypt.hashpw(_encode(password), salt)
+        with self._lock:
+            self.hashes += 1
+            self.hash_seconds += time.perf_counter() - start
+        return hashed.decode("utf-8")
+
+    def verify(self, password: str, hashed: str) -> bool:
+        import bcrypt
+
+        try:
+            valid = bcrypt.checkpw(_encode(password), hashed.encode("utf-8"))
+        except ValueError:  # Not a bcrypt hash (e.g. an account without a password)
+            valid = False
+        with self._lock:
+            self.verifies += 1
+            if not valid:
+                self.failures += 1
+        return valid
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if a hash uses another scheme or a lower cost (or any other cost, with allow_downgrade)."""
+        parts = hashed.split("$")
+        if len(parts) < 4 or parts[1].encode() != SCHEME or not parts[2].isdigit():
+            return True
+        cost = int(parts[2])
+        return cost < self.rounds or (self.allow_downgrade and cost != self.rounds)
+
+    def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """Verify a password; if its hash needs_rehash(), also return one at the configured cost."""
+        if not self.verify(password, hashed):
+            return False, None
+        if not self.needs_rehash(hashed):
+            return True, None
+        with self._lock:
+            self.rehashes += 1
+        return True, self.hash(password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "allow_downgrade": self.allow_downgrade,
+                "hashes": self.hashes,
+                "mean_hash_ms": round(self.hash_seconds / self.hashes * 1000, 1) if self.hashes else None,
+                "verifies": self.verifies,
+                "failures": self.failures,
+                "rehashes": self.rehashes,
+            }
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.password_hash_rounds,
+    allow_downgrade=settings.password_hash_allow_downgrade,
+)
@@ -0,0 +1,88 @@
+"""Fractional position keys for manual ordering.
+
+Keys are strings over a base-62 alphabet that sort correctly with plain
+string (byte) comparison, so a row can always be placed between two
+neighbours by giving it a key between theirs, without touching any other
+row. Keys never end with the smallest digit, which guarantees that a key
+before any other key exists.
+"""
+from sqlalchemy import String
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_BASE = len(DIGITS)
+_INDEX = {digit: i for i, digit in enumerate(DIGITS)}
+
+# Column type for keys. Postgres compares text by the database locale, which
+# can ignore case ("a" before "B"); the "C" collation compares bytes. SQLite
+# already does.
+POSITION_TYPE = String(255).with_variant(String(255, collation="C"), "postgresql")
+
+
+def _midpoint(a: str, b: str | None) -> str:
+    """Key strictly between a and b ("" is the lowest key, None is +infinity)."""
+    if b is not None:
+        # Skip the common prefix (a padded with the zero digit)
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = _INDEX[a[0]] if a else 0
+    digit_b = _INDEX[b[0]] if b is not None else _BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    # Adjacent first digits
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def key_after(a: str) -> str:
+    """Short key just after a (appending at the end of a list)."""
+    for i in range(len(a) - 1, -1, -1):
+        if a[i] != DIGITS[-1]:
+            return a[:i] + DIGITS[_INDEX[a[i]] + 1]
+    return a + DIGITS[1]
+
+
+def key_before(b: str) -> str:
+    """Short key just before b (prepending at the start of a list)."""
+    first = _INDEX[b[0]]
+    if first > 1:
+        return DIGITS[first - 1]
+    if first == 1:
+        return DIGITS[0] + DIGITS[-1]
+    return DIGITS[0] + key_before(b[1:])
+
+
+def key_between(a: str | None, b: str | None) -> str:
+    """Key that sorts after a and before b; None means no neighbour on that side.
+
+    Raises ValueError if a is not before b.
+    """
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"Position {a!r} is not before {b!r}")
+    if a is None and b is None:
+        return DIGITS[_BASE // 2]
+    if a is None:
+        return key_before(b)
+    if b is None:
+        return key_after(a)
+    return _midpoint(a, b)
+
+
+def spread_keys(count: int) -> list[str]:
+    """Evenly spaced, equally short keys for ``count`` rows (used to rebalance)."""
+    length = 1
+    while _BASE ** length <= count * 2:
+        length += 1
+    step = _BASE ** length // (count + 1)
+    keys = []
+    for i in range(1, count + 1):
+        value, digits = step * i, []
+        for _ in range(length):
+            value, digit = divmod(value, _BASE)
+            digits.append(DIGITS[digit])
+        keys.append("".join(reversed(digits)).rstrip(DIGITS[0]))
+    return keys
@@ -1,15 +1,15 @@
+import hmac
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-import bcrypt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from ..config import get_settings
-from ..database import get_db
+from ..database import get_db, read_session_for, session_for_user
 from ..models.user import User
 from ..schemas.user import TokenData
+from .passwords import password_hasher
 
 settings = get_settings()
 
@@ -19,17 +19,33 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'),
-        hashed_password.encode('utf-8')
-    )
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify a password, returning a new hash as well when the stored one uses another cost."""
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    return password_hasher.hash(password)
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Check a token sent for an admin-only feature (all are disabled while admin_token is unset)."""
+    if not settings.admin_token or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), settings.admin_token.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Dependency for admin-only endpoints: the X-Admin-Token header must carry the admin token."""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required"
+        )
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -40,12 +56,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     to_encode.update({"exp": expire})
+    from jose import jwt  # Imported on first use to keep it off the cold-start path
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
 
 def decode_token(token: str) -> Optional[TokenData]:
     """Decode a JWT token."""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         user_id_str = payload.get("sub")
@@ -75,4 +93,39 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
     
+    # Lets commits on this session mark the user for read-your-writes
+    db.info["user_id"] = user.id
     return user
+
+
+def get_user_db(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Dependency to get the session holding the current user's data.
+
+    That is the request's primary session, or the user's shard with sharded storage.
+    """
+    if not settings.is_sharded:
+        yield db
+        return
+    
+    user_db = session_for_user(current_user.id)
+    user_db.info["user_id"] = current_user.id
+    try:
+        yield user_db
+    finally:
+        user_db.close()
+
+
+def get_read_db(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db)
+):
+    """Dependency to get a session for read-only handlers (replica when possible)."""
+    read_db = read_session_for(current_user.id, db)
+    try:
+        yield read_db
+    finally:
+        if read_db is not db:
+            read_db.close()
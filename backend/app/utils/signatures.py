@@ -0,0 +1,51 @@
+"""Trigram signatures: small Bloom filters for substring search.
+
+A compressed note body can't be matched with LIKE in the database, so it
+gets a signature instead: a bitmap with one bit set for each distinct
+lowercased three-character substring of the body. A search keeps the notes
+whose signature has the bits of every trigram of the search term (all the
+matches, plus a few false positives) and decodes only those to check.
+Signatures take BITS_PER_TRIGRAM bits per trigram, between MIN_BYTES and
+MAX_BYTES: a fraction of the body's compressed size.
+"""
+import base64
+import zlib
+
+BITS_PER_TRIGRAM = 2  # About 1 in 2.5 absent trigrams passes, so longer terms rule out more notes
+MIN_BYTES = 64
+MAX_BYTES = 2048
+
+
+def trigrams(text: str) -> set[str]:
+    """Distinct lowercased three-character substrings of a text."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _bit(trigram: str, size: int) -> int:
+    return zlib.crc32(trigram.encode("utf-8")) % size
+
+
+def make_signature(text: str) -> str:
+    """Signature of a text, as base64."""
+    grams = trigrams(text)
+    bitmap = bytearray(min(max(len(grams) * BITS_PER_TRIGRAM // 8, MIN_BYTES), MAX_BYTES))
+    size = len(bitmap) * 8
+    for gram in grams:
+        bit = _bit(gram, size)
+        bitmap[bit // 8] |= 1 << (bit % 8)
+    return base64.b64encode(bitmap).decode("ascii")
+
+
+def may_contain(signature: str, term: str) -> bool:
+    """False only if the signed text can't contain ``term`` (case-insensitively).
+
+    Terms shorter than a trigram can't be ruled out.
+    """
+    bitmap = base64.b64decode(signature)
+    size = len(bitmap) * 8
+    for gram in trigrams(term):
+        bit = _bit(gram, size)
+        if not bitmap[bit // 8] & (1 << (bit % 8)):
+            return False
+    return True
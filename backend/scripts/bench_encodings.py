@@ -0,0 +1,82 @@
+"""Benchmark bytes on the wire and server CPU per response encoding.
+
+Builds a synthetic note-list payload and measures every combination of body
+format (JSON, MessagePack) and content coding (identity, gzip, brotli).
+
+Usage (from the backend directory):
+    python -m scripts.bench_encodings [--notes 500] [--note-size 2000] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+
+from app.middleware.compression import HAS_BROTLI, _Compressor
+from app.utils.encoding import HAS_MSGPACK, packb
+
+WORDS = "the quick brown fox jumps over lazy dog note chapter book idea meeting draft plan".split()
+
+
+def build_payload(notes: int, note_size: int) -> list:
+    """Build a list shaped like a note-list response."""
+    now = datetime.now(timezone.utc)
+    payload = []
+    for i in range(notes):
+        content = " ".join(random.choice(WORDS) for _ in range(note_size // 5))[:note_size]
+        payload.append({
+            "id": i,
+            "content": f"<p>{content}</p>",
+            "preview": content[:200],
+            "content_length": len(content),
+            "chapter_id": 1,
+            "date": now.strftime("%b %d, %Y"),
+            "created_at": now,
+            "updated_at": now,
+        })
+    return payload
+
+
+def _time(fn, repeat: int):
+    """Return (result, mean CPU seconds) for a callable."""
+    start = time.process_time()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response encodings.")
+    parser.add_argument("--notes", type=int, default=500)
+    parser.add_argument("--note-size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    payload = build_payload(args.notes, args.note_size)
+
+    formats = {"json": lambda: json.dumps(jsonable_encoder(payload)).encode("utf-8")}
+    if HAS_MSGPACK:
+        formats["msgpack"] = lambda: packb(payload)
+
+    codings = ["identity", "gzip"] + (["br"] if HAS_BROTLI else [])
+
+    print(f"{args.notes} notes x {args.note_size} chars, mean of {args.repeat} runs")
+    print(f"{'format':<8} {'coding':<9} {'bytes':>10} {'serialize ms':>13} {'compress ms':>12}")
+    for format_name, serialize in formats.items():
+        body, serialize_cpu = _time(serialize, args.repeat)
+        for coding in codings:
+            if coding == "identity":
+                wire, compress_cpu = body, 0.0
+            else:
+                wire, compress_cpu = _time(lambda: _Compressor(coding, 6, 4).compress(body, final=True), args.repeat)
+            print(
+                f"{format_name:<8} {coding:<9} {len(wire):>10} "
+                f"{serialize_cpu * 1000:>13.2f} {compress_cpu * 1000:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
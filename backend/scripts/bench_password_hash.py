@@ -0,0 +1,71 @@
+"""Benchmark bcrypt at each cost and recommend PASSWORD_HASH_ROUNDS.
+
+For every cost, measures the latency of one hash on an idle core and the
+throughput per core with every core hashing at once (bcrypt releases the
+GIL, so threads use all cores). The recommendation is the highest cost
+that hashes within the target latency. The server never calibrates by
+itself: set the result as PASSWORD_HASH_ROUNDS on every host.
+
+Usage (from the backend directory):
+    python -m scripts.bench_password_hash [--min-rounds 8] [--max-rounds 13] [--target-ms 250] [--seconds 2]
+"""
+import argparse
+import threading
+import time
+
+import bcrypt
+
+from app.config import get_settings
+from app.server import detect_cpu_count
+from app.utils.passwords import measure_hash_seconds, pick_rounds
+
+
+def throughput(rounds: int, threads: int, seconds: float) -> float:
+    """Hashes per second per core with ``threads`` threads hashing for about ``seconds``."""
+    salt = bcrypt.gensalt(rounds)
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index: int) -> None:
+        while True:
+            bcrypt.hashpw(b"benchmark-password", salt)
+            counts[index] += 1
+            if time.perf_counter() >= deadline:
+                return
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start) / threads
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt costs and recommend one.")
+    parser.add_argument("--min-rounds", type=int, default=8)
+    parser.add_argument("--max-rounds", type=int, default=13)
+    parser.add_argument("--target-ms", type=float, default=settings.password_hash_target_ms)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Duration of each throughput run")
+    parser.add_argument("--threads", type=int, default=detect_cpu_count())
+    args = parser.parse_args()
+
+    print(f"bcrypt {bcrypt.__version__}, {args.threads} core(s)")
+    print(f"{'cost':>4} {'ms/hash':>9} {'hashes/s/core (idle)':>21} {f'hashes/s/core ({args.threads} busy)':>23}")
+    latencies = {}
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        latencies[rounds] = measure_hash_seconds(rounds)
+        loaded = throughput(rounds, args.threads, args.seconds)
+        print(f"{rounds:>4} {latencies[rounds] * 1000:>9.1f} {1 / latencies[rounds]:>21.1f} {loaded:>23.1f}")
+
+    recommended = pick_rounds(latencies, args.target_ms, settings.password_hash_min_rounds)
+    expected_ms = latencies[max(latencies)] * 2 ** (recommended - max(latencies)) * 1000
+    print(f"\n✅ Recommended: PASSWORD_HASH_ROUNDS={recommended} "
+          f"(~{expected_ms:.0f} ms per hash, target {args.target_ms:.0f} ms; "
+          f"about {1000 / expected_ms * args.threads:.1f} logins/s on {args.threads} core(s))")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark note create/update latency: commit + refresh vs RETURNING.
+
+"refresh" mimics the old write path (expire on commit, then db.refresh to
+read back id and timestamps). "returning" is the current path, where
+generated values come back from INSERT/UPDATE ... RETURNING.
+
+Usage (from the backend directory):
+    python -m scripts.bench_writes [--ops 500] [--database-url sqlite:///./bench_writes.db]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Book, Chapter, Note, User
+
+DEFAULT_DATABASE_URL = "sqlite:///./bench_writes.db"
+
+
+def run(engine, expire_on_commit: bool, refresh: bool, ops: int, user_id: int, chapter_id: int) -> dict:
+    """Create and then update ``ops`` notes, timing each write."""
+    statements = []
+    listener = lambda *args: statements.append(1)  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=expire_on_commit)
+    create_times, update_times = [], []
+    try:
+        with Session() as db:
+            notes = []
+            for i in range(ops):
+                start = time.perf_counter()
+                note = Note(content=f"note {i}", chapter_id=chapter_id, user_id=user_id, position=f"V{i:06d}")
+                db.add(note)
+                db.commit()
+                if refresh:
+                    db.refresh(note)
+                # Read what a response needs
+                _ = (note.id, note.created_at, note.updated_at, note.version)
+                create_times.append(time.perf_counter() - start)
+                notes.append(note)
+            created_statements = len(statements)
+
+            for note in notes:
+                start = time.perf_counter()
+                note.content = note.content + " edited"
+                db.commit()
+                if refresh:
+                    db.refresh(note)
+                _ = (note.id, note.created_at, note.updated_at, note.version)
+                update_times.append(time.perf_counter() - start)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    return {
+        "create_ms": statistics.mean(create_times) * 1000,
+        "create_p95_ms": statistics.quantiles(create_times, n=20)[-1] * 1000,
+        "update_ms": statistics.mean(update_times) * 1000,
+        "update_p95_ms": statistics.quantiles(update_times, n=20)[-1] * 1000,
+        "statements_per_create": created_statements / ops,
+        "statements_per_update": (len(statements) - created_statements) / ops,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RETURNING vs refresh write paths.")
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    args = parser.parse_args()
+
+    is_sqlite = args.database_url.startswith("sqlite")
+    engine = create_engine(
+        args.database_url,
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+    )
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        user = User(email="bench@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        book = Book(name="Bench", user_id=user.id)
+        db.add(book)
+        db.flush()
+        chapter = Chapter(name="Bench", book_id=book.id, user_id=user.id, position="V")
+        db.add(chapter)
+        db.commit()
+        user_id, chapter_id = user.id, chapter.id
+
+    results = {
+        "refresh": run(engine, expire_on_commit=True, refresh=True, ops=args.ops, user_id=user_id, chapter_id=chapter_id),
+        "returning": run(engine, expire_on_commit=False, refresh=False, ops=args.ops, user_id=user_id, chapter_id=chapter_id),
+    }
+
+    print(f"{args.ops} creates + {args.ops} updates on {engine.url.render_as_string(hide_password=True)}")
+    print(f"{'mode':<10} {'create ms':>10} {'p95':>8} {'update ms':>10} {'p95':>8} {'stmts/create':>13} {'stmts/update':>13}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<10} {r['create_ms']:>10.3f} {r['create_p95_ms']:>8.3f} {r['update_ms']:>10.3f} "
+            f"{r['update_p95_ms']:>8.3f} {r['statements_per_create']:>13.1f} {r['statements_per_update']:>13.1f}"
+        )
+
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if args.database_url == DEFAULT_DATABASE_URL:
+        os.remove("bench_writes.db")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Delete attachment files that no attachment row refers to any more.
+
+Removing an attachment (or the note, chapter or book holding it) only
+deletes its row, since identical files are shared. Run this periodically
+to free their disk space. Files younger than the grace period are kept, so
+uploads whose rows have not been committed yet are safe.
+
+Usage (from the backend directory):
+    python -m scripts.gc_attachments [--grace-minutes 60] [--dry-run]
+"""
+import argparse
+
+from sqlalchemy import select
+
+from app.database import data_owners, init_db, session_for_user
+from app.models.attachment import Attachment
+from app.services.attachments import attachment_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete unreferenced attachment files.")
+    parser.add_argument("--grace-minutes", type=float, default=60)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    args = parser.parse_args()
+
+    init_db()
+    referenced = set()
+    for owner in data_owners():
+        db = session_for_user(owner)
+        try:
+            referenced.update(db.scalars(select(Attachment.sha256).distinct()).all())
+        finally:
+            db.close()
+
+    removed, freed = attachment_store.remove_unreferenced(referenced, args.grace_minutes * 60, args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"🧹 {verb} {removed} unreferenced file(s), {freed} bytes ({len(referenced)} still referenced)")
+
+
+if __name__ == "__main__":
+    main()
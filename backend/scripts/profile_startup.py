@@ -0,0 +1,113 @@
+"""Profile cold start: import time per module and time-to-first-request.
+
+Imports are measured with ``python -X importtime`` in a fresh interpreter.
+Time-to-first-request starts a fresh ``uvicorn app.main:app`` process and
+polls ``/health`` until it answers. Exits with status 1 when the median
+time-to-first-request or the ``app.main`` import time exceeds its budget,
+so it can gate CI.
+
+Usage (from the backend directory):
+    python -m scripts.profile_startup [--runs 3] [--budget-ms 2500] [--import-budget-ms 1500]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+DEFAULT_DATABASE_URL = "sqlite:///./profile_startup.db"
+
+
+def import_times(env: dict) -> list[tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for every module imported by app.main."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def app_import_time(env: dict) -> float:
+    """Seconds to import app.main in a fresh interpreter, without importtime overhead."""
+    code = "import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(env: dict, timeout: float = 30.0) -> float:
+    """Seconds from spawning a server process until /health returns 200."""
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.005)
+        raise TimeoutError(f"Server did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile application cold start.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=25, help="Modules to list, by cumulative import time")
+    parser.add_argument("--budget-ms", type=float, default=2500, help="Budget for median time-to-first-request")
+    parser.add_argument("--import-budget-ms", type=float, default=1500, help="Budget for importing app.main")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    args = parser.parse_args()
+
+    env = {**os.environ, "DATABASE_URL": args.database_url}
+
+    rows = import_times(env)
+    print(f"Slowest imports (cumulative, of {len(rows)} modules):")
+    print(f"{'module':<50} {'self ms':>9} {'total ms':>9}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{name:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}")
+
+    # The first run creates the schema; later runs show the usual cold start
+    ttfr = [time_to_first_request(env) * 1000 for _ in range(args.runs)]
+    median_ttfr = statistics.median(ttfr)
+    total_import_ms = statistics.median(app_import_time(env) * 1000 for _ in range(args.runs))
+    print()
+    print(f"import app.main:        {total_import_ms:8.1f} ms median (budget {args.import_budget_ms:.0f} ms)")
+    print(f"time to first request:  {median_ttfr:8.1f} ms median of {', '.join(f'{t:.0f}' for t in ttfr)} "
+          f"(budget {args.budget_ms:.0f} ms)")
+
+    if args.database_url == DEFAULT_DATABASE_URL:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(f"profile_startup.db{suffix}"):
+                os.remove(f"profile_startup.db{suffix}")
+
+    over_budget = total_import_ms > args.import_budget_ms or median_ttfr > args.budget_ms
+    if over_budget:
+        print("❌ Startup is over budget")
+        sys.exit(1)
+    print("✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
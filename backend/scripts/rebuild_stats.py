@@ -0,0 +1,48 @@
+"""Backfill or rebuild the statistics rollup tables from existing notes.
+
+Run once after upgrading to populate GET /api/stats for existing data, or
+any time the rollups need repairing. Each user is rebuilt in its own
+transaction.
+
+Usage (from the backend directory):
+    python -m scripts.rebuild_stats [--user-id 42]
+"""
+import argparse
+
+from sqlalchemy import select
+
+from app.database import data_owners, init_db, session_for_user
+from app.models.book import Book
+from app.models.stats import UserStats
+from app.services.stats import rebuild_user_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild statistics rollups from notes.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    init_db()
+    rebuilt = 0
+    for owner in data_owners():
+        if args.user_id is not None and owner is not None and owner != args.user_id:
+            continue
+        db = session_for_user(owner)
+        try:
+            if args.user_id is not None:
+                user_ids = [args.user_id]
+            else:
+                # Users with data or existing rollups in this database
+                user_ids = db.scalars(select(Book.user_id).union(select(UserStats.user_id))).all()
+            for user_id in user_ids:
+                rebuild_user_stats(db, user_id, args.batch_size)
+                rebuilt += 1
+        finally:
+            db.close()
+
+    print(f"Rebuilt statistics for {rebuilt} user(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Online migration that re-encodes stored note bodies in batches.
+
+Rows are rewritten with the current compression settings, so this both
+compresses legacy plain-text notes and switches codecs after a config change.
+Each row's search signature is rewritten with it, since only compressed
+bodies have one. Each batch is its own transaction, so the app can keep
+serving requests.
+
+Usage (from the backend directory):
+    python -m scripts.recompress_notes [--batch-size 500] [--sleep 0.05]
+"""
+import argparse
+import time
+
+from sqlalchemy import Integer, Text, column, select, table, update
+
+from app.database import data_owners, init_db, session_for_user
+from app.models.note import make_search_signature
+from app.utils.compression import compression_stats, decode_text, encode_text
+
+# Plain column types so values are read and written in their stored form
+notes_table = table("notes", column("id", Integer), column("content", Text), column("search_signature", Text))
+
+
+def recompress_notes(batch_size: int = 500, sleep: float = 0.0, threshold: int | None = None) -> dict:
+    """Re-encode every note body, returning a summary of the run."""
+    summary = {"scanned": 0, "rewritten": 0, "stored_bytes_before": 0, "stored_bytes_after": 0}
+    for owner in data_owners():
+        _recompress(session_for_user(owner), summary, batch_size, sleep, threshold)
+
+    summary["codec_stats"] = compression_stats.snapshot()
+    return summary
+
+
+def _recompress(db, summary: dict, batch_size: int, sleep: float, threshold: int | None) -> None:
+    """Re-encode the note bodies in one database (or shard), closing the session."""
+    last_id = 0
+    try:
+        while True:
+            rows = db.execute(
+                select(notes_table.c.id, notes_table.c.content)
+                .where(notes_table.c.id > last_id)
+                .order_by(notes_table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            for note_id, stored in rows:
+                content = decode_text(stored)
+                encoded = encode_text(content, threshold=threshold)
+                summary["scanned"] += 1
+                summary["stored_bytes_before"] += len(stored.encode("utf-8"))
+                summary["stored_bytes_after"] += len(encoded.encode("utf-8"))
+                if encoded != stored:
+                    # The signature follows the stored form, whichever threshold produced it
+                    db.execute(
+                        update(notes_table).where(notes_table.c.id == note_id).values(
+                            content=encoded, search_signature=make_search_signature(content, encoded)
+                        )
+                    )
+                    summary["rewritten"] += 1
+
+            db.commit()
+            last_id = rows[-1][0]
+            if sleep:
+                time.sleep(sleep)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompress stored note bodies in batches.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--sleep", type=float, default=0.0, help="Pause between batches (seconds)")
+    parser.add_argument("--threshold", type=int, default=None, help="Override the compression threshold (bytes)")
+    args = parser.parse_args()
+
+    init_db()
+    summary = recompress_notes(args.batch_size, args.sleep, args.threshold)
+    before, after = summary["stored_bytes_before"], summary["stored_bytes_after"]
+    print(f"Scanned {summary['scanned']} notes, rewrote {summary['rewritten']}")
+    print(f"Stored bytes: {before} -> {after} ({(before / after) if after else 0:.2f}x)")
+    print(f"Codec stats: {summary['codec_stats']}")
+
+
+if __name__ == "__main__":
+    main()
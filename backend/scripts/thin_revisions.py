@@ -0,0 +1,45 @@
+"""Thin old note revisions across all notes.
+
+Notes are thinned in the background whenever they get a new snapshot; run
+this periodically so notes that stopped changing are thinned as well. Each
+note is thinned in its own transaction.
+
+Usage (from the backend directory):
+    python -m scripts.thin_revisions [--min-revisions 2]
+"""
+import argparse
+
+from sqlalchemy import func, select
+
+from app.database import data_owners, init_db, session_for_user
+from app.models.revision import NoteRevision
+from app.services.revisions import thin_revisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thin old note revisions.")
+    parser.add_argument("--min-revisions", type=int, default=2, help="Skip notes with fewer revisions")
+    args = parser.parse_args()
+
+    init_db()
+    notes = removed = 0
+    for owner in data_owners():
+        db = session_for_user(owner)
+        try:
+            note_ids = db.scalars(
+                select(NoteRevision.note_id)
+                .group_by(NoteRevision.note_id)
+                .having(func.count() >= args.min_revisions)
+            ).all()
+            for note_id in note_ids:
+                removed += thin_revisions(db, note_id)
+                db.commit()
+                notes += 1
+        finally:
+            db.close()
+
+    print(f"🧹 Thinned {notes} note(s), removed {removed} revision(s)")
+
+
+if __name__ == "__main__":
+    main()
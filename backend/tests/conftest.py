@@ -0,0 +1,41 @@
+"""Point the app at throwaway storage before any test imports it (settings are read on import)."""
+import itertools
+import os
+import tempfile
+
+import pytest
+
+_storage = tempfile.mkdtemp(prefix="notes-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_storage, 'app.db')}")
+os.environ.setdefault("RESPONSE_CACHE_PATH", os.path.join(_storage, "response_cache.db"))
+os.environ.setdefault("ATTACHMENT_DIR", os.path.join(_storage, "attachments"))
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")  # bcrypt's minimum, to keep sign-ups fast
+
+_emails = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client for the app, started once for the whole run."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth(client) -> dict:
+    """Authorization headers for a new user."""
+    email = f"user{next(_emails)}@example.com"
+    client.post("/api/auth/register", json={"email": email, "password": "password123", "name": "Test"})
+    token = client.post("/api/auth/login", json={"email": email, "password": "password123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def chapter(client, auth) -> dict:
+    """A chapter in a new book of the auth user."""
+    book = client.post("/api/books", json={"name": "Book"}, headers=auth).json()
+    return client.post(f"/api/books/{book['id']}/chapters", json={"name": "Chapter"}, headers=auth).json()
@@ -0,0 +1,53 @@
+"""Cloned books and chapters keep each note with its own chapter and attachments."""
+
+
+def contents(client, auth, chapter_id: int) -> list[str]:
+    notes = client.get(f"/api/chapters/{chapter_id}/notes", params={"include_content": "true"}, headers=auth).json()
+    return [note["content"] for note in notes]
+
+
+def attachment_names(client, auth, chapter_id: int) -> list[list[str]]:
+    notes = client.get(f"/api/chapters/{chapter_id}/notes", headers=auth).json()
+    return [
+        [attachment["filename"] for attachment in client.get(f"/api/notes/{note['id']}/attachments", headers=auth).json()]
+        for note in notes
+    ]
+
+
+def chapters_by_name(client, auth, book_id: int) -> dict[str, int]:
+    return {chapter["name"]: chapter["id"] for chapter in client.get(f"/api/books/{book_id}/chapters", headers=auth).json()}
+
+
+def test_clones_pair_notes_with_their_sources(client, auth):
+    book = client.post("/api/books", json={"name": "Source"}, headers=auth).json()
+    chapters = [
+        client.post(f"/api/books/{book['id']}/chapters", json={"name": name}, headers=auth).json()
+        for name in ("One", "Two")
+    ]
+    # Interleave the notes so neither chapter's ids are contiguous
+    for n in range(3):
+        for chapter in chapters:
+            note = client.post(
+                f"/api/chapters/{chapter['id']}/notes", json={"content": f"{chapter['name']} {n}"}, headers=auth
+            ).json()
+            client.post(
+                f"/api/notes/{note['id']}/attachments", params={"filename": f"{chapter['name']}-{n}.txt"},
+                content=b"data", headers={**auth, "Content-Type": "text/plain"},
+            )
+    source = chapters_by_name(client, auth, book["id"])
+    assert attachment_names(client, auth, source["One"]) == [["One-2.txt"], ["One-1.txt"], ["One-0.txt"]]
+
+    book_copy = client.post(f"/api/books/{book['id']}/clone", headers=auth).json()
+    # A copy of the copy: its rows already record a source
+    second_copy = client.post(f"/api/books/{book_copy['id']}/clone", headers=auth).json()
+
+    for copy in (book_copy, second_copy):
+        cloned = chapters_by_name(client, auth, copy["id"])
+        assert cloned.keys() == source.keys()
+        for name, chapter_id in source.items():
+            assert contents(client, auth, cloned[name]) == contents(client, auth, chapter_id)
+            assert attachment_names(client, auth, cloned[name]) == attachment_names(client, auth, chapter_id)
+
+    chapter_copy = client.post(f"/api/chapters/{source['Two']}/clone", headers=auth).json()
+    assert contents(client, auth, chapter_copy["id"]) == contents(client, auth, source["Two"])
+    assert attachment_names(client, auth, chapter_copy["id"]) == attachment_names(client, auth, source["Two"])
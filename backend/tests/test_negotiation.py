@@ -0,0 +1,53 @@
+"""Content negotiation honours the q-values of Accept and Accept-Encoding."""
+import pytest
+from starlette.requests import Request
+
+from app.middleware import compression
+from app.middleware.compression import choose_encoding
+from app.utils import encoding
+from app.utils.encoding import wants_msgpack
+
+
+@pytest.fixture(autouse=True)
+def optional_codecs(monkeypatch):
+    monkeypatch.setattr(compression, "HAS_BROTLI", True)
+    monkeypatch.setattr(encoding, "HAS_MSGPACK", True)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip;q=1.0", "gzip"),
+    ("gzip;q=0.8, br;q=0.8", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.5, gzip", "gzip"),
+    ("gzip;q=0.5, identity", None),
+    ("deflate", None),
+    ("", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_gzip_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "HAS_BROTLI", False)
+    assert choose_encoding("br, gzip;q=0.5") == "gzip"
+
+
+def request_accepting(accept: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/msgpack", True),
+    ("application/x-msgpack, application/json", True),
+    ("application/msgpack;q=0", False),
+    ("application/json, application/msgpack;q=0.5", False),
+    ("application/msgpack, */*;q=0.8", True),
+    ("application/msgpack;q=0.9, */*", False),
+    ("application/json", False),
+    ("", False),
+])
+def test_wants_msgpack(accept, expected):
+    assert wants_msgpack(request_accepting(accept)) is expected
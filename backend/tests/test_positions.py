@@ -0,0 +1,107 @@
+"""Fractional ordering keys, and the rebalancing that keeps them short."""
+import random
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.database import SessionLocal
+from app.models.note import Note
+from app.services import positions as position_service
+from app.utils.positions import DIGITS, POSITION_TYPE, key_between, spread_keys
+
+
+def check_order(keys: list[str]) -> None:
+    assert keys == sorted(keys, key=lambda key: key.encode("ascii"))
+    assert len(set(keys)) == len(keys)
+    assert not any(key.endswith(DIGITS[0]) for key in keys)
+
+
+def test_keys_placed_anywhere_keep_byte_order():
+    rng = random.Random(41)
+    keys = [key_between(None, None)]
+    for _ in range(500):
+        i = rng.randint(0, len(keys))
+        before = keys[i - 1] if i > 0 else None
+        after = keys[i] if i < len(keys) else None
+        keys.insert(i, key_between(before, after))
+    check_order(keys)
+
+
+@pytest.mark.parametrize("index", [0, 1, -1])
+def test_repeated_inserts_into_one_gap(index):
+    keys = ["A", "B"]
+    for _ in range(200):
+        i = index % (len(keys) + 1) if index >= 0 else len(keys)
+        before = keys[i - 1] if i > 0 else None
+        after = keys[i] if i < len(keys) else None
+        keys.insert(i, key_between(before, after))
+        index = index + 1 if index > 0 else index
+    check_order(keys)
+
+
+def test_neighbours_out_of_order_are_refused():
+    with pytest.raises(ValueError):
+        key_between("b", "a")
+    with pytest.raises(ValueError):
+        key_between("a", "a")
+
+
+@pytest.mark.parametrize("count", [1, 2, 30, 61, 62, 1000])
+def test_spread_keys_are_short_and_ordered(count):
+    keys = spread_keys(count)
+    assert len(keys) == count
+    check_order(keys)
+    assert max(len(key) for key in keys) <= 3
+    # Room to insert on both sides of every key
+    check_order([key_between(None, keys[0]), *keys, key_between(keys[-1], None)])
+
+
+def test_keys_compare_bytes_in_postgres():
+    assert 'COLLATE "C"' in str(POSITION_TYPE.compile(dialect=postgresql.dialect()))
+    assert "COLLATE" not in str(POSITION_TYPE.compile(dialect=sqlite.dialect()))
+
+
+def note_ids(client, auth, chapter) -> list[int]:
+    return [note["id"] for note in client.get(f"/api/chapters/{chapter['id']}/notes", headers=auth).json()]
+
+
+def test_long_keys_are_rebalanced_in_order(client, auth, chapter, monkeypatch):
+    monkeypatch.setattr(position_service.settings, "position_max_length", 2)
+    for n in range(4):
+        client.post(f"/api/chapters/{chapter['id']}/notes", json={"content": str(n)}, headers=auth)
+    ids = note_ids(client, auth, chapter)
+
+    # Keep dropping the last note right after the first until its key is too long
+    for _ in range(12):
+        moved = client.put(
+            f"/api/notes/{ids[-1]}/position", json={"previous_id": ids[0], "next_id": ids[1]}, headers=auth
+        ).json()
+        ids = [ids[0], ids[-1], *ids[1:-1]]
+        assert note_ids(client, auth, chapter) == ids
+        if len(moved["position"]) > 2:
+            break
+    else:
+        pytest.fail("Keys never grew past the limit")
+
+    # The background rebalance ran after the response
+    notes = client.get(f"/api/chapters/{chapter['id']}/notes", headers=auth).json()
+    assert [note["id"] for note in notes] == ids
+    assert [note["position"] for note in notes] == spread_keys(len(ids))
+
+
+def test_colliding_keys_are_rebalanced_before_a_move(client, auth, chapter):
+    for n in range(3):
+        client.post(f"/api/chapters/{chapter['id']}/notes", json={"content": str(n)}, headers=auth)
+    ids = note_ids(client, auth, chapter)
+    # Two concurrent moves into the same gap can leave equal keys; ties sort by id
+    first, second = sorted(ids[:2])
+    with SessionLocal() as db:
+        db.execute(update(Note).where(Note.id.in_([first, second])).values(position="V"))
+        db.commit()
+
+    response = client.put(
+        f"/api/notes/{ids[2]}/position", json={"previous_id": first, "next_id": second}, headers=auth
+    )
+    assert response.status_code == 200
+    assert note_ids(client, auth, chapter) == [first, ids[2], second]
@@ -0,0 +1,117 @@
+"""Round trips through the revision chain: record, rebuild and thin."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import attachment, book, chapter, note, outbox, password_reset, revision, stats, tag, user  # noqa: F401
+from app.models.book import Book
+from app.models.chapter import Chapter
+from app.models.note import Note
+from app.models.revision import NoteRevision
+from app.models.user import User
+from app.services import revisions
+from app.services.revisions import record_revision, revision_content, thin_note_revisions, thin_revisions
+
+NOW = datetime(2026, 1, 31, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'revisions.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def new_note(db):
+    owner = User(email="reader@example.com", password_hash="")
+    db.add(owner)
+    db.flush()
+    parent = Book(name="Book", user_id=owner.id)
+    db.add(parent)
+    db.flush()
+    section = Chapter(name="Chapter", book_id=parent.id, user_id=owner.id, position="a0")
+    db.add(section)
+    db.flush()
+    entry = Note(content="version 1", chapter_id=section.id, user_id=owner.id, position="a0")
+    db.add(entry)
+    db.commit()
+    return entry
+
+
+def edit(db, entry: Note, content: str) -> None:
+    old_content = entry.content
+    entry.content = content
+    record_revision(db, entry, old_content)
+    db.commit()
+
+
+def test_every_recorded_version_rebuilds(db, new_note):
+    contents = ["version 1"] + [f"version 1, edit {n}" + " more" * n for n in range(1, 45)]
+    for content in contents[1:]:
+        edit(db, new_note, content)
+
+    assert new_note.version == len(contents)
+    for version, content in enumerate(contents, start=1):
+        assert revision_content(db, new_note.id, version) == content
+    kinds = db.scalars(select(NoteRevision.kind).where(NoteRevision.note_id == new_note.id)).all()
+    assert "delta" in kinds and kinds.count("snapshot") >= 2
+
+
+def test_unknown_version_is_none(db, new_note):
+    edit(db, new_note, "version 2")
+
+    assert revision_content(db, new_note.id, 3) is None
+    assert revision_content(db, new_note.id + 1, 1) is None
+
+
+def test_thinning_keeps_the_latest_per_hour_and_rebuilds_the_rest(db, new_note):
+    for n in range(2, 11):
+        edit(db, new_note, f"version {n}")
+    # Versions 1-8 two at a time in four earlier hours; 9 and 10 recent
+    rows = db.scalars(select(NoteRevision).where(NoteRevision.note_id == new_note.id)).all()
+    for row in rows:
+        age = timedelta(minutes=5) if row.version > 8 else timedelta(hours=48 - (row.version - 1) // 2)
+        row.created_at = NOW - age
+    db.commit()
+
+    assert thin_revisions(db, new_note.id, now=NOW) == 4
+    db.commit()
+
+    kept = db.scalars(
+        select(NoteRevision.version).where(NoteRevision.note_id == new_note.id).order_by(NoteRevision.version)
+    ).all()
+    assert kept == [2, 4, 6, 8, 9, 10]
+    for version in kept:
+        assert revision_content(db, new_note.id, version) == f"version {version}"
+    assert revision_content(db, new_note.id, 1) is None
+    assert thin_revisions(db, new_note.id, now=NOW) == 0
+
+
+def test_background_thinning_invalidates_cached_responses(db, new_note, session_factory, monkeypatch):
+    for n in range(2, 4):
+        edit(db, new_note, f"version {n}")
+    for row in db.scalars(select(NoteRevision).where(NoteRevision.note_id == new_note.id)):
+        row.created_at = datetime.now(timezone.utc) - timedelta(days=60, hours=row.version)
+    db.commit()
+    invalidated = []
+    monkeypatch.setattr(revisions, "session_for_user", lambda user_id: session_factory())
+    monkeypatch.setattr(revisions.response_cache, "invalidate", lambda user_id, *tags: invalidated.append((user_id, tags)))
+
+    thin_note_revisions(new_note.id, new_note.user_id)
+    assert invalidated == [(new_note.user_id, (f"note:{new_note.id}",))]
+
+    invalidated.clear()
+    thin_note_revisions(new_note.id, new_note.user_id)
+    assert invalidated == []
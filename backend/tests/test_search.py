@@ -0,0 +1,57 @@
+"""Note search over plain and compressed bodies."""
+from app.database import SessionLocal
+from app.models.note import Note
+from app.utils.compression import compression_stats, is_compressed
+from app.utils.signatures import make_signature, may_contain
+
+LONG_BODY = "The quick brown fox jumps over the lazy dog. " * 140  # Above the compression threshold
+
+
+def test_signature_never_rules_out_a_contained_term():
+    signature = make_signature(LONG_BODY)
+
+    for term in ("quick", "LAZY DOG", "g. t", "ox", "The quick brown fox jumps"):
+        assert may_contain(signature, term)
+    assert not may_contain(signature, "zebra crossing")
+    assert len(signature) < len(LONG_BODY) // 4
+
+
+def add_note(client, auth, chapter, content: str) -> dict:
+    return client.post(f"/api/chapters/{chapter['id']}/notes", json={"content": content}, headers=auth).json()
+
+
+def search(client, auth, q: str) -> list[int]:
+    return [result["id"] for result in client.get("/api/notes/search", params={"q": q}, headers=auth).json()]
+
+
+def test_compressed_notes_match_their_text_only(client, auth, chapter):
+    note = add_note(client, auth, chapter, LONG_BODY + "needle")
+    with SessionLocal() as db:
+        stored = db.get(Note, note["id"]).stored_content
+    assert is_compressed(stored)
+    # Pieces of the stored encoding that aren't in the text
+    fragments = [stored[i:i + 3] for i in range(2, len(stored) - 3) if stored[i:i + 3].lower() not in LONG_BODY.lower()]
+
+    assert search(client, auth, "NEEDLE") == [note["id"]]
+    assert search(client, auth, "lazy dog") == [note["id"]]
+    for fragment in fragments[:20]:
+        assert search(client, auth, fragment) == []
+
+
+def test_only_returned_notes_are_decompressed(client, auth, chapter):
+    match = add_note(client, auth, chapter, LONG_BODY + "findme")
+    for _ in range(5):
+        add_note(client, auth, chapter, LONG_BODY)
+
+    compression_stats.reset()
+    assert search(client, auth, "findme") == [match["id"]]
+    assert compression_stats.snapshot()["decompressed_count"] <= 2
+
+
+def test_like_wildcards_match_literally(client, auth, chapter):
+    percent = add_note(client, auth, chapter, "100% done")
+    underscore = add_note(client, auth, chapter, "snake_case")
+    add_note(client, auth, chapter, "100 percent, snakeXcase")
+
+    assert search(client, auth, "0%") == [percent["id"]]
+    assert search(client, auth, "e_c") == [underscore["id"]]
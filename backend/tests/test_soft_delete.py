@@ -0,0 +1,48 @@
+"""Books deleted in the background: hidden at once, through flags on their chapters and notes."""
+from sqlalchemy import event
+from sqlalchemy.sql import func
+
+from app.database import SessionLocal, engine
+from app.models.book import Book
+from app.services.purge import hide_book_contents
+
+
+def hide_book(book_id: int, user_id: int) -> None:
+    """What a background delete commits before its purge runs."""
+    with SessionLocal() as db:
+        db.get(Book, book_id).deleted_at = func.now()
+        hide_book_contents(db, book_id, user_id)
+        db.commit()
+
+
+def test_pending_purge_hides_chapters_and_notes(client, auth, chapter):
+    note = client.post(f"/api/chapters/{chapter['id']}/notes", json={"content": "hidden words"}, headers=auth).json()
+    user_id = client.get("/api/auth/me", headers=auth).json()["id"]
+
+    hide_book(chapter["book_id"], user_id)
+
+    assert client.get(f"/api/notes/{note['id']}", headers=auth).status_code == 404
+    assert client.put(f"/api/notes/{note['id']}", json={"content": "x"}, headers=auth).status_code == 404
+    assert client.get(f"/api/notes/{note['id']}/revisions", headers=auth).status_code == 404
+    assert client.get(f"/api/chapters/{chapter['id']}", headers=auth).status_code == 404
+    assert client.post(
+        f"/api/chapters/{chapter['id']}/notes", json={"content": "y"}, headers=auth
+    ).status_code == 404
+    assert client.get("/api/notes/search", params={"q": "hidden"}, headers=auth).json() == []
+
+
+def test_note_lookup_reads_only_the_notes_table(client, auth, chapter):
+    note = client.post(f"/api/chapters/{chapter['id']}/notes", json={"content": "x"}, headers=auth).json()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert client.get(f"/api/notes/{note['id']}", headers=auth).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    note_queries = [statement for statement in statements if "FROM notes" in statement]
+    assert note_queries and not any("JOIN" in statement for statement in note_queries)
@@ -0,0 +1,49 @@
+"""Cold-start budget, enforced in the test suite.
+
+Uses the same measurements as scripts/profile_startup.py (which also lists
+the slowest imports). Budgets can be raised for slow CI machines with
+STARTUP_IMPORT_BUDGET_MS and STARTUP_BUDGET_MS.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from scripts.profile_startup import app_import_time, time_to_first_request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", 1500))
+BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 2500))
+RUNS = 3
+
+# Only needed by some requests, so app.main must not import them
+LAZY_MODULES = ("bcrypt", "uvicorn", "msgpack", "brotli", "zstandard", "app.server")
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.chdir(BACKEND_DIR)
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'startup.db'}",
+        "RESPONSE_CACHE_PATH": str(tmp_path / "response_cache.db"),
+    }
+
+
+def test_heavy_modules_are_imported_lazily(env):
+    code = f"import sys, app.main; print(*(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
+
+
+def test_app_import_within_budget(env):
+    import_ms = statistics.median(app_import_time(env) * 1000 for _ in range(RUNS))
+    assert import_ms <= IMPORT_BUDGET_MS, f"import app.main took {import_ms:.0f} ms"
+
+
+def test_time_to_first_request_within_budget(env):
+    time_to_first_request(env)  # Creates the schema, which later starts skip
+    ttfr_ms = statistics.median(time_to_first_request(env) * 1000 for _ in range(RUNS))
+    assert ttfr_ms <= BUDGET_MS, f"first request answered after {ttfr_ms:.0f} ms"
@@ -0,0 +1,76 @@
+"""Write responses come from objects kept past commit (no expire_on_commit), so they must match a fresh read."""
+
+
+def add_note(client, auth, chapter, content: str) -> dict:
+    return client.post(f"/api/chapters/{chapter['id']}/notes", json={"content": content}, headers=auth).json()
+
+
+def read(client, auth, path: str) -> dict:
+    response = client.get(path, headers=auth)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_note_writes_match_a_following_read(client, auth, chapter):
+    note = add_note(client, auth, chapter, "first")
+    assert note == read(client, auth, f"/api/notes/{note['id']}")
+
+    updated = client.put(f"/api/notes/{note['id']}", json={"content": "second"}, headers=auth).json()
+    assert updated["version"] == note["version"] + 1
+    assert updated == read(client, auth, f"/api/notes/{note['id']}")
+
+    patched = client.patch(
+        f"/api/notes/{note['id']}",
+        json={"base_version": updated["version"], "operations": [{"op": "insert", "offset": 6, "text": "!"}]},
+        headers=auth,
+    ).json()
+    assert patched["content"] == "second!"
+    assert patched == read(client, auth, f"/api/notes/{note['id']}")
+
+
+def test_note_moves_match_a_following_read(client, auth, chapter):
+    first = add_note(client, auth, chapter, "first")
+    second = add_note(client, auth, chapter, "second")
+
+    moved = client.put(
+        f"/api/notes/{second['id']}/position", json={"next_id": first["id"]}, headers=auth
+    ).json()
+    assert moved["position"] < first["position"]
+    assert moved == read(client, auth, f"/api/notes/{second['id']}")
+
+    other = client.post(f"/api/books/{chapter['book_id']}/chapters", json={"name": "Other"}, headers=auth).json()
+    assert client.post(
+        "/api/notes/move", json={"note_ids": [first["id"]], "chapter_id": other["id"]}, headers=auth
+    ).json()["moved"] == 1
+    assert read(client, auth, f"/api/notes/{first['id']}")["chapter_id"] == other["id"]
+
+
+def test_chapter_and_book_writes_match_a_following_read(client, auth, chapter):
+    first = read(client, auth, f"/api/chapters/{chapter['id']}")
+    second = client.post(f"/api/books/{chapter['book_id']}/chapters", json={"name": "Second"}, headers=auth).json()
+    assert second == read(client, auth, f"/api/chapters/{second['id']}")
+
+    renamed = client.put(f"/api/chapters/{chapter['id']}", json={"name": "Renamed"}, headers=auth).json()
+    assert renamed["name"] == "Renamed"
+    assert renamed == read(client, auth, f"/api/chapters/{chapter['id']}")
+
+    moved = client.put(
+        f"/api/chapters/{second['id']}/position", json={"next_id": first["id"]}, headers=auth
+    ).json()
+    assert moved["position"] < first["position"]
+    assert moved == read(client, auth, f"/api/chapters/{second['id']}")
+
+    book = client.put(f"/api/books/{chapter['book_id']}", json={"name": "Renamed"}, headers=auth).json()
+    assert book["name"] == "Renamed"
+    assert book == read(client, auth, f"/api/books/{chapter['book_id']}")
+
+
+def test_clones_match_a_following_read(client, auth, chapter):
+    add_note(client, auth, chapter, "copied")
+
+    chapter_copy = client.post(f"/api/chapters/{chapter['id']}/clone", headers=auth).json()
+    assert chapter_copy == read(client, auth, f"/api/chapters/{chapter_copy['id']}")
+
+    book_copy = client.post(f"/api/books/{chapter['book_id']}/clone", headers=auth).json()
+    assert book_copy["note_count"] == 2  # The note and its copy in the cloned chapter
+    assert book_copy == read(client, auth, f"/api/books/{book_copy['id']}")
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { LoginPage } from './components/LoginPage';
 import { ResetPasswordPage } from './components/ResetPasswordPage';
 import { BooksPane, BookType } from './components/BooksPane';
@@ -13,6 +13,9 @@ import {
   chaptersApi,
   notesApi,
   tagsApi,
+  eventsApi,
+  diffToOperations,
+  ApiError,
   Book,
   Chapter,
   Note,
@@ -36,8 +39,11 @@ const toChapterType = (chapter: Chapter): ChapterType => ({
 const toNoteType = (note: Note): NoteType => ({
   id: String(note.id),
   date: note.date,
-  content: note.content,
+  content: note.content ?? undefined,
+  preview: note.preview,
+  contentLength: note.content_length,
   chapterId: String(note.chapter_id),
+  version: note.version,
 });
 
 const toTagType = (tag: Tag): TagType => ({
@@ -66,6 +72,12 @@ export default function App() {
   const [editingNoteId, setEditingNoteId] = useState<string | null>(null);
   const [isSearchOpen, setIsSearchOpen] = useState(false);
 
+  // Current selection, for the change event handler (subscribed once per login)
+  const selectedBookIdRef = useRef<string | null>(null);
+  const selectedChapterIdRef = useRef<string | null>(null);
+  selectedBookIdRef.current = selectedBookId;
+  selectedChapterIdRef.current = selectedChapterId;
+
   // Check for reset password token in URL
   const [resetToken, setResetToken] = useState<string | null>(null);
 
@@ -133,6 +145,63 @@ export default function App() {
     }
   }, [selectedChapterId]);
 
+  // Refresh the panes when the library changes in another tab or device
+  useEffect(() => {
+    if (!isLoggedIn) return;
+    return eventsApi.subscribe(({ type, data }) => {
+      const bookId = selectedBookIdRef.current;
+      const chapterId = selectedChapterIdRef.current;
+      const [entity, action] = type.split('.');
+      const resync = type === 'resync';
+
+      if (resync || entity === 'book' || entity === 'chapter' || (entity === 'note' && action !== 'updated')) {
+        refreshBooks(); // Names and note counts
+      }
+      if (resync || entity === 'tag') {
+        loadTags();
+      }
+      if (!bookId) return;
+
+      if (entity === 'book' && action === 'deleted' && String(data.id) === bookId) {
+        setSelectedBookId(null);
+      } else if (resync || (entity === 'chapter' && [data.book_id, ...(data.from_book_ids ?? [])].map(String).includes(bookId))) {
+        refreshChapters(Number(bookId));
+      }
+      if (!chapterId) return;
+
+      if (entity === 'chapter' && action === 'deleted' && String(data.id) === chapterId) {
+        setSelectedChapterId(null);
+      } else if (resync || (entity === 'note' && [data.chapter_id, ...(data.from_chapter_ids ?? [])].map(String).includes(chapterId))) {
+        refreshNotes(Number(chapterId));
+      }
+    });
+  }, [isLoggedIn]);
+
+  // Reloads that keep the current selection
+  const refreshBooks = async () => {
+    try {
+      setBooks((await booksApi.getAll()).map(toBookType));
+    } catch (error) {
+      console.error('Failed to refresh books:', error);
+    }
+  };
+
+  const refreshChapters = async (bookId: number) => {
+    try {
+      setChapters((await chaptersApi.getByBook(bookId)).map(toChapterType));
+    } catch (error) {
+      console.error('Failed to refresh chapters:', error);
+    }
+  };
+
+  const refreshNotes = async (chapterId: number) => {
+    try {
+      setNotes((await notesApi.getByChapter(chapterId)).map(toNoteType));
+    } catch (error) {
+      console.error('Failed to refresh notes:', error);
+    }
+  };
+
   const loadBooks = async () => {
     try {
       const data = await booksApi.getAll();
@@ -296,9 +365,37 @@ export default function App() {
     }
   };
 
+  // Lists only carry previews; fetch the full body when a note is opened
+  const handleLoadNote = async (noteId: string) => {
+    try {
+      const note = toNoteType(await notesApi.get(Number(noteId)));
+      setNotes(prev => prev.map(existing => existing.id === noteId ? note : existing));
+    } catch (error) {
+      console.error('Failed to load note:', error);
+    }
+  };
+
   const handleEditNote = async (noteId: string, newContent: string) => {
     try {
-      const updatedNote = await notesApi.update(Number(noteId), newContent);
+      // Send only the changed range when we know which version we're editing
+      const existing = notes.find(note => note.id === noteId);
+      let updatedNote: Note;
+      if (existing?.version !== undefined && existing.content !== undefined) {
+        try {
+          const operations = diffToOperations(existing.content, newContent);
+          updatedNote = await notesApi.patch(Number(noteId), existing.version, operations);
+        } catch (error) {
+          const conflict = error instanceof ApiError && error.status === 409;
+          if (conflict && !confirm('This note was changed somewhere else. Overwrite those changes with yours? Cancel loads the latest version instead.')) {
+            await handleLoadNote(noteId);
+            return;
+          }
+          // Rejected patch, or the user chose to overwrite: fall back to a full save
+          updatedNote = await notesApi.update(Number(noteId), newContent);
+        }
+      } else {
+        updatedNote = await notesApi.update(Number(noteId), newContent);
+      }
       setNotes(prev => prev.map(note =>
         note.id === noteId ? toNoteType(updatedNote) : note
       ));
@@ -424,6 +521,7 @@ export default function App() {
           selectedChapterName={selectedChapter?.name || ''}
           onAddNote={handleAddNote}
           onEditNote={handleEditNote}
+          onLoadNote={handleLoadNote}
           onDeleteNote={handleDeleteNote}
           onAddTag={handleAddTag}
           onRemoveTag={handleRemoveTag}
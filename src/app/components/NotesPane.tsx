@@ -8,8 +8,11 @@ import { NoteEditorModal } from './ui/NoteEditorModal';
 export interface NoteType {
   id: string;
   date: string;
-  content: string;
+  content?: string;  // Full body, once loaded; lists only carry the preview
+  preview: string;
+  contentLength: number;
   chapterId: string;
+  version?: number;
 }
 
 export interface TagType {
@@ -24,6 +27,7 @@ interface NotesPaneProps {
   selectedChapterName: string;
   onAddNote: (content: string, date: string) => void;
   onEditNote: (noteId: string, content: string) => void;
+  onLoadNote: (noteId: string) => Promise<void>;
   onDeleteNote: (noteId: string) => void;
   onAddTag: (name: string, color: string) => void;
   onRemoveTag: (tagId: string) => void;
@@ -45,6 +49,7 @@ export function NotesPane({
   selectedChapterName,
   onAddNote,
   onEditNote,
+  onLoadNote,
   onDeleteNote,
   onAddTag,
   onRemoveTag,
@@ -76,7 +81,19 @@ export function NotesPane({
     }
   };
 
-  const openEditModal = (noteId: string) => {
+  const loadNote = async (noteId: string) => {
+    if (notes.find(n => n.id === noteId)?.content === undefined) {
+      await onLoadNote(noteId);
+    }
+  };
+
+  const showNote = (noteId: string) => {
+    setHoveredNoteId(noteId);
+    loadNote(noteId);
+  };
+
+  const openEditModal = async (noteId: string) => {
+    await loadNote(noteId);
     setEditingNoteId(noteId);
     setIsEditorModalOpen(true);
   };
@@ -219,7 +236,7 @@ export function NotesPane({
                 <div
                   key={note.id}
                   className={`relative ${hoveredNoteId === note.id ? 'z-10' : 'z-0'}`}
-                  onMouseEnter={() => setHoveredNoteId(note.id)}
+                  onMouseEnter={() => showNote(note.id)}
                   onMouseLeave={() => setHoveredNoteId(null)}
                 >
                   {/* Timeline Dot */}
@@ -257,19 +274,16 @@ export function NotesPane({
                       <div className="text-white/80 text-sm max-h-[300px] overflow-y-auto">
                         <div
                           className="prose prose-invert prose-sm max-w-none"
-                          dangerouslySetInnerHTML={{ __html: note.content }}
+                          dangerouslySetInnerHTML={{ __html: note.content ?? note.preview }}
                         />
                       </div>
                     ) : (
                       <div className="text-white/80 text-sm max-h-20 overflow-hidden">
-                        <div
-                          className="line-clamp-3"
-                          dangerouslySetInnerHTML={{ __html: note.content.replace(/<[^>]*>/g, ' ').substring(0, 200) }}
-                        />
+                        <div className="line-clamp-3">{note.preview}</div>
                       </div>
                     )}
 
-                    {hoveredNoteId !== note.id && note.content.length > 150 && (
+                    {hoveredNoteId !== note.id && note.contentLength > 150 && (
                       <div className="text-white/40 text-xs mt-2 italic">
                         Hover for details
                       </div>
@@ -21,6 +21,7 @@ export interface Chapter {
     id: number;
     name: string;
     book_id: number;
+    position: string;
     date: string;
     created_at: string;
     updated_at: string;
@@ -28,13 +29,34 @@ export interface Chapter {
 
 export interface Note {
     id: number;
-    content: string;
+    content: string | null;  // null in chapter listings, which only carry the preview
+    preview: string;
+    content_length: number;
+    version: number;
     chapter_id: number;
+    position: string;
     date: string;
     created_at: string;
     updated_at: string;
 }
 
+export interface MoveResult {
+    moved: number;
+}
+
+export interface NoteRevision {
+    version: number;
+    content_length: number;
+    created_at: string;
+}
+
+export interface TextOperation {
+    op: 'insert' | 'delete';
+    offset: number;
+    text?: string;
+    length?: number;
+}
+
 export interface SearchResult {
     id: number;
     content: string;
@@ -47,6 +69,17 @@ export interface SearchResult {
     updated_at: string;
 }
 
+export interface Attachment {
+    id: number;
+    note_id: number;
+    filename: string;
+    content_type: string;
+    size: number;
+    sha256: string;
+    url: string;
+    created_at: string;
+}
+
 export interface Tag {
     id: number;
     name: string;
@@ -72,6 +105,16 @@ export const isAuthenticated = (): boolean => {
     return !!getToken();
 };
 
+// Error from a failed request, with the HTTP status
+export class ApiError extends Error {
+    status: number;
+
+    constructor(status: number, message: string) {
+        super(message);
+        this.status = status;
+    }
+}
+
 // API request helper
 async function apiRequest<T>(
     endpoint: string,
@@ -88,18 +131,28 @@ async function apiRequest<T>(
         headers['Authorization'] = `Bearer ${token}`;
     }
 
-    const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+    let response = await fetch(`${API_BASE_URL}${endpoint}`, {
         ...options,
         headers,
     });
 
+    // Reads refused under load (admission control) are retried once, after the server's Retry-After
+    if (response.status === 503 && (options.method ?? 'GET') === 'GET') {
+        const delaySeconds = Math.min(Number(response.headers.get('Retry-After')) || 1, 10);
+        await new Promise(resolve => setTimeout(resolve, delaySeconds * 1000));
+        response = await fetch(`${API_BASE_URL}${endpoint}`, {
+            ...options,
+            headers,
+        });
+    }
+
     if (!response.ok) {
         if (response.status === 401) {
             removeToken();
-            throw new Error('Unauthorized');
+            throw new ApiError(401, 'Unauthorized');
         }
         const error = await response.json().catch(() => ({ detail: 'Request failed' }));
-        throw new Error(error.detail || 'Request failed');
+        throw new ApiError(response.status, error.detail || 'Request failed');
     }
 
     // Handle 204 No Content
@@ -171,6 +224,14 @@ export const booksApi = {
         });
     },
 
+    // Copy a book with all its chapters and notes
+    clone: async (id: number, name?: string): Promise<Book> => {
+        return apiRequest<Book>(`/api/books/${id}/clone`, {
+            method: 'POST',
+            body: JSON.stringify({ name }),
+        });
+    },
+
     delete: async (id: number): Promise<void> => {
         return apiRequest<void>(`/api/books/${id}`, {
             method: 'DELETE',
@@ -198,6 +259,30 @@ export const chaptersApi = {
         });
     },
 
+    // Place a chapter between two neighbours (null for the start or end of the book)
+    move: async (id: number, previousId: number | null, nextId: number | null): Promise<Chapter> => {
+        return apiRequest<Chapter>(`/api/chapters/${id}/position`, {
+            method: 'PUT',
+            body: JSON.stringify({ previous_id: previousId, next_id: nextId }),
+        });
+    },
+
+    // Copy a chapter with its notes to the end of a book (its own by default)
+    clone: async (id: number, bookId?: number, name?: string): Promise<Chapter> => {
+        return apiRequest<Chapter>(`/api/chapters/${id}/clone`, {
+            method: 'POST',
+            body: JSON.stringify({ book_id: bookId, name }),
+        });
+    },
+
+    // Move several chapters, with their notes, to the end of another book
+    moveToBook: async (ids: number[], bookId: number): Promise<MoveResult> => {
+        return apiRequest<MoveResult>('/api/chapters/move', {
+            method: 'POST',
+            body: JSON.stringify({ chapter_ids: ids, book_id: bookId }),
+        });
+    },
+
     delete: async (id: number): Promise<void> => {
         return apiRequest<void>(`/api/chapters/${id}`, {
             method: 'DELETE',
@@ -207,10 +292,15 @@ export const chaptersApi = {
 
 // Notes API
 export const notesApi = {
+    // Previews only; load a full body with get() when a note is opened
     getByChapter: async (chapterId: number): Promise<Note[]> => {
         return apiRequest<Note[]>(`/api/chapters/${chapterId}/notes`);
     },
 
+    get: async (id: number): Promise<Note> => {
+        return apiRequest<Note>(`/api/notes/${id}`);
+    },
+
     create: async (chapterId: number, content: string): Promise<Note> => {
         return apiRequest<Note>(`/api/chapters/${chapterId}/notes`, {
             method: 'POST',
@@ -225,17 +315,120 @@ export const notesApi = {
         });
     },
 
+    patch: async (id: number, baseVersion: number, operations: TextOperation[]): Promise<Note> => {
+        return apiRequest<Note>(`/api/notes/${id}`, {
+            method: 'PATCH',
+            body: JSON.stringify({ base_version: baseVersion, operations }),
+        });
+    },
+
+    // Place a note between two neighbours (null for the start or end of the chapter)
+    move: async (id: number, previousId: number | null, nextId: number | null): Promise<Note> => {
+        return apiRequest<Note>(`/api/notes/${id}/position`, {
+            method: 'PUT',
+            body: JSON.stringify({ previous_id: previousId, next_id: nextId }),
+        });
+    },
+
+    // Move several notes to the end of another chapter
+    moveToChapter: async (ids: number[], chapterId: number): Promise<MoveResult> => {
+        return apiRequest<MoveResult>('/api/notes/move', {
+            method: 'POST',
+            body: JSON.stringify({ note_ids: ids, chapter_id: chapterId }),
+        });
+    },
+
     delete: async (id: number): Promise<void> => {
         return apiRequest<void>(`/api/notes/${id}`, {
             method: 'DELETE',
         });
     },
 
+    revisions: async (id: number): Promise<NoteRevision[]> => {
+        return apiRequest<NoteRevision[]>(`/api/notes/${id}/revisions`);
+    },
+
+    getRevision: async (id: number, version: number): Promise<{ version: number; content: string; created_at: string }> => {
+        return apiRequest(`/api/notes/${id}/revisions/${version}`);
+    },
+
+    // Saves the old content as a new version
+    restoreRevision: async (id: number, version: number): Promise<Note> => {
+        return apiRequest<Note>(`/api/notes/${id}/revisions/${version}/restore`, {
+            method: 'POST',
+        });
+    },
+
     search: async (query: string): Promise<SearchResult[]> => {
         return apiRequest<SearchResult[]>(`/api/notes/search?q=${encodeURIComponent(query)}`);
     },
 };
 
+// Compute the edit between two texts as at most one delete and one insert.
+// Offsets count Unicode code points, matching the server.
+export function diffToOperations(oldText: string, newText: string): TextOperation[] {
+    const oldChars = Array.from(oldText);
+    const newChars = Array.from(newText);
+
+    let prefix = 0;
+    while (prefix < oldChars.length && prefix < newChars.length && oldChars[prefix] === newChars[prefix]) {
+        prefix++;
+    }
+
+    let suffix = 0;
+    while (
+        suffix < oldChars.length - prefix &&
+        suffix < newChars.length - prefix &&
+        oldChars[oldChars.length - 1 - suffix] === newChars[newChars.length - 1 - suffix]
+    ) {
+        suffix++;
+    }
+
+    const operations: TextOperation[] = [];
+    const deleted = oldChars.length - prefix - suffix;
+    if (deleted > 0) {
+        operations.push({ op: 'delete', offset: prefix, length: deleted });
+    }
+    const inserted = newChars.slice(prefix, newChars.length - suffix).join('');
+    if (inserted) {
+        operations.push({ op: 'insert', offset: prefix, text: inserted });
+    }
+    return operations;
+}
+
+// Attachments API
+export const attachmentsApi = {
+    getByNote: async (noteId: number): Promise<Attachment[]> => {
+        return apiRequest<Attachment[]>(`/api/notes/${noteId}/attachments`);
+    },
+
+    // The file is sent as the raw request body and streamed to disk by the server
+    upload: async (noteId: number, file: File): Promise<Attachment> => {
+        return apiRequest<Attachment>(`/api/notes/${noteId}/attachments?filename=${encodeURIComponent(file.name)}`, {
+            method: 'POST',
+            headers: { 'Content-Type': file.type || 'application/octet-stream' },
+            body: file,
+        });
+    },
+
+    // Downloads need the auth header, so fetch the file and hand back an object URL
+    objectUrl: async (attachment: Attachment): Promise<string> => {
+        const response = await fetch(`${API_BASE_URL}${attachment.url}`, {
+            headers: { Authorization: `Bearer ${getToken()}` },
+        });
+        if (!response.ok) {
+            throw new Error('Failed to download attachment');
+        }
+        return URL.createObjectURL(await response.blob());
+    },
+
+    delete: async (noteId: number, id: number): Promise<void> => {
+        return apiRequest<void>(`/api/notes/${noteId}/attachments/${id}`, {
+            method: 'DELETE',
+        });
+    },
+};
+
 // Tags API
 export const tagsApi = {
     getAll: async (): Promise<Tag[]> => {
@@ -262,3 +455,83 @@ export const tagsApi = {
         });
     },
 };
+
+// Events API
+export interface LibraryEvent {
+    // e.g. 'note.updated'; 'resync' means anything shown may be stale
+    type: string;
+    data: Record<string, any>;
+}
+
+export const eventsApi = {
+    // Server-sent events read through fetch, since EventSource can't send the auth header.
+    // Reconnects (resuming after the last event seen) until the returned function is called.
+    subscribe: (onEvent: (event: LibraryEvent) => void): (() => void) => {
+        const controller = new AbortController();
+        let lastEventId: string | null = null;
+        let retryMs = 3000;
+        let connected = false;
+
+        const handleFrame = (frame: string) => {
+            let type = 'message';
+            let data = '';
+            for (const line of frame.split('\n')) {
+                const separator = line.indexOf(': ');
+                if (line.startsWith(':') || separator < 0) continue;
+                const field = line.slice(0, separator);
+                const value = line.slice(separator + 2);
+                if (field === 'id') lastEventId = value;
+                else if (field === 'event') type = value;
+                else if (field === 'data') data = value;
+                else if (field === 'retry') retryMs = Number(value) || retryMs;
+            }
+            if (data) {
+                onEvent({ type, data: JSON.parse(data) });
+            }
+        };
+
+        const run = async () => {
+            while (!controller.signal.aborted) {
+                try {
+                    const headers: Record<string, string> = { Authorization: `Bearer ${getToken()}` };
+                    if (lastEventId) {
+                        headers['Last-Event-ID'] = lastEventId;
+                    }
+                    const response = await fetch(`${API_BASE_URL}/api/events`, {
+                        headers,
+                        signal: controller.signal,
+                    });
+                    if (response.status === 401) {
+                        return;
+                    }
+                    if (response.ok && response.body) {
+                        // Without an id to resume from, changes made while disconnected are unknown
+                        if (connected && !lastEventId) {
+                            onEvent({ type: 'resync', data: {} });
+                        }
+                        connected = true;
+                        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+                        let buffer = '';
+                        for (;;) {
+                            const { value, done } = await reader.read();
+                            if (done) break;
+                            buffer += value;
+                            let end;
+                            while ((end = buffer.indexOf('\n\n')) >= 0) {
+                                handleFrame(buffer.slice(0, end));
+                                buffer = buffer.slice(end + 2);
+                            }
+                        }
+                    }
+                } catch {
+                    // Network error or abort; retried below unless aborted
+                }
+                if (controller.signal.aborted) return;
+                await new Promise(resolve => setTimeout(resolve, retryMs));
+            }
+        };
+
+        run();
+        return () => controller.abort();
+    },
+};